@@ -0,0 +1,31 @@
+import threading
+from collections import OrderedDict
+
+
+class AlternativesCache:
+    """
+    每次請求預先算好的前 K 個排程（request_id -> list of {"rank","cost","schedule"}），
+    使用者要求「換一個」時直接取用，不需要重新計算。超過 max_entries 時移除最舊的請求。
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, request_id: str, date_str: str, uid: str, alternatives: list):
+        with self._lock:
+            self._entries[request_id] = {"date": date_str, "uid": uid, "alternatives": alternatives}
+            self._entries.move_to_end(request_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, request_id: str):
+        with self._lock:
+            entry = self._entries.get(request_id)
+            if entry is not None:
+                self._entries.move_to_end(request_id)
+            return entry
+
+
+alternatives_cache = AlternativesCache()
@@ -1,17 +1,64 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from main import schedule_tasks            # 呼叫排程主要邏輯（main.py）
-from user_input import get_user_input      # 目前未使用，但保留為未來擴充
+from main import schedule_tasks, write_results_to_firebase, reoptimize_tasks, compare_scenarios  # 呼叫排程主要邏輯（main.py）
+from main import schedule_batch, fatigue_cost_table
+from batch_problems import problem_from_dict, plan_to_problems
 import logging
-import math
 import datetime
 import json        # 解析 Vertex AI 回傳的 JSON 部分
-from pydantic import BaseModel
-from vertex_client import init_vertex_ai_client, connect_to_model, ask_vertex_ai
+import uuid
+import time
+import os
+import numpy as np
+from vertex_client import init_vertex_ai_client, connect_to_model, ask_vertex_ai, ask_vertex_ai_stream
+from plan_stream import PlanStreamParser
+from plan_cache import plan_cache
+from metrics import RequestIdFilter, request_id_var, current_request_id, new_request_id, render_metrics, HTTP_SECONDS, route_label
+from firebase import get_weekly_schedule, get_base_cost_from_firebase, get_tasks_from_firebase, db
+from firebase import invalidate_fatigue_cache, SUFFIX_TO_CODE, write_fatigue_curves
+from fatigue_store import start_sync_job, fatigue_store, FatigueStoreWriter
+from fatigue_stream import FatigueAggregator, start_flush_job
+from suggest_index import get_window_index, invalidate_window_index
+from cost_table import invalidate_cost_tables
+from fine_tuningAPI import intelligent_task_analysis
+from semantic_cache import mission_index
+from weekly_schedule import read_schedule_range, read_day_packed, split_packed_by_owner
+from task_model import TaskBatch, Schedule, parse_window, hhmm_to_minutes, minutes_to_hhmm
+from task_model import INTELLIGENCE_LABELS, INTELLIGENCE_CODE, SLOT_MINUTES, SLOTS_PER_HOUR
+from busy_index import get_day_busy_index, invalidate_day_busy_index
+from reoptimize import get_state
+from change_feed import ChangeFeedSubscriber, FirestoreChangeFeed, schedule_versions
+from online_scheduler import DayPlan, online_scheduler
+from timeline import window_end_slot, timeline_dates
+from alternatives import alternatives_cache
+from scenarios import Scenario
 
 app = FastAPI()
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(request_id)s] %(message)s")
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(RequestIdFilter())
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """每個請求一個 ID（可由 X-Request-ID 帶入），log、計時 span 與回應 header 都會帶上；同時記錄請求延遲"""
+    token = request_id_var.set(request.headers.get("X-Request-ID") or new_request_id())
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = current_request_id()
+        return response
+    finally:
+        HTTP_SECONDS.observe(time.perf_counter() - started, path=route_label(request.scope), status=status)
+        request_id_var.reset(token)
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus 格式的延遲 histogram（各排程階段、HTTP 請求、模型大小、求解狀態）"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # 定義 POST /api/submit 所需的資料結構
 class InputData(BaseModel):
@@ -23,6 +70,14 @@ class InputData(BaseModel):
     desc: List[str]     # 每個任務的描述（用於智能分析與寫入 Firebase）
     #[IC]
     fixed:List[bool]  # 每個任務是否為固定任務（True/False）
+    endDate: Optional[str] = None  # 多日視窗的結束日期（YYYY-MM-DD），Te 為該日的時間
+    mode: str = "exact"            # "exact" 一次求解；"rolling" 每天 Ts~Te 依序求解，排不下的帶到下一天；"decompose" 依空檔平行求解；"preemptive" 任務可切段
+    minChunk: int = 15             # preemptive：每段最短分鐘數
+    maxSplits: int = 2             # preemptive：每個任務最多切幾次
+    fatigueAccumulation: bool = False  # 是否考慮同智能任務連續進行的疲勞累積
+    kBest: int = 1                 # 一次預先算好幾個不同的排程（exact 模式），供「換一個」使用
+    kBestMinShift: int = 60        # 不同排程之間，任務至少要移動幾分鐘才算不同
+    kBestMinMoved: int = 1         # 不同排程之間，至少要有幾個任務移動
 
 # 用來儲存最近一次上傳的原始資料，供 GET /api/latest 查詢
 latest_data: Optional[InputData] = None
@@ -37,12 +92,16 @@ async def submit_get():
     # 用於測試或說明的 GET 端點
     return {"message": "請用 POST 傳送 JSON：{taskDate, Ts, Te, n, k, desc}"}
 
+def _dated_tasks(schedule: Schedule, date_str: str) -> list:
+    """排程結果轉成 API 輸出：跨日 / 多日的任務標上所屬日期，時間相對當天（見 Schedule.to_dated_dicts）"""
+    return schedule.to_dated_dicts(timeline_dates(date_str, int(schedule.end.max(initial=0))))
+
 @app.post("/api/submit")
 async def submit_and_compute(data: InputData):
     """
     接收前端傳來的 JSON，負責：
-    - 解析時間字串 Ts, Te 為小時浮點數（若 Te <= Ts 則視為跨日加 24 小時）
-    - 把持續時間 k（分鐘）轉為以 5 分鐘為單位的 slot（math.ceil(d / 5)）
+    - 解析時間字串 Ts, Te 為 slot（若 Te <= Ts 則視為跨日加 24 小時）
+    - 把 k / desc / fixed 包成 TaskBatch（持續時間轉為以 5 分鐘為單位的 slot）
     - 呼叫 schedule_tasks 執行排程並把結果寫入 Firebase（schedule_tasks 會處理智能分析與寫入）
     """
     global latest_data
@@ -50,30 +109,172 @@ async def submit_and_compute(data: InputData):
     logging.info(f"✅ 接收到資料: {data.dict()}")
 
     try:
-        # 將接收到的資料送到 get_user_input 處理（你也可以直接拆開不用 get_user_input）
-        Ts_hour, Ts_minute = map(int, data.Ts.split(":"))
-        Te_hour, Te_minute = map(int, data.Te.split(":"))
-        Ts = Ts_hour + Ts_minute / 60
-        Te = Te_hour + Te_minute / 60
-        if Te <= Ts:
-            # 若結束時間小於等於起始時間，視為跨日
-            Te += 24
-
-        # 把分鐘轉成以 5 分鐘為單位的 slots（整數）
-        durations = [math.ceil(d / 5) for d in data.k]
+        # 時間字串只在這裡解析一次，之後都以 slot（整數）傳遞
+        Ts_slots, Te_slots = parse_window(data.Ts, data.Te)
 
         # 若沒有傳入 taskDate，使用現在日期
-        date_str = data.taskDate or datetime.now().strftime("%Y-%m-%d")
+        date_str = data.taskDate or datetime.datetime.now().strftime("%Y-%m-%d")
+        horizon_days = 1
+        if data.endDate and data.endDate != date_str:
+            if data.mode == "rolling":
+                # 滾動視窗：每天的 Ts ~ Te 各自是一個區間
+                horizon_days = (datetime.date.fromisoformat(data.endDate) - datetime.date.fromisoformat(date_str)).days + 1
+            else:
+                # 多日視窗：Te 落在 endDate 當天
+                Te_slots = window_end_slot(date_str, data.endDate, data.Te)
+
+        # 持續時間 k（分鐘）在 TaskBatch 內轉為 5 分鐘 slot（向上取整）
+        batch = TaskBatch(data.k, data.desc, data.fixed)
 
         # 呼叫排程主程式（會把結果寫入 Firebase）
-        schedule_tasks(Ts, Te, durations, date_str, data.desc,data.fixed)#[IC]add data.fixed
+        request_id = current_request_id()
+        schedule = schedule_tasks(Ts_slots, Te_slots, batch, date_str, mode=data.mode, horizon_days=horizon_days,
+                                  min_chunk=-(-data.minChunk // SLOT_MINUTES), max_splits=data.maxSplits,
+                                  fatigue_accumulation=data.fatigueAccumulation,
+                                  k_best=data.kBest, request_id=request_id,
+                                  k_best_min_shift=-(-data.kBestMinShift // SLOT_MINUTES),
+                                  k_best_min_moved=data.kBestMinMoved)
+        if schedule is None:
+            return {"success": False, "error": "找不到可行解"}
 
-        return {"success": True, "message": "✅ 任務成功排程並寫入 Firebase"}
+        unscheduled = sorted(set(range(len(batch))) - set(schedule.index.tolist()))
+        cached = alternatives_cache.get(request_id)
+        return {"success": True, "message": "✅ 任務成功排程並寫入 Firebase",
+                "tasks": _dated_tasks(schedule, date_str), "unscheduled": unscheduled,
+                "requestId": request_id,
+                "alternatives": [{"rank": a["rank"], "cost": a["cost"]} for a in cached["alternatives"]] if cached else []}
 
     except Exception as e:
         logging.error(f"❌ 錯誤: {e}")
         return {"success": False, "error": str(e)}
     
+class BatchProblem(InputData):
+    uid: str = "testUser"
+
+@app.post("/api/submit/batch")
+async def submit_batch(problems: List[BatchProblem]):
+    """
+    一次排很多使用者 / 很多天（exact 模式）：整批分類去重、疲勞曲線批次抓取、
+    process pool 平行求解、結果以 WriteBatch 批次寫入。回傳結果順序與輸入相同。
+    """
+    try:
+        results = schedule_batch([problem_from_dict(p.dict()) for p in problems])
+        return {"success": True, "results": results}
+    except Exception as e:
+        logging.error(f"❌ 錯誤: {e}")
+        return {"success": False, "error": str(e)}
+
+class ScenarioDelta(BaseModel):
+    name: str = ""
+    Ts: Optional[str] = None          # 覆蓋開始時間（HH:MM）
+    Te: Optional[str] = None          # 覆蓋結束時間（HH:MM）
+    extendTe: int = 0                 # 結束時間延後幾分鐘
+    drop: List[int] = []              # 刪除的任務索引
+    k: Optional[List[int]] = None     # 覆蓋每個任務的持續時間（分鐘）
+
+class ScenarioRequest(BaseModel):
+    base: InputData
+    scenarios: List[ScenarioDelta]
+    uid: str = "testUser"
+
+@app.post("/api/scenarios")
+async def compare_scenarios_api(req: ScenarioRequest):
+    """
+    what-if 比較：基本問題 + 多個修改（例如 8 點開始 vs 9 點開始、刪掉任務 3、延長一小時），
+    共用分類與疲勞成本，平行求解後並列回傳各情境的成本與排程（不寫入 Firebase）。
+    """
+    try:
+        base = req.base
+        date_str = base.taskDate or datetime.datetime.now().strftime("%Y-%m-%d")
+        batch = TaskBatch(base.k, base.desc, base.fixed)
+        n = len(batch)
+
+        scenarios = []
+        for k, delta in enumerate([ScenarioDelta(name="base")] + req.scenarios):
+            Ts_slots, Te_slots = parse_window(delta.Ts or base.Ts, delta.Te or base.Te)
+            Te_slots += -(-delta.extendTe // SLOT_MINUTES)
+            if delta.k is not None and len(delta.k) != n:
+                raise ValueError(f"❌ 情境 {delta.name or k} 的 k 長度必須為 {n}")
+            durations = TaskBatch(delta.k, batch.desc).durations if delta.k is not None else batch.durations
+            keep = np.setdiff1d(np.arange(n), np.asarray(delta.drop, dtype=np.int64))
+            scenarios.append(Scenario(delta.name or f"scenario-{k}", Ts_slots, Te_slots, keep, durations))
+
+        return {"success": True, "scenarios": compare_scenarios(batch, date_str, scenarios, req.uid)}
+    except Exception as e:
+        logging.error(f"❌ 錯誤: {e}")
+        return {"success": False, "error": str(e)}
+
+class FixedEvent(BaseModel):
+    startTime: str  # HH:MM
+    endTime: str    # HH:MM
+
+class ReoptimizeRequest(BaseModel):
+    taskDate: str                         # 要修改的排程日期（YYYY-MM-DD）
+    addK: List[int] = []                  # 新增任務的持續時間（分鐘）
+    addDesc: List[str] = []               # 新增任務的描述
+    remove: List[int] = []                # 要刪除的任務索引
+    changedFixed: List[FixedEvent] = []   # 變動的固定行程時段（新舊位置都要給）
+    uid: str = "testUser"
+
+@app.post("/api/reoptimize")
+async def reoptimize_api(req: ReoptimizeRequest):
+    """
+    以上一次的排程為基礎做增量重排（只重新求解受影響的鄰域），
+    分類與疲勞成本重複使用上一次的結果。
+    """
+    try:
+        schedule = reoptimize_tasks(req.uid, req.taskDate, req.addK, req.addDesc, req.remove,
+                                    [e.dict() for e in req.changedFixed], fixed_changed=bool(req.changedFixed))
+        if schedule is None:
+            return {"success": False, "error": "找不到上一次的排程或可行解，請重新送出 /api/submit"}
+        return {"success": True, "tasks": _dated_tasks(schedule, req.taskDate)}
+    except Exception as e:
+        logging.error(f"❌ 錯誤: {e}")
+        return {"success": False, "error": str(e)}
+
+def _on_fixed_schedule_change(uid: str, date_str: str, events: list):
+    """
+    固定行程變動（已 debounce）後在背景執行：清掉忙碌索引快取，
+    若記憶體中有當天的排程狀態就做增量重排，並以新版本號發布。
+    """
+    invalidate_day_busy_index(uid, date_str)
+    if get_state(uid, date_str) is None:
+        return  # 沒有排程狀態，下次 /api/submit 會抓到最新的固定行程
+    schedule = reoptimize_tasks(uid, date_str, changed_events=events, fixed_changed=True)
+    if schedule is not None:
+        version = get_state(uid, date_str).version
+        schedule_versions.publish(uid, date_str, version, _dated_tasks(schedule, date_str))
+        logging.info(f"✅ 固定行程變動，已重排 {uid} {date_str}（版本 {version}）")
+
+@app.get("/api/schedule/version")
+async def get_schedule_version(taskDate: str, uid: str = "testUser"):
+    """查詢背景重排後最新發布的排程與版本號"""
+    published = schedule_versions.get(uid, taskDate)
+    if published is None:
+        return {"success": False, "message": "尚未有背景重排的結果"}
+    return {"success": True, **published}
+
+@app.get("/api/alternatives/{request_id}/{rank}")
+async def get_alternative(request_id: str, rank: int):
+    """取得預先算好的第 rank 個排程（0 為最佳解）"""
+    cached = alternatives_cache.get(request_id)
+    if cached is None or not 0 <= rank < len(cached["alternatives"]):
+        raise HTTPException(status_code=404, detail="找不到這個排程選項")
+    alt = cached["alternatives"][rank]
+    return {"success": True, "rank": rank, "cost": alt["cost"], "tasks": _dated_tasks(alt["schedule"], cached["date"])}
+
+@app.post("/api/alternatives/{request_id}/{rank}/apply")
+async def apply_alternative(request_id: str, rank: int):
+    """使用者選定第 rank 個排程：直接寫入 Firebase，不需重新計算"""
+    cached = alternatives_cache.get(request_id)
+    if cached is None or not 0 <= rank < len(cached["alternatives"]):
+        raise HTTPException(status_code=404, detail="找不到這個排程選項")
+    schedule = cached["alternatives"][rank]["schedule"]
+    dates = timeline_dates(cached["date"], int(schedule.end.max(initial=0)))
+    for day_str, day_schedule in schedule.split_by_day(dates, keep_empty=True):
+        write_results_to_firebase(day_str, day_schedule, cached["uid"], owner=cached["date"])
+    return {"success": True, "rank": rank, "tasks": schedule.to_dated_dicts(dates)}
+
 @app.get("/api/latest")
 async def get_latest_data():
     # 回傳最近一次上傳的原始資料（未經排程處理）
@@ -81,9 +282,186 @@ async def get_latest_data():
         return {"message": "尚未有任何上傳的資料"}
     return latest_data.dict()
 
+@app.get("/api/schedule")
+async def get_schedule_range(
+    from_date: str = Query(..., alias="from"),   # 起始日期（YYYY-MM-DD）
+    to_date: str = Query(..., alias="to"),       # 結束日期（YYYY-MM-DD，含）
+    uid: str = "testUser"
+):
+    """
+    讀取一段日期範圍的排程（每週只讀一份壓縮文件，並優先使用本機快取）
+    """
+    try:
+        days = read_schedule_range(uid, from_date, to_date, get_weekly_schedule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "days": days}
+
+# 以下為白天臨時加入任務（線上排程）的功能
+class OnlineTaskRequest(BaseModel):
+    taskDate: str                       # 任務日期（YYYY-MM-DD）
+    desc: str                           # 任務描述
+    k: int                              # 持續時間（分鐘）
+    urgency: int = 0                    # 緊急程度（越大越優先）
+    importance: int = 0                 # 重要程度（越大越優先）
+    intelligence: Optional[str] = None  # 已知的智能分類（省略時呼叫模型分類）
+    now: Optional[str] = None           # 目前時間（HH:MM），只會排在這之後
+    Ts: str = "08:00"                   # 當天可排時段（第一次載入當天排程時使用）
+    Te: str = "22:00"
+    uid: str = "testUser"
+
+class OnlineRemoveRequest(BaseModel):
+    taskDate: str
+    taskId: str
+    now: Optional[str] = None
+    uid: str = "testUser"
+
+def _load_day_plan(uid: str, date_str: str, Ts: str, Te: str) -> DayPlan:
+    Ts_slots, Te_slots = parse_window(Ts, Te)
+    busy = get_day_busy_index(uid, date_str, get_tasks_from_firebase)
+    packed = read_day_packed(uid, date_str, get_weekly_schedule)
+    own, foreign = split_packed_by_owner(packed or {}, date_str, date_str)
+    if foreign["start"]:
+        # 前一天跨夜延伸過來的任務不屬於這天的排程（寫回時不會動到），當成固定行程避開
+        foreign_schedule = Schedule.from_packed(foreign)
+        busy = busy.copy()
+        busy.add_many(foreign_schedule.start, foreign_schedule.end)
+    plan = DayPlan(date_str, Ts_slots, Te_slots, busy, fatigue_cost_table(uid).row)
+    if own["start"]:
+        plan.load(Schedule.from_packed(own))
+    return plan
+
+def _now_slot(now: Optional[str]):
+    return hhmm_to_minutes(now) // SLOT_MINUTES if now else None
+
+@app.post("/api/online/insert")
+def online_insert(req: OnlineTaskRequest, background_tasks: BackgroundTasks):
+    """
+    把臨時任務插入當天已在記憶體中的排程（局部修補，不重新計算整天），
+    結果在背景寫回 Firebase。
+    """
+    plan = online_scheduler.get_or_create(req.uid, req.taskDate,
+                                          lambda: _load_day_plan(req.uid, req.taskDate, req.Ts, req.Te))
+    label = req.intelligence
+    if not label:
+        label = intelligent_task_analysis([req.desc])[0].get("intelligence", "")
+    code = INTELLIGENCE_CODE.get(label)
+    if code is None:
+        raise HTTPException(status_code=400, detail=f"無法判斷任務的智能類型: {label}")
+    task_id = uuid.uuid4().hex
+    outcome = plan.insert(task_id, req.desc, -(-req.k // SLOT_MINUTES), code,
+                          req.urgency, req.importance, _now_slot(req.now))
+
+    schedule = plan.to_schedule()
+    background_tasks.add_task(write_results_to_firebase, req.taskDate, schedule, req.uid, keep_online_plan=True)
+    return {
+        "success": outcome["placed"],
+        "taskId": task_id,
+        "strategy": outcome["strategy"],
+        "startTime": minutes_to_hhmm(outcome["start"] * SLOT_MINUTES) if outcome["placed"] else None,
+        "tasks": schedule.to_dicts(),
+        "pending": len(plan.pending)
+    }
+
+@app.post("/api/online/remove")
+def online_remove(req: OnlineRemoveRequest, background_tasks: BackgroundTasks):
+    """移除（完成 / 取消）任務，空出的時段依優先順序補上等待中的任務"""
+    plan = online_scheduler.get(req.uid, req.taskDate)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="當天排程尚未載入")
+    if not plan.remove(req.taskId, _now_slot(req.now)):
+        raise HTTPException(status_code=404, detail=f"找不到任務 {req.taskId}")
+    schedule = plan.to_schedule()
+    background_tasks.add_task(write_results_to_firebase, req.taskDate, schedule, req.uid, keep_online_plan=True)
+    return {"success": True, "tasks": schedule.to_dicts(), "pending": len(plan.pending)}
+
 # 以下為 Vertex AI 相關的擴充功能
 class AskRequest(BaseModel):
     question: str
+    stream: bool = False   # True 時以 NDJSON 串流回傳（推薦理由與每筆行程產生後立即送出）
+
+class SuggestRequest(BaseModel):
+    taskDate: str
+    k: int                              # 持續時間（分鐘）
+    desc: str = ""
+    intelligence: Optional[str] = None  # 已知智能時可省略分類
+    Ts: str = "00:00"
+    Te: str = "23:59"
+    count: int = 3                      # 要幾個建議時段
+    uid: str = "testUser"
+
+@app.post("/api/suggest")
+def suggest_slots(req: SuggestRequest):
+    """
+    「這件事什麼時候做最好？」：查預先排序好的最佳時段索引，再用當天的忙碌索引過濾，
+    不建 MILP，回傳成本最低、互不重疊的幾個開始時間。
+    """
+    label = req.intelligence
+    if not label:
+        label = intelligent_task_analysis([req.desc])[0].get("intelligence", "")
+    code = INTELLIGENCE_CODE.get(label)
+    if code is None:
+        raise HTTPException(status_code=400, detail=f"無法判斷任務的智能類型: {label}")
+
+    if req.k <= 0:
+        raise HTTPException(status_code=400, detail="持續時間必須大於 0")
+    Ts_slots, Te_slots = parse_window(req.Ts, req.Te)
+    duration = -(-req.k // SLOT_MINUTES)
+    index = get_window_index(req.uid, fatigue_cost_table(req.uid).row, fatigue_store.version)
+    busy = get_day_busy_index(req.uid, req.taskDate, get_tasks_from_firebase)
+    suggestions = index.suggest(code, duration, busy, Ts_slots, Te_slots, req.count)
+    return {"success": True, "intelligence": label, "suggestions": [
+        {"startTime": minutes_to_hhmm(s * SLOT_MINUTES), "endTime": minutes_to_hhmm((s + duration) * SLOT_MINUTES),
+         "cost": cost} for s, cost in suggestions
+    ]}
+
+def _prior_curves(uid: str):
+    """線上更新疲勞曲線時的起點：本機 fatigue_store 或 Firebase 上現有的 8 x 24 曲線"""
+    try:
+        curves = fatigue_store.curves_with_fallback(
+            uid, range(len(INTELLIGENCE_LABELS)), lambda missing: get_base_cost_from_firebase(
+                [{"intelligence": INTELLIGENCE_LABELS[c]} for c in missing], uid))
+        return np.asarray(curves[:, ::SLOTS_PER_HOUR], dtype=np.float64)
+    except ValueError as e:
+        logging.error(f"⚠️ 找不到 {uid} 的疲勞曲線，將只以回饋建立: {e}")
+        return None
+
+def _invalidate_updated(updates: dict):
+    for uid in updates:
+        invalidate_cost_tables(uid)
+        invalidate_window_index(uid)
+
+fatigue_aggregator = FatigueAggregator(_prior_curves)
+fatigue_store_writer = FatigueStoreWriter()
+fatigue_sinks = [write_fatigue_curves, _invalidate_updated]
+
+class FatigueRating(BaseModel):
+    intelligence: str                # 智能名稱（中文）
+    timestamp: str                   # ISO 時間，例如 2025-05-01T14:30:00
+    rating: float                    # 疲勞程度
+    uid: str = "testUser"
+
+@app.post("/api/fatigue/ratings")
+def ingest_fatigue_ratings(ratings: List[FatigueRating]):
+    """
+    接收使用者的疲勞回饋（可一次多筆），即時以 EWMA 更新記憶體中的曲線，
+    由背景工作定期批次寫回 Firebase（與本機 fatigue_store）。
+    """
+    accepted = fatigue_aggregator.ingest([r.dict() for r in ratings])
+    return {"success": True, "accepted": accepted}
+
+@app.get("/api/classification/audit")
+def classification_audit(limit: int = 50):
+    """相似任務分類快取的命中率與最近的命中紀錄（供人工抽查是否誤判）"""
+    return {"success": True, **mission_index.stats(), "recent": list(mission_index.audit)[-limit:]}
+
+@app.post("/api/fatigue/refresh")
+def refresh_fatigue_curves(uid: Optional[str] = None):
+    """疲勞曲線更新後呼叫：清掉曲線快取與最佳時段索引，下次查詢時重建"""
+    invalidate_fatigue_cache(None if uid is None else [uid])
+    invalidate_cost_tables(uid)
+    invalidate_window_index(uid)
+    return {"success": True}
 
 @app.on_event("startup")
 def startup_event():
@@ -95,6 +473,20 @@ def startup_event():
     PROJECT_ID = "task-focus-4i2ic"
     LOCATION = "us-central1"
 
+    # 疲勞曲線增量同步到本機 memmap（多個 worker 時只讓一個 process 設定 FATIGUE_STORE_SYNC=1）
+    if os.environ.get("FATIGUE_STORE_SYNC") == "1":
+        start_sync_job(db, SUFFIX_TO_CODE, writer=fatigue_store_writer)
+        fatigue_sinks.append(fatigue_store_writer.write_hourly)
+    # 疲勞回饋的線上更新定期批次寫出
+    start_flush_job(fatigue_aggregator, fatigue_sinks)
+
+    # 監聽固定行程變動，背景自動增量重排
+    global change_feed_subscriber
+    try:
+        change_feed_subscriber = ChangeFeedSubscriber(FirestoreChangeFeed(db), _on_fixed_schedule_change).start()
+    except Exception as e:
+        logging.error(f"⚠️ 無法啟動固定行程監聽，將只在 /api/submit 時讀取: {e}")
+
     if init_vertex_ai_client(PROJECT_ID, LOCATION):
         global model
         model = connect_to_model()
@@ -103,6 +495,68 @@ def startup_event():
     else:
         raise RuntimeError("初始化 Vertex AI 失敗")
 
+def _ask_stream_events(question: str):
+    """
+    串流模式：模型每產生一段文字就交給 PlanStreamParser，
+    推薦理由文字直接轉送，「行程」中每一筆物件完整時立即送出，最後送出完整計劃。
+    每行一個 JSON 事件（NDJSON），結尾為 {"type": "done"}。
+    """
+    cached = plan_cache.get(question)
+    if cached is not None:
+        # 快取命中：直接依序送出推薦理由、每筆行程與完整計劃
+        yield json.dumps({"type": "recommendation", "text": cached["recommendation"], "cached": True},
+                         ensure_ascii=False) + "\n"
+        for k, item in enumerate(cached["result"]["行程"]):
+            yield json.dumps({"type": "item", "index": k, "item": item}, ensure_ascii=False) + "\n"
+        yield json.dumps({"type": "plan", "result": cached["result"]}, ensure_ascii=False) + "\n"
+        yield json.dumps({"type": "done"}) + "\n"
+        return
+
+    parser = PlanStreamParser()
+    recommendation = []
+    started = time.perf_counter()
+    try:
+        for text in ask_vertex_ai_stream(model, question):
+            for event in parser.feed(text):
+                if event["type"] == "recommendation":
+                    recommendation.append(event["text"])
+                elif event["type"] == "plan":
+                    plan_cache.put(question, "".join(recommendation).strip(), event["result"],
+                                   time.perf_counter() - started)
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        for event in parser.close():
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logging.error(f"❌ 串流回應失敗: {e}")
+        yield json.dumps({"type": "error", "detail": str(e)}, ensure_ascii=False) + "\n"
+    yield json.dumps({"type": "done"}) + "\n"
+
+class SchedulePlanRequest(BaseModel):
+    plan: dict                   # /dick/ask 回傳的 result（含「行程」）
+    Ts: str = "08:00"            # 每天可排的開始時間
+    Te: str = "22:00"            # 每天可排的結束時間
+    uid: str = "testUser"
+
+@app.post("/dick/plan/schedule")
+def schedule_generated_plan(req: SchedulePlanRequest):
+    """
+    把 /dick/ask 產生的一週計劃直接排進行事曆：
+    「多元智慧領域」直接對應到疲勞曲線（不再分類），每天一個問題平行求解，結果批次寫入。
+    """
+    try:
+        problems = plan_to_problems(req.plan, req.Ts, req.Te, req.uid)
+        if not problems:
+            return {"success": False, "error": "計劃中沒有任何行程"}
+        return {"success": True, "results": schedule_batch(problems)}
+    except (KeyError, ValueError) as e:
+        logging.error(f"❌ 錯誤: {e}")
+        return {"success": False, "error": f"計劃格式錯誤: {e}"}
+
+@app.get("/dick/ask/cache")
+def ask_cache_stats():
+    """規劃問題快取的命中率與省下的模型時間"""
+    return {"success": True, **plan_cache.stats()}
+
 @app.post("/dick/ask")
 def ask_api(req: AskRequest):
     """
@@ -111,10 +565,20 @@ def ask_api(req: AskRequest):
     - 程式會抓出第一個 '{' 到最後一個 '}' 作為 JSON 範圍，解析後回傳
     - recommendation 為 JSON 之前的文字（若有）
     注意：此解析方法較為脆弱，建議在可能情況下要求模型只回傳 JSON 或用更嚴謹的分隔符號
+    stream=True 時改用串流模式（見 _ask_stream_events），不必等整份回應產生完
     """
+    if req.stream:
+        return StreamingResponse(_ask_stream_events(req.question), media_type="application/x-ndjson")
+
+    # 同一天問過（正規化後相同）的問題直接回傳已解析的計劃
+    cached = plan_cache.get(req.question)
+    if cached is not None:
+        return {"status": "ok", "cached": True, **cached}
+
     try:
+        started = time.perf_counter()
         answer = ask_vertex_ai(model, req.question)
-    
+
         # 嘗試抽取 JSON 部分（從第一個 { 到最後一個 }）
         start_idx = answer.find("{")
         end_idx = answer.rfind("}") + 1
@@ -125,6 +589,7 @@ def ask_api(req: AskRequest):
 
         # 推薦理由就是 JSON 前面的文字
         recommendation = answer[:start_idx].strip()
+        plan_cache.put(req.question, recommendation, plan_json, time.perf_counter() - started)
 
         return {
             "status": "ok",
@@ -0,0 +1,50 @@
+import os
+import sys
+import json
+import argparse
+
+
+def _stdout_to_stderr():
+    """
+    排程過程（分類、Firebase、process pool 的子行程）的進度訊息都印在 stdout，
+    先把 fd 1 導到 stderr，回傳原本 stdout 的檔案物件，讓 stdout 只有 JSONL 結果
+    """
+    sys.stdout.flush()
+    real_stdout = os.fdopen(os.dup(1), "w", encoding="utf-8")
+    os.dup2(2, 1)
+    return real_stdout
+
+
+def main():
+    """
+    批次排程命令列工具（例如每晚替所有使用者排明天）：
+    輸入為 JSONL，每行一筆與 /api/submit 相同格式的資料（可多帶 uid），
+    結果以 JSONL 依相同順序輸出到 --output（預設 stdout；進度訊息一律改印到 stderr）。
+
+        python batch_cli.py problems.jsonl -o results.jsonl
+    """
+    parser = argparse.ArgumentParser(description="批次排程（JSONL 輸入）")
+    parser.add_argument("input", help="JSONL 檔案路徑，'-' 代表 stdin")
+    parser.add_argument("-o", "--output", help="輸出 JSONL 檔案路徑（預設 stdout）")
+    args = parser.parse_args()
+
+    real_stdout = _stdout_to_stderr()
+    # 匯入 main 時就會初始化 Firebase 並印出訊息，所以在導向之後才匯入
+    from main import schedule_batch
+    from batch_problems import problem_from_dict
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with source:
+        problems = [problem_from_dict(json.loads(line)) for line in source if line.strip()]
+
+    results = schedule_batch(problems)
+
+    sink = open(args.output, "w", encoding="utf-8") if args.output else real_stdout
+    with sink:
+        for result in results:
+            sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"✅ 完成 {sum(r['success'] for r in results)}/{len(results)} 個問題", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import datetime
+import numpy as np
+from task_model import TaskBatch, parse_window, INTELLIGENCE_CODE, PLAN_DOMAIN_TO_INTELLIGENCE
+from timeline import window_end_slot
+
+
+def problem_from_dict(data: dict) -> dict:
+    """
+    把一筆 /api/submit 格式的輸入（taskDate, Ts, Te, k, desc, fixed, endDate, uid）轉成批次排程用的問題：
+    {"uid","date","Ts_slots","Te_slots","batch"}
+    """
+    date_str = data.get("taskDate") or datetime.datetime.now().strftime("%Y-%m-%d")
+    Ts_slots, Te_slots = parse_window(data["Ts"], data["Te"])
+    end_date = data.get("endDate")
+    if end_date and end_date != date_str:
+        Te_slots = window_end_slot(date_str, end_date, data["Te"])
+    return {"uid": data.get("uid") or "testUser", "date": date_str, "Ts_slots": Ts_slots, "Te_slots": Te_slots,
+            "batch": TaskBatch(data["k"], data["desc"], data.get("fixed"))}
+
+
+def plan_to_problems(plan: dict, Ts: str, Te: str, uid="testUser") -> list:
+    """
+    把 /dick/ask 產生的計劃（{"行程": [{"事件","年分","月份","日期","持續時間","多元智慧領域"}, ...]}）
+    依日期拆成每天一個批次排程問題。智能直接由「多元智慧領域」對應，不再呼叫分類模型（problem 帶 "codes"）。
+    每天都使用相同的可排時段 Ts ~ Te。
+    """
+    by_date = {}
+    for item in plan.get("行程", []):
+        date_str = datetime.date(int(item["年分"]), int(item["月份"]), int(item["日期"])).isoformat()
+        by_date.setdefault(date_str, []).append(item)
+
+    Ts_slots, Te_slots = parse_window(Ts, Te)
+    problems = []
+    for date_str in sorted(by_date):
+        items = by_date[date_str]
+        domains = [str(item.get("多元智慧領域", "")).strip() for item in items]
+        labels = [PLAN_DOMAIN_TO_INTELLIGENCE.get(d, d) for d in domains]
+        problems.append({
+            "uid": uid, "date": date_str, "Ts_slots": Ts_slots, "Te_slots": Te_slots,
+            "batch": TaskBatch([int(item["持續時間"]) for item in items], [str(item["事件"]) for item in items]),
+            "codes": np.array([INTELLIGENCE_CODE.get(label, -1) for label in labels], dtype=np.int8),
+        })
+    return problems
@@ -0,0 +1,172 @@
+import os
+import time
+import numpy as np
+from task_model import SLOT_MINUTES, SLOTS_PER_DAY, hhmm_to_minutes
+
+
+class BusyIndex:
+    """
+    以 5 分鐘 slot 為單位的忙碌點陣圖（bitmap），涵蓋 [origin, origin + length) 這段 slot。
+    - add / add_many：插入忙碌區間，超出範圍的部分會自動裁切
+    - is_free / feasible_starts：用前綴和判斷區間是否空閒（單次 O(1)，整批一次向量運算）
+    - free_gaps：列出所有空檔 (start, end)
+    slot 皆為絕對位置（從 origin 那天 00:00 起算），跨日時可超過 288。
+    """
+
+    def __init__(self, origin: int = 0, length: int = SLOTS_PER_DAY):
+        self.origin = int(origin)
+        self.busy = np.zeros(int(length), dtype=bool)
+        self._prefix = None
+
+    @property
+    def end(self) -> int:
+        return self.origin + len(self.busy)
+
+    def _clip(self, start, end):
+        s = np.clip(np.asarray(start, dtype=np.int64) - self.origin, 0, len(self.busy))
+        e = np.clip(np.asarray(end, dtype=np.int64) - self.origin, 0, len(self.busy))
+        return s, e
+
+    def add(self, start: int, end: int):
+        """標記 [start, end) 為忙碌（自動裁切到索引範圍內）"""
+        s, e = self._clip(start, end)
+        if e > s:
+            self.busy[s:e] = True
+            self._prefix = None
+
+    def remove(self, start: int, end: int):
+        """把 [start, end) 標記回空閒（只用於移除已排入的任務，不可用來移除固定行程）"""
+        s, e = self._clip(start, end)
+        if e > s:
+            self.busy[s:e] = False
+            self._prefix = None
+
+    def add_many(self, starts, ends):
+        """一次插入多個忙碌區間：差分陣列 + cumsum，不需逐格迴圈"""
+        s, e = self._clip(starts, ends)
+        keep = e > s
+        if not np.any(keep):
+            return
+        diff = np.zeros(len(self.busy) + 1, dtype=np.int32)
+        np.add.at(diff, s[keep], 1)
+        np.add.at(diff, e[keep], -1)
+        self.busy |= np.cumsum(diff[:-1]) > 0
+        self._prefix = None
+
+    def _busy_prefix(self):
+        if self._prefix is None:
+            self._prefix = np.concatenate(([0], np.cumsum(self.busy, dtype=np.int32)))
+        return self._prefix
+
+    def is_free(self, start: int, length: int) -> bool:
+        """[start, start + length) 是否完全空閒（超出索引範圍視為不可用）"""
+        s = start - self.origin
+        if s < 0 or s + length > len(self.busy):
+            return False
+        prefix = self._busy_prefix()
+        return prefix[s + length] == prefix[s]
+
+    def feasible_starts(self, duration: int, lo: int, hi: int) -> np.ndarray:
+        """
+        回傳長度 hi - lo 的 bool 陣列：offset j 為 True 代表從 lo + j 開始、
+        長度 duration 的區間完全空閒且不超過 hi。
+        """
+        width = hi - lo
+        ok = np.zeros(max(width, 0), dtype=bool)
+        last = min(hi, self.end) - duration  # 最晚可開始的絕對 slot
+        first = max(lo, self.origin)
+        if last < first:
+            return ok
+        prefix = self._busy_prefix()
+        s = np.arange(first, last + 1) - self.origin
+        ok[first - lo:last + 1 - lo] = prefix[s + duration] == prefix[s]
+        return ok
+
+    def free_gaps(self, lo: int = None, hi: int = None):
+        """列出 [lo, hi) 內所有空檔，回傳 (starts, ends) 兩個 int 陣列（絕對 slot）"""
+        lo = self.origin if lo is None else max(lo, self.origin)
+        hi = self.end if hi is None else min(hi, self.end)
+        if hi <= lo:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        free = ~self.busy[lo - self.origin:hi - self.origin]
+        edges = np.diff(np.concatenate(([False], free, [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1) + lo
+        ends = np.flatnonzero(edges == -1) + lo
+        return starts, ends
+
+    def find_free_slot(self, duration: int, lo: int = None, hi: int = None):
+        """找出 [lo, hi) 內最早能放下 duration 的開始 slot，找不到回傳 None"""
+        lo = self.origin if lo is None else lo
+        hi = self.end if hi is None else hi
+        ok = np.flatnonzero(self.feasible_starts(duration, lo, hi))
+        return int(lo + ok[0]) if len(ok) else None
+
+    def merge(self, other, offset: int = 0):
+        """把另一個索引的忙碌 slot 併入（other 的 slot 位移 offset 後對齊，超出範圍的部分裁切）"""
+        s, e = self._clip(other.origin + offset, other.end + offset)
+        if e > s:
+            src = other.origin + offset - self.origin
+            self.busy[s:e] |= other.busy[s - src:e - src]
+            self._prefix = None
+
+    def copy(self):
+        other = BusyIndex(self.origin, len(self.busy))
+        other.busy[:] = self.busy
+        return other
+
+    @classmethod
+    def from_events(cls, events: list, origin: int = 0, length: int = SLOTS_PER_DAY, day_offset: int = 0):
+        """
+        由固定行程（list of {"startTime": "HH:MM", "endTime": "HH:MM"}）建立索引。
+        - day_offset：事件所屬日期距離 origin 那天的 slot 偏移（多日時間軸使用）
+        - endTime <= startTime 視為跨日
+        開始時間向下取整、結束時間向上取整到 slot，避免部分重疊被忽略（見 event_intervals）。
+        """
+        index = cls(origin, length)
+        index.insert_events(events, day_offset)
+        return index
+
+    def insert_events(self, events: list, day_offset: int = 0):
+        if not events:
+            return
+        self.add_many(*event_intervals(events, day_offset))
+
+
+def event_intervals(events: list, day_offset: int = 0):
+    """
+    固定行程 -> (starts, ends) slot 陣列。
+    開始時間向下取整、結束時間向上取整；endTime <= startTime 視為跨日。
+    """
+    start_min = np.array([hhmm_to_minutes(e["startTime"]) for e in events], dtype=np.int64)
+    end_min = np.array([hhmm_to_minutes(e["endTime"]) for e in events], dtype=np.int64)
+    end_min = np.where(end_min <= start_min, end_min + 24 * 60, end_min)
+    return start_min // SLOT_MINUTES + day_offset, -(-end_min // SLOT_MINUTES) + day_offset
+
+
+# (uid, date_str) -> (BusyIndex, 載入時間)，給排程、presolve 與查空檔共用
+_day_indexes = {}
+
+# 快取的有效秒數：沒有 change feed 通知時（例如監聽啟動失敗），固定行程最晚這麼久之後會重新讀取
+BUSY_INDEX_TTL_SECONDS = float(os.environ.get("BUSY_INDEX_TTL_SECONDS", "60"))
+
+
+def get_day_busy_index(uid: str, date_str: str, fetch_events, clock=time.monotonic) -> BusyIndex:
+    """
+    取得某使用者某天的忙碌索引（沒有快取或快取超過 BUSY_INDEX_TTL_SECONDS 秒時，
+    用 fetch_events(date_str, uid) 重新抓固定行程）。
+    索引長度為兩天，跨過午夜的固定行程會完整保留到隔天的部分。
+    """
+    key = (uid, date_str)
+    now = clock()
+    cached = _day_indexes.get(key)
+    if cached is not None and now - cached[1] < BUSY_INDEX_TTL_SECONDS:
+        return cached[0]
+    index = BusyIndex.from_events(fetch_events(date_str, uid), length=2 * SLOTS_PER_DAY)
+    _day_indexes[key] = (index, now)
+    return index
+
+
+def invalidate_day_busy_index(uid: str, date_str: str = None):
+    """固定行程變動時清除快取（date_str 為 None 時清除該使用者全部）"""
+    for key in [k for k in list(_day_indexes) if k[0] == uid and (date_str is None or k[1] == date_str)]:
+        _day_indexes.pop(key, None)
@@ -0,0 +1,185 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FixedEventChange:
+    """
+    一筆固定行程的變動：
+    - kind: "ADDED" / "MODIFIED" / "REMOVED"
+    - events: 受影響的時段 list of {"startTime","endTime"}（修改時包含新舊兩個位置）
+    """
+
+    def __init__(self, uid, date_str, kind, events):
+        self.uid = uid
+        self.date_str = date_str
+        self.kind = kind
+        self.events = events
+
+
+class LocalEventStream:
+    """本機的變動串流（測試或沒有 Firestore 時使用），publish 會同步呼叫所有訂閱者"""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def publish(self, change: FixedEventChange):
+        for callback in list(self._subscribers):
+            callback(change)
+
+
+class FirestoreChangeFeed:
+    """
+    監聽 Tasks/{uid}/task_list/{date}/tasks 底下的固定行程（collection group + on_snapshot），
+    轉成 FixedEventChange。第一次快照是既有資料，只用來記錄舊位置，不會觸發重排。
+    舊位置依 (uid, date) 分組保存，只保留 keep_days 天前（含）之後的日期；
+    過去的日期不會再重排，每次快照時整組清掉，記憶體不會隨時間一直成長。
+    """
+
+    def __init__(self, db, keep_days=1, today=datetime.date.today):
+        self.db = db
+        self.keep_days = keep_days
+        self.today = today
+        self._last_seen = {}   # (uid, date) -> {文件路徑: {"startTime","endTime"}}
+        self._initialized = False
+        self._watch = None
+
+    def _cutoff(self) -> str:
+        return (self.today() - datetime.timedelta(days=self.keep_days)).isoformat()
+
+    def _prune(self, cutoff: str):
+        for key in [k for k in self._last_seen if k[1] < cutoff]:
+            del self._last_seen[key]
+
+    def handle(self, changes, callback):
+        """處理一次快照的變動（on_snapshot 的 callback 內呼叫）"""
+        cutoff = self._cutoff()
+        self._prune(cutoff)
+        for change in changes:
+            doc = change.document
+            # 路徑：Tasks/{uid}/task_list/{date}/tasks/{doc_id}
+            parts = doc.reference.path.split("/")
+            if len(parts) < 6 or parts[0] != "Tasks":
+                continue
+            uid, date_str = parts[1], parts[3]
+            if date_str < cutoff:
+                continue  # 過去的日期不需要追蹤
+            data = doc.to_dict() or {}
+            new = {"startTime": data.get("startTime", "00:00"), "endTime": data.get("endTime", "00:00")}
+            seen = self._last_seen.setdefault((uid, date_str), {})
+            old = seen.get(doc.reference.path)
+            kind = change.type.name
+            if kind == "REMOVED":
+                seen.pop(doc.reference.path, None)
+                if not seen:
+                    del self._last_seen[(uid, date_str)]
+                events = [old] if old else []
+            else:
+                seen[doc.reference.path] = new
+                events = [e for e in (old, new) if e]
+            if self._initialized and events:
+                callback(FixedEventChange(uid, date_str, kind, events))
+        self._initialized = True
+
+    def subscribe(self, callback):
+        query = self.db.collection_group("tasks").where("Fixed_schedule", "==", True)
+
+        def on_snapshot(col_snapshot, changes, read_time):
+            self.handle(changes, callback)
+
+        self._watch = query.on_snapshot(on_snapshot)
+        return self._watch.unsubscribe
+
+
+class ScheduleVersions:
+    """每個 (uid, date) 最新發布的排程與版本號，版本號只會遞增"""
+
+    def __init__(self):
+        self._latest = {}
+        self._lock = threading.Lock()
+
+    def publish(self, uid, date_str, version, tasks):
+        with self._lock:
+            current = self._latest.get((uid, date_str))
+            if current is not None and current["version"] >= version:
+                return False  # 較舊的結果晚到，直接丟棄
+            self._latest[(uid, date_str)] = {"version": version, "tasks": tasks}
+            return True
+
+    def get(self, uid, date_str):
+        return self._latest.get((uid, date_str))
+
+
+schedule_versions = ScheduleVersions()
+
+
+class ChangeFeedSubscriber:
+    """
+    訂閱固定行程的變動，依 (uid, date) 合併短時間內的多次修改（debounce），
+    安靜 debounce_seconds 秒後才在背景執行一次 handler(uid, date_str, events)。
+    同一個 (uid, date) 同時間只會有一個 handler 在跑，跑的期間進來的變動會在結束後再觸發一次。
+    """
+
+    def __init__(self, feed, handler, debounce_seconds=2.0, max_workers=4):
+        self.feed = feed
+        self.handler = handler
+        self.debounce_seconds = debounce_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._timers = {}      # key -> threading.Timer
+        self._buffered = {}    # key -> list of events
+        self._running = set()
+        self._lock = threading.Lock()
+        self._unsubscribe = None
+
+    def start(self):
+        self._unsubscribe = self.feed.subscribe(self.on_change)
+        return self
+
+    def stop(self):
+        if self._unsubscribe:
+            self._unsubscribe()
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+        self._executor.shutdown(wait=False)
+
+    def on_change(self, change: FixedEventChange):
+        key = (change.uid, change.date_str)
+        with self._lock:
+            self._buffered.setdefault(key, []).extend(change.events)
+            timer = self._timers.get(key)
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(self.debounce_seconds, self._fire, args=(key,))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def _fire(self, key):
+        with self._lock:
+            self._timers.pop(key, None)
+            if key in self._running:
+                # 上一次還沒跑完，等它結束後再處理
+                return
+            events = self._buffered.pop(key, [])
+            if not events:
+                return
+            self._running.add(key)
+        self._executor.submit(self._run, key, events)
+
+    def _run(self, key, events):
+        try:
+            self.handler(key[0], key[1], events)
+        except Exception as e:
+            print(f"❌ 背景重排 {key} 發生錯誤: {e}")
+        finally:
+            with self._lock:
+                self._running.discard(key)
+                pending = bool(self._buffered.get(key)) and key not in self._timers
+            if pending:
+                self._fire(key)
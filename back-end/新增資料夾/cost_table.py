@@ -0,0 +1,75 @@
+import threading
+import numpy as np
+from task_model import INTELLIGENCE_LABELS, SLOTS_PER_DAY, SLOTS_PER_HOUR
+
+
+class CostTable:
+    """
+    某使用者的疲勞成本表：每種智能一列 5 分鐘成本（288 格），跨任務、跨請求共用（唯讀）。
+    任務只記錄自己智能對應的列索引，成本矩陣的大小與建立時間只和「不同智能數」有關，與任務數無關。
+    無法判斷智能（代碼 -1，分類失敗）的任務沒有成本列，查詢時拋出 ValueError，而不是當成零成本排進去。
+    曲線在第一次用到時才抓（fetch_hourly(codes) -> len(codes) x 24 的每小時成本，或已展開的 len(codes) x 288）。
+    """
+
+    def __init__(self, fetch_hourly):
+        m = len(INTELLIGENCE_LABELS)
+        self.rows = np.zeros((m, SLOTS_PER_DAY))
+        self.loaded = np.zeros(m, dtype=bool)
+        self._fetch_hourly = fetch_hourly
+        self._lock = threading.Lock()
+
+    def row_index(self, codes) -> np.ndarray:
+        """智能代碼 -> 列索引，缺少的曲線會一次抓回；有任務的代碼為 -1（分類失敗）時拋出 ValueError"""
+        idx = np.asarray(codes, dtype=np.int64)
+        unknown = np.flatnonzero(idx < 0)
+        if len(unknown):
+            tasks = "、".join(str(i + 1) for i in unknown)
+            raise ValueError(f"❌ 任務 {tasks} 無法判斷智能類型（分類失敗），無法計算疲勞成本")
+        missing = np.unique(idx[~self.loaded[idx]])
+        if len(missing):
+            with self._lock:
+                missing = missing[~self.loaded[missing]]
+                if len(missing):
+                    hourly = np.asarray(self._fetch_hourly(missing.tolist()), dtype=np.float64)
+                    if hourly.shape[1] != SLOTS_PER_DAY:
+                        hourly = np.repeat(hourly, SLOTS_PER_HOUR, axis=1)[:, :SLOTS_PER_DAY]
+                    self.rows[missing] = hourly
+                    self.loaded[missing] = True
+        return idx
+
+    def row(self, code) -> np.ndarray:
+        """單一智能的 288 格成本（唯讀 view）"""
+        view = self.rows[self.row_index([code])[0]]
+        view.flags.writeable = False
+        return view
+
+    def distinct(self, codes):
+        """
+        回傳 (rows, row_of)：rows 為這批任務用到的不同智能的成本列（m x 288），
+        row_of[i] 為任務 i 對應到 rows 的第幾列。
+        """
+        uniq, row_of = np.unique(self.row_index(codes), return_inverse=True)
+        return self.rows[uniq], row_of
+
+
+# uid -> (version, CostTable)；疲勞曲線更新時呼叫 invalidate_cost_tables，或傳入新的 version
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_cost_table(uid: str, fetch_hourly, version=None) -> CostTable:
+    """version 與上次不同時（例如本機 fatigue_store 已同步新的曲線）重新建立成本表"""
+    with _tables_lock:
+        entry = _tables.get(uid)
+        if entry is None or entry[0] != version:
+            entry = (version, CostTable(fetch_hourly))
+            _tables[uid] = entry
+        return entry[1]
+
+
+def invalidate_cost_tables(uid: str = None):
+    with _tables_lock:
+        if uid is None:
+            _tables.clear()
+        else:
+            _tables.pop(uid, None)
@@ -0,0 +1,121 @@
+import numpy as np
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import csr_matrix
+from solver import build_model, solve_model, window_cost_prefix, SolveResult
+from process_pool import get_process_pool
+
+
+def best_cost_in_gaps(P, durations, gap_starts, gap_ends, row_of=None):
+    """
+    每個任務放在每個空檔內的最低成本（滑動視窗最小值），放不下為 inf。
+    P 為 window_cost_prefix(C)，任務 i 使用第 row_of[i] 列（省略時為第 i 列）。回傳 n x G 矩陣。
+    同一列、同長度的任務結果相同，只算一次。
+    """
+    n, G = len(durations), len(gap_starts)
+    row_of = np.arange(n) if row_of is None else np.asarray(row_of)
+    best = np.full((n, G), np.inf)
+    for g in range(G):
+        gs, ge = int(gap_starts[g]), int(gap_ends[g])
+        done = {}
+        for i in range(n):
+            d = int(durations[i])
+            if d > ge - gs:
+                continue
+            key = (int(row_of[i]), d)
+            if key not in done:
+                s = np.arange(gs, ge - d + 1)
+                done[key] = (P[key[0], s + d] - P[key[0], s]).min()
+            best[i, g] = done[key]
+    return best
+
+
+def assign_tasks_to_gaps(durations, gap_lengths, est_cost, time_limit=None):
+    """
+    主問題（bin-packing）：決定每個任務放在哪個空檔。
+    - y[i, g] = 1 代表任務 i 放在空檔 g
+    - 每個任務恰好一個空檔；每個空檔內任務總長度不超過空檔長度
+    - 成本用 est_cost（任務在該空檔內的最低成本）估計
+    回傳長度 n 的空檔編號陣列，找不到可行解回傳 None。
+    """
+    n, G = est_cost.shape
+    ii, gg = np.nonzero(np.isfinite(est_cost))
+    m = len(ii)
+    if m == 0 or len(np.unique(ii)) < n:
+        return None
+
+    A_task = csr_matrix((np.ones(m), (ii, np.arange(m))), shape=(n, m))
+    A_cap = csr_matrix((durations[ii].astype(np.float64), (gg, np.arange(m))), shape=(G, m))
+    constraints = [LinearConstraint(A_task, 1, 1), LinearConstraint(A_cap, -np.inf, gap_lengths)]
+    options = {"time_limit": time_limit} if time_limit is not None else {}
+    res = milp(c=est_cost[ii, gg], constraints=constraints, bounds=Bounds(0, 1),
+               integrality=np.ones(m, dtype=bool), options=options)
+    if res.x is None:
+        return None
+
+    chosen = res.x > 0.5
+    gap_of = np.full(n, -1, dtype=np.int64)
+    gap_of[ii[chosen]] = gg[chosen]
+    return gap_of
+
+
+def _solve_gap(args):
+    """
+    子問題（在 worker process 執行）：在單一空檔內排序被分配到的任務。
+    只傳入該空檔範圍、且有用到的成本列與欄位，減少 process 間傳輸的資料量。
+    """
+    C_gap, durations, gs, ge, time_limit, row_of = args
+    model = build_model(C_gap, durations, 0, ge - gs, row_of=row_of)
+    result = solve_model(model, time_limit)
+    if result is None:
+        return None
+    return result.starts + gs
+
+
+def solve_decomposed(C, durations, Ts_slots, Te_slots, busy, time_limit=None, parallel=True, row_of=None):
+    """
+    空檔分解求解：
+    1. 固定行程把 Ts ~ Te 切成數個獨立空檔（BusyIndex.free_gaps）
+    2. 主問題決定每個任務放哪個空檔（assign_tasks_to_gaps）
+    3. 每個空檔各自求解排序，互不相關，丟到 process pool 平行執行
+    空檔內沒有固定行程，只要總長度放得下子問題一定可行。
+    row_of：可選，C 只放不同智能的成本列時，row_of[i] 為任務 i 使用的列（同 build_model）
+    """
+    C = np.asarray(C, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    row_of = np.arange(n) if row_of is None else np.asarray(row_of)
+
+    gap_starts, gap_ends = busy.free_gaps(Ts_slots, Te_slots)
+    gap_lengths = gap_ends - gap_starts
+    keep = gap_lengths >= durations.min(initial=1)
+    gap_starts, gap_ends, gap_lengths = gap_starts[keep], gap_ends[keep], gap_lengths[keep]
+    if len(gap_starts) == 0:
+        return None
+
+    P = window_cost_prefix(C)
+    gap_of = assign_tasks_to_gaps(durations, gap_lengths,
+                                  best_cost_in_gaps(P, durations, gap_starts, gap_ends, row_of), time_limit)
+    if gap_of is None:
+        return None
+
+    jobs, members = [], []
+    for g in np.unique(gap_of):
+        tasks = np.flatnonzero(gap_of == g)
+        gs, ge = int(gap_starts[g]), int(gap_ends[g])
+        rows, local_row_of = np.unique(row_of[tasks], return_inverse=True)
+        jobs.append((C[rows][:, gs:ge], durations[tasks], gs, ge, time_limit, local_row_of))
+        members.append(tasks)
+    print(f"🧩 分解為 {len(jobs)} 個空檔子問題（共 {len(gap_starts)} 個空檔）")
+
+    if parallel and len(jobs) > 1:
+        results = list(get_process_pool().map(_solve_gap, jobs))
+    else:
+        results = [_solve_gap(job) for job in jobs]
+
+    starts = np.full(n, -1, dtype=np.int64)
+    for tasks, gap_starts_result in zip(members, results):
+        if gap_starts_result is None:
+            return None
+        starts[tasks] = gap_starts_result
+    cost = float((P[row_of, starts + durations] - P[row_of, starts]).sum())
+    return SolveResult(starts, cost, 0)
@@ -0,0 +1,109 @@
+import numpy as np
+from busy_index import BusyIndex
+from task_model import SLOTS_PER_HOUR
+
+
+class FatigueAccumulation:
+    """
+    疲勞累積（事件連續性）成本模型：
+    同一種智能的任務連續進行（中間休息少於 rest_gap 個 slot）時，後面的任務會更累。
+    任務 k 的成本 = 原本依時段的疲勞成本 * (1 + alpha * 之前連續同智能的時數)，連續時數上限為 cap_hours。
+    成本只與排序後相鄰任務有關，依開始時間掃過一次即可算完（O(n) 的 DP）。
+    """
+
+    def __init__(self, alpha=0.3, rest_gap=3, cap_hours=3.0):
+        self.alpha = alpha
+        self.rest_gap = rest_gap
+        self.cap_slots = cap_hours * SLOTS_PER_HOUR
+
+    def task_costs(self, starts, durations, codes, base_costs):
+        """
+        回傳每個任務考慮累積疲勞後的成本。
+        - base_costs：每個任務在目前位置的原始成本（window cost）
+        - codes：智能代碼，-1（未知）不累積
+        """
+        starts = np.asarray(starts)
+        order = np.argsort(starts, kind="stable")
+        costs = np.asarray(base_costs, dtype=np.float64).copy()
+        run = 0
+        prev_start, prev_end, prev_code = None, None, None
+        for k in order:
+            if starts[k] < 0:
+                continue
+            code = codes[k]
+            if code >= 0 and code == prev_code and starts[k] - prev_end < self.rest_gap:
+                run = min(run + (prev_end - prev_start), self.cap_slots)
+            else:
+                run = 0
+            costs[k] *= 1.0 + self.alpha * run / SLOTS_PER_HOUR
+            prev_start, prev_end, prev_code = starts[k], starts[k] + durations[k], code
+        return costs
+
+    def total(self, starts, durations, codes, P, row_of=None):
+        """P 為 window_cost_prefix(C)，任務 i 使用第 row_of[i] 列（省略時為第 i 列）；回傳排程的總成本（含累積疲勞）"""
+        starts = np.asarray(starts)
+        durations = np.asarray(durations)
+        idx = np.flatnonzero(starts >= 0)
+        rows = idx if row_of is None else np.asarray(row_of)[idx]
+        base = np.zeros(len(starts))
+        base[idx] = P[rows, starts[idx] + durations[idx]] - P[rows, starts[idx]]
+        return float(self.task_costs(starts, durations, codes, base).sum())
+
+
+def improve_sequence(starts, durations, codes, P, busy: BusyIndex, lo, hi, model: FatigueAccumulation,
+                     max_passes=5, row_of=None):
+    """
+    以累積疲勞成本為目標的局部搜尋，可接在任何求解器（精確 / 分解 / 滾動）之後：
+    - relocate：把一個任務移到其他可行位置（例如在同智能任務之間插入休息）
+    - swap：交換排序上相鄰的兩個任務
+    每個候選解都用 FatigueAccumulation.total 以 O(n) 重新評估，只接受讓總成本下降的移動。
+    row_of：P 只放不同智能的前綴和時，任務 i 使用第 row_of[i] 列。
+    回傳 (新的 starts, 總成本)。
+    """
+    starts = np.asarray(starts, dtype=np.int64).copy()
+    durations = np.asarray(durations, dtype=np.int64)
+    codes = np.asarray(codes)
+    best = model.total(starts, durations, codes, P, row_of)
+    placed = np.flatnonzero(starts >= 0)
+
+    for _ in range(max_passes):
+        improved = False
+
+        # relocate
+        for i in placed:
+            occupied = busy.copy()
+            others = placed[placed != i]
+            occupied.add_many(starts[others], starts[others] + durations[others])
+            candidates = np.flatnonzero(occupied.feasible_starts(int(durations[i]), lo, hi)) + lo
+            original = starts[i]
+            for s in candidates:
+                if s == original:
+                    continue
+                starts[i] = s
+                total = model.total(starts, durations, codes, P, row_of)
+                if total < best - 1e-9:
+                    best, original, improved = total, s, True
+            starts[i] = original
+
+        # swap：相鄰（中間沒有其他任務）的兩個任務交換順序，整段起點不變
+        order = placed[np.argsort(starts[placed])]
+        for a, b in zip(order[:-1], order[1:]):
+            s_a, s_b = starts[a], starts[b]
+            gap = s_b - (s_a + durations[a])
+            new_b, new_a = s_a, s_a + durations[b] + gap
+            occupied = busy.copy()
+            others = placed[(placed != a) & (placed != b)]
+            occupied.add_many(starts[others], starts[others] + durations[others])
+            if not (occupied.is_free(int(new_b), int(durations[b])) and occupied.is_free(int(new_a), int(durations[a]))
+                    and new_a + durations[a] <= hi):
+                continue
+            starts[a], starts[b] = new_a, new_b
+            total = model.total(starts, durations, codes, P, row_of)
+            if total < best - 1e-9:
+                best, improved = total, True
+            else:
+                starts[a], starts[b] = s_a, s_b
+
+        if not improved:
+            break
+    return starts, best
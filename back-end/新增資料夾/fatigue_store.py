@@ -0,0 +1,218 @@
+import os
+import json
+import datetime
+import threading
+import numpy as np
+from task_model import INTELLIGENCE_LABELS, SLOTS_PER_DAY, SLOTS_PER_HOUR
+
+NUM_INTELLIGENCES = len(INTELLIGENCE_LABELS)
+
+# 存放位置可用環境變數 FATIGUE_STORE_DIR 覆蓋
+DEFAULT_STORE_DIR = os.environ.get("FATIGUE_STORE_DIR", "fatigue_store")
+
+
+class FatigueStore:
+    """
+    所有使用者疲勞曲線的本機欄式儲存：
+    - curves.f32：float32 陣列檔，形狀 users x 8 智能 x 288 slot，以唯讀 memmap 開啟，
+      同一台機器上所有 uvicorn worker 共用 OS 的 page cache
+    - index.json：{"rows": {uid: 列號}, "loaded": {uid: 已有曲線的智能代碼}, "last_sync": 最後同步到的 updatedAt}
+    查詢是直接切 memmap（zero-copy），不需要再從 Firestore 讀取或逐一轉換 float。
+    新使用者只有評分過的智能有曲線，其餘智能在檔案中是 0；讀取端要用 loaded_mask 判斷，
+    沒有的智能改走 Firestore / 預設曲線，而不是當成「每個時段都不累」。
+    同步工作更新檔案後，index.json 的 mtime 會改變，讀取端下次查詢時重新對應。
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_DIR):
+        self.path = path
+        self.curves_path = os.path.join(path, "curves.f32")
+        self.index_path = os.path.join(path, "index.json")
+        self.rows = {}
+        self.loaded = {}
+        self.last_sync = None
+        self._curves = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            rows = index.get("rows", {})
+            curves = None
+            if rows:
+                curves = np.memmap(self.curves_path, dtype=np.float32, mode="r",
+                                   shape=(len(rows), NUM_INTELLIGENCES, SLOTS_PER_DAY))
+            self.rows, self.loaded, self._curves = rows, index.get("loaded", {}), curves
+            self.last_sync, self._mtime = index.get("last_sync"), mtime
+
+    @property
+    def version(self):
+        """index.json 的 mtime，同步後會改變（尚未建立時為 None）"""
+        self._refresh()
+        return self._mtime
+
+    def has(self, uid: str) -> bool:
+        self._refresh()
+        return uid in self.rows
+
+    def curves(self, uid: str):
+        """該使用者 8 x 288 的疲勞成本（唯讀 view），不存在時回傳 None；沒有資料的智能為 0，見 loaded_mask"""
+        self._refresh()
+        row = self.rows.get(uid)
+        return None if row is None else self._curves[row]
+
+    def loaded_mask(self, uid: str) -> np.ndarray:
+        """長度 8 的 bool 陣列：該使用者哪些智能在檔案中有真正的曲線"""
+        self._refresh()
+        mask = np.zeros(NUM_INTELLIGENCES, dtype=bool)
+        mask[self.loaded.get(uid, [])] = True
+        return mask
+
+    def curves_with_fallback(self, uid: str, codes, fetch_missing) -> np.ndarray:
+        """
+        取 codes 對應的 len(codes) x 288 疲勞成本：已載入的智能直接切 memmap，
+        其餘（新使用者、尚未評分的智能）交給 fetch_missing(缺少的代碼) 取得（24 或 288 格皆可）
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        curves = self.curves(uid)
+        have = self.loaded_mask(uid)[codes] if curves is not None else np.zeros(len(codes), dtype=bool)
+        if have.all():
+            return curves[codes]
+        out = np.empty((len(codes), SLOTS_PER_DAY), dtype=np.float64)
+        if have.any():
+            out[have] = curves[codes[have]]
+        fetched = np.asarray(fetch_missing([int(c) for c in codes[~have]]), dtype=np.float64)
+        if fetched.shape[1] != SLOTS_PER_DAY:
+            fetched = np.repeat(fetched, SLOTS_PER_DAY // fetched.shape[1], axis=1)
+        out[~have] = fetched
+        return out
+
+
+class FatigueStoreWriter:
+    """
+    同步工作使用的寫入端：
+    - 既有使用者的曲線直接寫回 memmap（讀取端立即看得到）
+    - 有新使用者時重寫整個檔案（先寫暫存檔再 os.replace，讀取端不會看到寫一半的檔案）
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_DIR):
+        self.store = FatigueStore(path)
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def write_hourly(self, updates: dict):
+        """updates：{uid: {智能代碼: 24 格每小時成本}}，展開成 288 格後寫入"""
+        self.write({uid: {code: np.repeat(np.asarray(values, dtype=np.float32), SLOTS_PER_HOUR)[:SLOTS_PER_DAY]
+                          for code, values in by_code.items()} for uid, by_code in updates.items()})
+
+    def write(self, updates: dict, last_sync: str = None):
+        """
+        updates：{uid: {智能代碼: 288 格成本}}，只需給有變動的智能（寫入後標記為已載入）
+        last_sync：這次同步看到的最新 updatedAt（ISO 字串），寫入 index.json 供下次增量查詢
+        """
+        with self._lock:
+            self._write(updates, last_sync)
+
+    def _write(self, updates: dict, last_sync: str = None):
+        store = self.store
+        store._refresh()
+        rows = dict(store.rows)
+        new_uids = [uid for uid in updates if uid not in rows]
+
+        if new_uids:
+            old = np.asarray(store._curves) if store._curves is not None else \
+                np.zeros((0, NUM_INTELLIGENCES, SLOTS_PER_DAY), dtype=np.float32)
+            for uid in new_uids:
+                rows[uid] = len(rows)
+            data = np.zeros((len(rows), NUM_INTELLIGENCES, SLOTS_PER_DAY), dtype=np.float32)
+            data[:len(old)] = old
+            self._apply(data, rows, updates)
+            tmp = store.curves_path + ".tmp"
+            data.tofile(tmp)
+            os.replace(tmp, store.curves_path)
+        elif updates:
+            data = np.memmap(store.curves_path, dtype=np.float32, mode="r+",
+                             shape=(len(rows), NUM_INTELLIGENCES, SLOTS_PER_DAY))
+            self._apply(data, rows, updates)
+            data.flush()
+
+        loaded = {uid: list(codes) for uid, codes in store.loaded.items()}
+        for uid, by_code in updates.items():
+            loaded[uid] = sorted(set(loaded.get(uid, [])) | {int(code) for code in by_code})
+        if last_sync is None:
+            last_sync = store.last_sync
+        tmp = store.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "loaded": loaded, "last_sync": last_sync}, f, ensure_ascii=False)
+        os.replace(tmp, store.index_path)
+
+    @staticmethod
+    def _apply(data, rows, updates):
+        for uid, by_code in updates.items():
+            for code, values in by_code.items():
+                data[rows[uid], code] = values
+
+
+def sync_from_firestore(db, writer: FatigueStoreWriter, suffix_to_code: dict):
+    """
+    增量同步：只查詢 updatedAt 比上次同步晚的 users/{uid}/fatigue_logs/fatigue_{suffix} 文件並寫入。
+    第一次同步（尚無 last_sync）掃過全部文件；之後只有新寫入的曲線（write_fatigue_curves 會帶 updatedAt）
+    會被讀到。回傳更新的曲線數。
+    suffix_to_code：文件名稱 suffix（例如 "logical"）-> 智能代碼
+    """
+    writer.store._refresh()
+    last_sync = writer.store.last_sync
+    query = db.collection_group("fatigue_logs")
+    newest = datetime.datetime.fromisoformat(last_sync) if last_sync else None
+    if newest is not None:
+        query = query.where("updatedAt", ">", newest)
+    updates = {}
+    for doc in query.select(["values", "updatedAt"]).stream():
+        parts = doc.reference.path.split("/")
+        if len(parts) != 4 or parts[0] != "users" or not doc.id.startswith("fatigue_"):
+            continue
+        code = suffix_to_code.get(doc.id[len("fatigue_"):])
+        data = doc.to_dict() or {}
+        values = data.get("values")
+        if code is None or not isinstance(values, list) or not values:
+            continue
+        hourly = np.asarray(values, dtype=np.float32)
+        updates.setdefault(parts[1], {})[code] = np.repeat(hourly, SLOTS_PER_HOUR)[:SLOTS_PER_DAY]
+        stamp = data.get("updatedAt")
+        if stamp is not None and (newest is None or stamp > newest):
+            newest = stamp
+
+    if updates:
+        writer.write(updates, newest.isoformat() if newest is not None else None)
+    count = sum(len(v) for v in updates.values())
+    print(f"✅ 疲勞曲線同步完成：更新 {count} 條（{len(updates)} 位使用者）")
+    return count
+
+
+def start_sync_job(db, suffix_to_code: dict, interval_seconds=300, path: str = DEFAULT_STORE_DIR, writer=None):
+    """在背景 thread 每 interval_seconds 秒做一次增量同步，回傳停止用的 threading.Event"""
+    stop = threading.Event()
+    writer = writer or FatigueStoreWriter(path)
+
+    def loop():
+        while not stop.is_set():
+            try:
+                sync_from_firestore(db, writer, suffix_to_code)
+            except Exception as e:
+                print(f"❌ 疲勞曲線同步失敗: {e}")
+            stop.wait(interval_seconds)
+
+    threading.Thread(target=loop, daemon=True).start()
+    return stop
+
+
+fatigue_store = FatigueStore()
@@ -0,0 +1,149 @@
+import datetime
+import threading
+import numpy as np
+from task_model import INTELLIGENCE_LABELS, INTELLIGENCE_CODE
+
+NUM_INTELLIGENCES = len(INTELLIGENCE_LABELS)
+HOURS_PER_DAY = 24
+
+
+def _event_arrays(events):
+    """
+    把原始疲勞回饋轉成陣列：events 為 list of {"uid","intelligence","timestamp","rating"}，
+    intelligence 可為中文名稱或代碼，timestamp 為 ISO 字串或 epoch 秒。
+    回傳 (uids, codes, hours, times, ratings)，無法辨識的事件會被略過。
+    """
+    uids, codes, hours, times, ratings = [], [], [], [], []
+    for e in events:
+        code = e.get("intelligence")
+        code = INTELLIGENCE_CODE.get(code, -1) if isinstance(code, str) else int(code)
+        if not 0 <= code < NUM_INTELLIGENCES or e.get("rating") is None:
+            continue
+        ts = e.get("timestamp")
+        when = datetime.datetime.fromtimestamp(ts) if isinstance(ts, (int, float)) \
+            else datetime.datetime.fromisoformat(ts)
+        uids.append(e.get("uid") or "testUser")
+        codes.append(code)
+        hours.append(when.hour)
+        times.append(when.timestamp())
+        ratings.append(float(e["rating"]))
+    return uids, np.asarray(codes, dtype=np.int64), np.asarray(hours, dtype=np.int64), \
+        np.asarray(times, dtype=np.float64), np.asarray(ratings, dtype=np.float64)
+
+
+class FatigueAggregator:
+    """
+    由使用者的疲勞回饋（帶時間的評分）線上更新每位使用者、每種智能的 24 小時疲勞曲線。
+    採以時間衰減的 EWMA：每個 (使用者, 智能, 小時) 維護加權和 S 與權重 W，
+    事件權重為 exp((t - t_ref) / half_life 換算)，曲線 = S / W。
+    新事件只要把權重加進對應的格子（np.add.at），與事件順序無關，每筆 O(1)，不需要重算歷史。
+    第一次看到某使用者時以原本的曲線（prior）當作 prior_weight 筆舊回饋；prior 中為 nan 的部分視為沒有資料。
+    有變動的曲線記在 dirty，由 flush 批次寫出；還有小時既沒有回饋也沒有 prior 的曲線先不寫出，
+    避免把「沒有資料」寫成「不累」（0）交給排程使用。
+    """
+
+    def __init__(self, prior_lookup, half_life_days=14.0, prior_weight=5.0):
+        # prior_lookup(uid) -> 8 x 24 的現有曲線（沒有時回傳 None，個別智能沒有時該列為 nan）
+        self.prior_lookup = prior_lookup
+        self.tau = half_life_days * 86400.0 / np.log(2.0)
+        self.prior_weight = prior_weight
+        self.rows = {}                                        # uid -> 列號
+        self.S = np.zeros((0, NUM_INTELLIGENCES, HOURS_PER_DAY))
+        self.W = np.zeros((0, NUM_INTELLIGENCES, HOURS_PER_DAY))
+        self.dirty = np.zeros((0, NUM_INTELLIGENCES), dtype=bool)
+        self.t_ref = None
+        self._lock = threading.Lock()
+
+    def _row(self, uid):
+        row = self.rows.get(uid)
+        if row is not None:
+            return row
+        row = len(self.rows)
+        if row == len(self.S):
+            # 容量倍增，攤銷後新增使用者仍是 O(1)
+            grow = max(1, row)
+            self.S = np.concatenate([self.S, np.zeros((grow, NUM_INTELLIGENCES, HOURS_PER_DAY))])
+            self.W = np.concatenate([self.W, np.zeros((grow, NUM_INTELLIGENCES, HOURS_PER_DAY))])
+            self.dirty = np.concatenate([self.dirty, np.zeros((grow, NUM_INTELLIGENCES), dtype=bool)])
+        prior = self.prior_lookup(uid)
+        if prior is not None:
+            prior = np.asarray(prior, dtype=np.float64)
+            known = np.isfinite(prior)
+            self.W[row] = np.where(known, self.prior_weight, 0.0)
+            self.S[row] = np.where(known, self.prior_weight * prior, 0.0)
+        self.rows[uid] = row
+        return row
+
+    def _rescale(self, t_max):
+        """權重是以 t_ref 為基準的指數，時間往前推太多時整體縮放，避免溢位"""
+        if self.t_ref is None:
+            self.t_ref = t_max
+            return
+        shift = t_max - self.t_ref
+        if shift > 20 * self.tau:
+            factor = np.exp(-shift / self.tau)
+            self.S *= factor
+            self.W *= factor
+            self.t_ref = t_max
+
+    def ingest(self, events):
+        """加入一批事件，回傳實際採用的事件數"""
+        uids, codes, hours, times, ratings = _event_arrays(events)
+        if len(ratings) == 0:
+            return 0
+        with self._lock:
+            rows = np.array([self._row(uid) for uid in uids], dtype=np.int64)
+            self._rescale(times.max())
+            w = np.exp((times - self.t_ref) / self.tau)
+            np.add.at(self.S, (rows, codes, hours), w * ratings)
+            np.add.at(self.W, (rows, codes, hours), w)
+            self.dirty[rows, codes] = True
+        return len(ratings)
+
+    def curve(self, uid, code):
+        """目前的 24 小時曲線（沒有任何資料的小時為 nan）"""
+        row = self.rows.get(uid)
+        if row is None:
+            return None
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.S[row, code] / self.W[row, code]
+
+    def flush(self, sinks):
+        """
+        把有變動、且 24 小時都有資料（回饋或 prior）的曲線一次交給所有 sink：sink({uid: {智能代碼: 24 格曲線}})。
+        還有空白小時的曲線保留 dirty，等之後補齊。回傳寫出的曲線數。
+        """
+        with self._lock:
+            rows_, codes_ = np.nonzero(self.dirty)
+            complete = (self.W[rows_, codes_] > 0).all(axis=1)
+            if not complete.all():
+                print(f"⚠️ {int((~complete).sum())} 條疲勞曲線還有沒有資料的小時，暫不寫出")
+            rows_, codes_ = rows_[complete], codes_[complete]
+            if len(rows_) == 0:
+                return 0
+            curves = self.S[rows_, codes_] / self.W[rows_, codes_]
+            self.dirty[rows_, codes_] = False
+        uid_of = {row: uid for uid, row in self.rows.items()}
+        updates = {}
+        for row, code, values in zip(rows_, codes_, curves):
+            updates.setdefault(uid_of[int(row)], {})[int(code)] = values
+        for sink in sinks:
+            try:
+                sink(updates)
+            except Exception as e:
+                print(f"❌ 疲勞曲線寫出失敗: {e}")
+        return len(rows_)
+
+
+def start_flush_job(aggregator: FatigueAggregator, sinks, interval_seconds=60):
+    """在背景 thread 每 interval_seconds 秒 flush 一次，回傳停止用的 threading.Event"""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_seconds):
+            count = aggregator.flush(sinks)
+            if count:
+                print(f"✅ 已寫出 {count} 條更新後的疲勞曲線")
+
+    threading.Thread(target=loop, daemon=True).start()
+    return stop
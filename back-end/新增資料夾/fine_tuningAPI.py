@@ -2,23 +2,44 @@ import os
 import json
 import re
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import vertexai
 from vertexai.generative_models import GenerativeModel
 from google.oauth2 import service_account
+from semantic_cache import mission_index
+
+# vertexai.init 會改寫 SDK 的全域設定，不是 thread-safe；同一個 endpoint 只初始化一次，之後各段共用模型物件
+_endpoint_models = {}
+_endpoint_lock = threading.Lock()
+
+def get_endpoint_model(project_id: str, location: str, endpoint_id: str, credentials=None):
+    """
+    取得端點模型（支援 credentials 為 None 使用 ADC）；第一次呼叫時在鎖內執行 vertexai.init 並建立模型，
+    之後直接回傳同一個物件，平行送出的各段只做 generate_content。
+    """
+    key = (project_id, location, endpoint_id)
+    model = _endpoint_models.get(key)
+    if model is not None:
+        return model
+    with _endpoint_lock:
+        model = _endpoint_models.get(key)
+        if model is None:
+            if credentials:
+                vertexai.init(project=project_id, location=location, credentials=credentials)
+            else:
+                vertexai.init(project=project_id, location=location)
+            endpoint_path = f"projects/{project_id}/locations/{location}/endpoints/{endpoint_id}"
+            model = _endpoint_models[key] = GenerativeModel(endpoint_path)
+    return model
 
 def predict_with_endpoint(project_id: str, location: str, endpoint_id: str, credentials, prompt: str):
     """
-    使用端點 ID 執行一次請求（支援 credentials 為 None 使用 ADC）。
+    使用端點 ID 執行一次請求（端點只初始化一次，見 get_endpoint_model）。
     回傳生成文字（raw text）。
     """
-    if credentials:
-        vertexai.init(project=project_id, location=location, credentials=credentials)
-    else:
-        vertexai.init(project=project_id, location=location)
-    endpoint_path = f"projects/{project_id}/locations/{location}/endpoints/{endpoint_id}"
-    tuned_model = GenerativeModel(endpoint_path)
-    response = tuned_model.generate_content(prompt)
-    return response.text
+    model = get_endpoint_model(project_id, location, endpoint_id, credentials)
+    return model.generate_content(prompt).text
 
 def _extract_json_between_tokens(text, start="<<JSON_START>>", end="<<JSON_END>>"):
     m = re.search(re.escape(start) + r"(.*)" + re.escape(end), text, re.S)
@@ -36,16 +57,42 @@ def _extract_json_between_tokens(text, start="<<JSON_START>>", end="<<JSON_END>>
             body = text[a:b+1] if a != -1 and b > a else text
     return body
 
+# 已分類過的任務（mission 原文 -> intelligence），相同文字不再重複呼叫模型
+_classification_cache = {}
+
 def intelligent_task_analysis(missions: list):
     """
     批次呼叫 Vertex AI endpoint，回傳一個 list of {"mission":..., "intelligence":...}。
+    - 已分類過的任務直接使用快取，只把新的任務送給模型（全部命中時不呼叫模型）。
+    - 文字不同但與已分類任務夠相似（mission_index，字元 n-gram cosine）的也直接沿用，命中會留下紀錄。
     - 會自動嘗試從 my-key.json 讀取 credentials，找不到時使用 ADC。
     - 使用 start/end token、重試與 mission 補回機制以增加穩定性。
     """
-    PROJECT_ID = "task-focus-4i2ic"
-    LOCATION = "us-central1"
-    ENDPOINT_ID = "4155910960923541504"
-
+    todo = [m for m in dict.fromkeys(missions) if m not in _classification_cache]
+    if todo:
+        for mission, hit in zip(todo, mission_index.lookup(todo)):
+            if hit is not None:
+                _classification_cache[mission] = hit[0]
+        todo = [m for m in todo if m not in _classification_cache]
+    if todo:
+        # 模型回傳與輸入依序一一對應（見 _classify_with_model 的補回機制），以位置對應原文
+        classified = _classify_with_model(todo)
+        for mission, item in zip(todo, classified):
+            if item.get("intelligence"):
+                _classification_cache[mission] = item["intelligence"]
+        # 只有模型實際分類過的任務才加入相似索引，避免近似命中一路傳遞
+        mission_index.add(todo, [item.get("intelligence", "") for item in classified])
+    return [{"mission": m, "intelligence": _classification_cache.get(m, "")} for m in missions]
+
+# 分類用的 endpoint 與分段設定（長清單切成多段平行送出，每段最多 CHUNK_SIZE 個任務）
+PROJECT_ID = "task-focus-4i2ic"
+LOCATION = "us-central1"
+ENDPOINT_ID = "4155910960923541504"
+CHUNK_SIZE = int(os.environ.get("CLASSIFY_CHUNK_SIZE", 15))
+MAX_CONCURRENCY = int(os.environ.get("CLASSIFY_MAX_CONCURRENCY", 4))
+ALLOWED_LABELS = {"語言智能", "邏輯數理智能", "空間智能", "肢體動覺智能", "音樂智能", "人際關係智能", "自省智能", "自然辨識智能"}
+
+def _load_credentials():
     key_path = "my-key.json"
     credentials = None
     if os.path.exists(key_path):
@@ -53,7 +100,9 @@ def intelligent_task_analysis(missions: list):
             credentials = service_account.Credentials.from_service_account_file(key_path)
         except Exception as e:
             print(f"⚠️ 載入金鑰失敗，將使用 ADC（若未設定會失敗）: {e}")
+    return credentials
 
+def _build_prompt(missions: list) -> str:
     # 構建批次 prompt（移除可能誤導的示例，明確要求保留原文字與順序，限制 label 集合）
     tasks_text = "\n".join(f"{i+1}. {m}" for i, m in enumerate(missions))
     prompt = f"""
@@ -79,48 +128,78 @@ Output exactly in this form and nothing else outside the tokens:
 ]
 <<JSON_END>>
 """
+    return prompt
 
-    max_retries = 2
-    last_exc = None
-    for attempt in range(1, max_retries + 1):
+def _parse_chunk(raw: str, missions: list) -> list:
+    """
+    解析一段回應，回傳與 missions 同長度的 intelligence list；
+    個別項目格式錯誤或 label 不在允許集合內時該位置為 None（只重送這些項目），整段無法解析時拋出例外。
+    """
+    parsed = json.loads(_extract_json_between_tokens(raw))
+    if not isinstance(parsed, list):
+        raise ValueError("parsed result is not a list")
+
+    # 模型可能改寫 mission 文字；數量相符時以位置對應，數量不符時只採用 mission 原文相符的項目
+    by_text = {item.get("mission"): item for item in parsed if isinstance(item, dict)}
+    labels = []
+    for i, mission in enumerate(missions):
+        item = parsed[i] if len(parsed) == len(missions) else by_text.get(mission)
+        label = item.get("intelligence") if isinstance(item, dict) else None
+        labels.append(label.strip() if isinstance(label, str) and label.strip() in ALLOWED_LABELS else None)
+    return labels
+
+def _classify_chunk(missions: list, model, max_retries=2) -> list:
+    """用已初始化的端點模型分類一段任務；失敗的項目（None）單獨重送，最多 max_retries 次"""
+    labels = [None] * len(missions)
+    pending = list(range(len(missions)))
+    for attempt in range(1, max_retries + 2):
+        batch = [missions[i] for i in pending]
         try:
-            raw = predict_with_endpoint(PROJECT_ID, LOCATION, ENDPOINT_ID, credentials, prompt)
-            body = _extract_json_between_tokens(raw)
-            parsed = json.loads(body)
-
-            # 基本 schema 驗證
-            if not isinstance(parsed, list):
-                raise ValueError("parsed result is not a list")
-            for obj in parsed:
-                if not isinstance(obj, dict) or "mission" not in obj or "intelligence" not in obj:
-                    raise ValueError("item missing required keys")
-
-            # 若模型回傳的 mission 欄位為佔位符或數量不符，使用原始 missions 依序補回，保留 intelligence
-            def is_placeholder(m):
-                if not isinstance(m, str):
-                    return True
-                mm = m.strip().lower()
-                return mm == "" or mm.startswith("task") or mm.startswith("example")
-
-            need_fix = (len(parsed) != len(missions)) or any(is_placeholder(item.get("mission")) for item in parsed)
-            if need_fix:
-                print("⚠️ 模型回傳的 mission 欄位不可靠，使用輸入 missions 依序補回（保留模型提供的 intelligence）")
-                fixed = []
-                for i, orig in enumerate(missions):
-                    intelligence = ""
-                    if i < len(parsed) and isinstance(parsed[i], dict):
-                        intelligence = parsed[i].get("intelligence", "") or ""
-                    fixed.append({"mission": orig, "intelligence": intelligence})
-                parsed = fixed
-
-            print("\n--- 最終分析結果陣列 ---")
-            print(json.dumps(parsed, ensure_ascii=False, indent=2))
-            return parsed
-
+            raw = model.generate_content(_build_prompt(batch)).text
+            for i, label in zip(pending, _parse_chunk(raw, batch)):
+                labels[i] = label
         except Exception as e:
-            last_exc = e
-            print(f"⚠️ 解析或呼叫失敗（嘗試 {attempt}/{max_retries}）：{e}")
+            print(f"⚠️ 解析或呼叫失敗（{len(batch)} 個任務，嘗試 {attempt}/{max_retries + 1}）：{e}")
+        pending = [i for i in pending if labels[i] is None]
+        if not pending:
+            break
+        if attempt <= max_retries:
             time.sleep(1.5 * attempt)
+    return labels
+
+def _chunks(missions: list, size: int) -> list:
+    """平均切段：例如 31 個任務、上限 15 會切成 11 / 10 / 10，而不是 15 / 15 / 1"""
+    if not missions:
+        return []
+    count = -(-len(missions) // size)
+    step = -(-len(missions) // count)
+    return [missions[k:k + step] for k in range(0, len(missions), step)]
 
-    # 全部重試失敗
-    raise RuntimeError(f"解析模型回傳失敗: {last_exc}")
+def _classify_with_model(missions: list):
+    """
+    實際呼叫模型分類（不經過快取）：
+    - 任務清單平均切成多段，同時最多 MAX_CONCURRENCY 段平行送出（延遲約等於一段）
+    - 每段各自驗證 JSON，只重送該段中失敗的項目，不會整批重來
+    - 依原本順序合併；重試後仍失敗的項目 intelligence 為 ""
+    回傳 list of {"mission","intelligence"}；全部失敗時拋出 RuntimeError。
+    """
+    # 在主 thread 初始化一次端點，各段 worker 只負責送出請求
+    model = get_endpoint_model(PROJECT_ID, LOCATION, ENDPOINT_ID, _load_credentials())
+    chunks = _chunks(list(missions), CHUNK_SIZE)
+    if len(chunks) > 1:
+        print(f"🧩 分類 {len(missions)} 個任務，切成 {len(chunks)} 段平行送出")
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(chunks))) as pool:
+            labels = [l for part in pool.map(lambda c: _classify_chunk(c, model), chunks) for l in part]
+    else:
+        labels = [l for c in chunks for l in _classify_chunk(c, model)]
+
+    if missions and all(l is None for l in labels):
+        raise RuntimeError("解析模型回傳失敗：所有任務都無法分類")
+    failed = sum(l is None for l in labels)
+    if failed:
+        print(f"⚠️ 有 {failed} 個任務重試後仍無法分類")
+
+    results = [{"mission": m, "intelligence": l or ""} for m, l in zip(missions, labels)]
+    print("\n--- 最終分析結果陣列 ---")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    return results
@@ -1,30 +1,83 @@
+import os
 import numpy as np
 import firebase_admin
 from firebase_admin import credentials, firestore
+from weekly_schedule import week_key, task_list_path, stale_task_doc_ids
+from task_model import INTELLIGENCE_CODE, INTELLIGENCE_LABELS
 
 # Firebase 初始化（只執行一次）
 cred = credentials.Certificate("/home/improj/jack_FastAPI/task-focus-4i2ic-3d473316080f.json")
 firebase_admin.initialize_app(cred)
 db = firestore.client()
-def get_base_cost_from_firebase(analysis_results: list):
+
+# 使用者還沒有某種智能的曲線時，改用這個使用者的曲線當預設值（原本所有人都讀 testUser 的曲線）
+DEFAULT_FATIGUE_UID = os.environ.get("DEFAULT_FATIGUE_UID", "testUser")
+
+# fatigue_logs 文件快取（(uid, doc_name) -> values），曲線更新時呼叫 invalidate_fatigue_cache
+_fatigue_cache = {}
+
+def invalidate_fatigue_cache(uids=None):
+    """清掉曲線快取；給 uids 時只清這些使用者的"""
+    if uids is None:
+        _fatigue_cache.clear()
+        return
+    uids = set(uids)
+    for key in [key for key in _fatigue_cache if key[0] in uids]:
+        del _fatigue_cache[key]
+
+CHINESE_TO_DOC_SUFFIX = {
+    "語言智能": "linguistic",
+    "邏輯數理智能": "logical",
+    "空間智能": "spatial",
+    "肢體動覺智能": "bodily_kinesthetic",
+    "音樂智能": "musical",
+    "人際關係智能": "interpersonal",
+    "自省智能": "intrapersonal",
+    "自然辨識智能": "naturalistic"
+}
+
+# fatigue_logs 文件名稱 suffix -> 智能代碼（同步到本機 fatigue_store 時使用）
+SUFFIX_TO_CODE = {suffix: INTELLIGENCE_CODE[label] for label, suffix in CHINESE_TO_DOC_SUFFIX.items()}
+
+def fatigue_doc_name(itype: str) -> str:
+    """智能名稱（中文或 fatigue_xxx）對應的 fatigue_logs 文件名稱"""
+    key = itype.strip()
+    if key.startswith("fatigue_"):
+        suffix = key[len("fatigue_"):].lower()
+    else:
+        suffix = CHINESE_TO_DOC_SUFFIX.get(key)
+        if suffix is None:
+            suffix = key.lower()
+    return f"fatigue_{suffix}"
+
+def _fatigue_ref(uid: str, doc_name: str):
+    return db.collection("users").document(uid) \
+             .collection("fatigue_logs").document(doc_name)
+
+def prefetch_fatigue_curves(labels, uid: str = "testUser"):
     """
-    從 Firebase 根據任務分析結果讀取多個成本資料，回傳 numpy 2D array。
+    批次預先抓取一位使用者的多條疲勞曲線（一次 get_all，而不是每條一個請求），放進 _fatigue_cache。
+    labels：智能名稱的集合；已快取的不會重抓。
+    """
+    names = sorted({fatigue_doc_name(l) for l in labels if isinstance(l, str) and l.strip()}
+                   - {name for key_uid, name in _fatigue_cache if key_uid == uid})
+    if not names:
+        return
+    for doc in db.get_all([_fatigue_ref(uid, name) for name in names]):
+        data = doc.to_dict() if doc.exists else None
+        if data and isinstance(data.get("values"), list):
+            _fatigue_cache[(uid, doc.id)] = [round(float(v), 1) for v in data["values"]]
+    print(f"✅ 預先抓取 {uid} 的 {len(names)} 條疲勞曲線")
+
+def get_base_cost_from_firebase(analysis_results: list, uid: str = "testUser"):
+    """
+    從 Firebase 根據任務分析結果讀取使用者 uid 的多個成本資料，回傳 numpy 2D array。
     支援 analysis_results 中 intelligence 為單一中文字串或字串陣列。
+    使用者還沒有某種智能的曲線時，改用 DEFAULT_FATIGUE_UID 的同一種曲線。
     若多個任務指向相同 intelligence，輸出會保留多個相同的 rows（但只會實際 fetch 一次）。
     """
-    CHINESE_TO_DOC_SUFFIX = {
-        "語言智能": "linguistic",
-        "邏輯數理智能": "logical",
-        "空間智能": "spatial",
-        "肢體動覺智能": "bodily_kinesthetic",
-        "音樂智能": "musical",
-        "人際關係智能": "interpersonal",
-        "自省智能": "intrapersonal",
-        "自然辨識智能": "naturalistic"
-    }
-
     costs = []
-    cache = {}  # doc_name -> values list（快取，避免重複 fetch）
+    cache = _fatigue_cache  # (uid, doc_name) -> values list（跨請求快取，避免重複 fetch）
 
     for result in analysis_results:
         intelligence_field = result.get("intelligence")
@@ -37,31 +90,23 @@ def get_base_cost_from_firebase(analysis_results: list):
             if not isinstance(itype, str):
                 raise ValueError(f"❌ 不支援的 intelligence 類型: {type(itype)}")
 
-            key = itype.strip()
-            if key.startswith("fatigue_"):
-                suffix = key[len("fatigue_"):].lower()
-            else:
-                suffix = CHINESE_TO_DOC_SUFFIX.get(key)
-                if suffix is None:
-                    suffix = key.lower()
-
-            doc_name = f"fatigue_{suffix}"
+            doc_name = fatigue_doc_name(itype)
 
             # 若已快取，直接重複使用（保留多筆輸出）
-            if doc_name in cache:
-                values = cache[doc_name]
+            if (uid, doc_name) in cache:
+                values = cache[(uid, doc_name)]
                 costs.append(values)
                 continue
 
             # 否則從 Firestore 取一次並快取
-            doc_ref = fs_db.collection("users").document("testUser") \
-                        .collection("fatigue_logs").document(doc_name)
-            doc = doc_ref.get()
+            doc = _fatigue_ref(uid, doc_name).get()
+            if not doc.exists and uid != DEFAULT_FATIGUE_UID:
+                doc = _fatigue_ref(DEFAULT_FATIGUE_UID, doc_name).get()
             if doc.exists:
                 data = doc.to_dict()
                 if 'values' in data and isinstance(data['values'], list):
                     values = [round(float(v), 1) for v in data['values']]
-                    cache[doc_name] = values
+                    cache[(uid, doc_name)] = values
                     costs.append(values)
                 else:
                     raise ValueError(f"❌ 文件 '{doc_name}' 的 'values' 欄位不存在或格式錯誤")
@@ -72,3 +117,100 @@ def get_base_cost_from_firebase(analysis_results: list):
         raise ValueError("❌ 未能從 Firebase 獲取任何成本資料")
 
     return np.array(costs)
+
+def write_fatigue_curves(updates: dict):
+    """
+    把線上更新後的疲勞曲線批次寫回 users/{uid}/fatigue_logs/fatigue_{suffix}。
+    updates：{uid: {智能代碼: 24 格曲線}}；寫完後清掉曲線快取。
+    """
+    ops = []
+    for uid, by_code in updates.items():
+        for code, values in by_code.items():
+            ref = _fatigue_ref(uid, fatigue_doc_name(INTELLIGENCE_LABELS[code]))
+            ops.append((ref, {"values": [round(float(v), 1) for v in values], "updatedAt": firestore.SERVER_TIMESTAMP}))
+    written = commit_in_batches(ops)
+    invalidate_fatigue_cache(updates)
+    return written
+
+def write_weekly_schedule(uid: str, date_str: str, packed_day: dict):
+    """
+    把一天的壓縮排程寫入 users/{uid}/weekly_schedule/{YYYY-Www}，
+    與 users/{uid}/tasks/{year}/{month}/{day}/task_list 的任務文件並存。
+    只覆蓋 days.{date_str} 這一天，其他天保持不變。
+    """
+    weekly_schedule_ref(uid, date_str).set(weekly_schedule_update(date_str, packed_day), merge=True)
+
+def weekly_schedule_ref(uid: str, date_str: str):
+    return db.collection("users").document(uid) \
+             .collection("weekly_schedule").document(week_key(date_str))
+
+def weekly_schedule_update(date_str: str, packed_day: dict) -> dict:
+    return {"days": {date_str: packed_day}, "updatedAt": firestore.SERVER_TIMESTAMP}
+
+def task_list_ref(uid: str, date_str: str):
+    return db.collection(task_list_path(uid, date_str))
+
+def task_doc_ref(uid: str, date_str: str, doc_id: str):
+    return task_list_ref(uid, date_str).document(doc_id)
+
+def stale_task_doc_refs(uid: str, date_str: str, owner: str, count: int):
+    """使用者當天 task_list 中屬於 owner、編號 >= count 的文件（排程變短後留下的舊任務，需要刪除）"""
+    refs = {ref.id: ref for ref in task_list_ref(uid, date_str).list_documents()}
+    return [refs[doc_id] for doc_id in stale_task_doc_ids(refs, date_str, owner, count)]
+
+# Firestore 每個 WriteBatch 最多 500 筆操作
+BATCH_WRITE_LIMIT = 500
+
+def commit_in_batches(ops, limit: int = BATCH_WRITE_LIMIT):
+    """
+    以 WriteBatch 批次寫入（每批最多 limit 筆）。
+    ops：list of (document_ref, data)，以 merge=True 寫入；data 為 None 代表刪除該文件。回傳成功寫入的筆數。
+    """
+    written = 0
+    for k in range(0, len(ops), limit):
+        batch = db.batch()
+        chunk = ops[k:k + limit]
+        for ref, data in chunk:
+            if data is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, data, merge=True)
+        try:
+            batch.commit()
+            written += len(chunk)
+        except Exception as e:
+            print(f"❌ 批次寫入第 {k // limit + 1} 批發生錯誤:", e)
+    return written
+
+def get_weekly_schedule(uid: str, week: str):
+    """讀取一份週排程文件，不存在時回傳 None"""
+    doc = db.collection("users").document(uid) \
+            .collection("weekly_schedule").document(week).get()
+    return doc.to_dict() if doc.exists else None
+
+#[IC] 從 Firebase 抓取指定日期的固定行程（裁切到可排時段交給 BusyIndex 處理）
+def get_tasks_from_firebase(date_str: str, uid: str = "testUser"):
+    """
+    從 Firebase 抓取指定使用者 (uid) 在 date_str (YYYY-MM-DD) 的固定行程，
+    回傳 list of {"Fixed_schedule","desc","startTime","endTime","index","intelligence"}。
+    """
+    tasks = []
+    tasks_ref = db.collection("Tasks").document(uid) \
+                  .collection("task_list").document(date_str) \
+                  .collection("tasks")
+
+    for doc in tasks_ref.stream():
+        data = doc.to_dict()
+        if not data or not data.get("Fixed_schedule", False):
+            continue  # 只保留固定行程
+
+        tasks.append({
+            "Fixed_schedule": True,
+            "desc": data.get("desc", ""),
+            "startTime": data.get("startTime", "00:00"),
+            "endTime": data.get("endTime", "00:00"),
+            "index": data.get("index", 0),
+            "intelligence": data.get("intelligence", "")
+        })
+
+    return tasks
@@ -1,124 +1,365 @@
 import numpy as np
 import math
-from scipy.optimize import milp, LinearConstraint, Bounds
-from firebase import get_base_cost_from_firebase, db
+import time
+from firebase import get_base_cost_from_firebase, get_tasks_from_firebase, get_weekly_schedule, db
+from firebase import task_doc_ref, stale_task_doc_refs, weekly_schedule_ref, weekly_schedule_update, commit_in_batches, prefetch_fatigue_curves
 from fine_tuningAPI import intelligent_task_analysis
+from weekly_schedule import weekly_cache, read_day_packed, merge_packed_day, task_doc_id
+from task_model import TaskBatch, Schedule, SLOTS_PER_HOUR, SLOTS_PER_DAY, intelligence_codes, parse_window
+from task_model import INTELLIGENCE_LABELS
+from cost_table import get_cost_table
+from fatigue_store import fatigue_store
+from timeline import timeline_dates, build_cost_timeline, build_busy_timeline
+from solver import solve_schedule, window_cost_prefix, build_model, solve_model, solve_k_best, solve_schedule_job
+from metrics import span, record_model, record_solve
+from process_pool import get_process_pool
+from concurrent.futures import ThreadPoolExecutor
+from alternatives import alternatives_cache
+from fatigue_cost import FatigueAccumulation, improve_sequence
+from rolling_horizon import daily_windows, solve_rolling
+from decompose import solve_decomposed
+from preemptive import solve_preemptive
+from reoptimize import ProblemState, remember_state, get_state, reoptimize
+from busy_index import invalidate_day_busy_index, event_intervals
+from scenarios import Scenario, solve_scenarios
+from replay import ReplayCapture, capture_if_slow
+from online_scheduler import online_scheduler
 
-def write_results_to_firebase(date_str, schedule_results):
-    year, month, day = date_str.split("-")
-    for idx, task in enumerate(schedule_results):
-        try:
-            db.collection("tasks").document(year) \
-              .collection(month).document(day) \
-              .collection("task_list").document(str(idx)) \
-              .set(task, merge=True) 
-            print(f"✅ 成功寫入任務 {idx} 資料")
-        except Exception as e:
-            print(f"❌ 寫入任務 {idx} 發生錯誤:", e)
-
-def schedule_tasks(Ts, Te, durations, date_str, desc_list, fixed_list):#[IC]add fixed_list
-    """接收參數並執行任務排程運算"""
-    slots_per_hour = 12
-    Ts_slots = int(Ts * slots_per_hour)
-    Te_slots = int(Te * slots_per_hour)
-    time_slots = Te_slots - Ts_slots + 1
-    n = len(durations)
-    total_slots = 24 * slots_per_hour
-    fixed_list_len = len(fixed_list) #[IC]找有多少個任務
-
-    intelligent_analysis_results = intelligent_task_analysis(desc_list)#分類8大智能(陣列形式)
-
-    base_cost = get_base_cost_from_firebase(intelligent_analysis_results)#把分類完的陣列輸入去firebase去抓對應的疲勞度
-    #目前不確定抓回來的樣子會長怎樣
-    extended_cost = np.repeat(base_cost, slots_per_hour, axis=1)[:, :total_slots]
-
-    if n > base_cost.shape[0]:
-        repeat_times = math.ceil(n / base_cost.shape[0])
-        C = np.tile(extended_cost, (repeat_times, 1))[:n, :]
+def write_results_to_firebase(date_str, schedule: Schedule, uid="testUser", version=None, keep_online_plan=False,
+                              owner=None):
+    """
+    寫入某天的排程（每個任務一份文件 + 週文件）。
+    owner：這批任務所屬排程請求的開始日（預設為 date_str）；跨夜延伸到 date_str 的任務只取代同一個 owner 的舊任務。
+    整天被重新排過時，記憶體中的線上排程（online_scheduler 的 DayPlan）已過期，一併丟棄，
+    下次臨時插入時會依新排程重新載入；線上插入 / 移除自己寫回時傳 keep_online_plan=True。
+    """
+    if not keep_online_plan:
+        online_scheduler.drop(uid, date_str)
+    # 任務文件、刪除多出來的舊文件與週文件一起以 WriteBatch 寫入
+    ops = results_write_ops(date_str, schedule, uid, version, owner)
+    written = commit_in_batches(ops)
+    if written == len(ops):
+        weekly_cache.put_day(uid, date_str, ops[-1][1]["days"][date_str])
+        print(f"✅ 成功寫入 {date_str} 的 {len(schedule)} 個任務與週排程")
+    else:
+        print(f"❌ 寫入 {date_str} 排程不完整（{written}/{len(ops)} 筆）")
+
+def _fetch_costs(uid, codes):
+    """
+    取多種智能的疲勞曲線（len(codes) x 288）：本機 fatigue_store 已載入的智能直接切 memmap，
+    其餘智能（新使用者或尚未評分）逐一向 Firebase 取每小時曲線
+    """
+    return fatigue_store.curves_with_fallback(
+        uid, codes, lambda missing: get_base_cost_from_firebase(
+            [{"intelligence": INTELLIGENCE_LABELS[c]} for c in missing], uid))
+
+def fatigue_cost_table(uid="testUser"):
+    """該使用者共用的疲勞成本表（每種智能一列 288 格 + 前綴和）"""
+    return get_cost_table(uid, lambda codes: _fetch_costs(uid, codes), fatigue_store.version)
+
+def build_daily_cost(codes, uid="testUser"):
+    """
+    依每個任務自己的智能代碼查成本表，回傳 (rows, row_of)：
+    rows 為這批任務用到的不同智能的單日成本（m x 288），row_of[i] 為任務 i 使用的列
+    """
+    return fatigue_cost_table(uid).distinct(codes)
+
+def schedule_tasks(Ts_slots, Te_slots, batch: TaskBatch, date_str, uid="testUser", mode="exact", horizon_days=1,
+                   min_chunk=3, max_splits=2, fatigue_accumulation=False, k_best=1, request_id=None,
+                   k_best_min_shift=12, k_best_min_moved=1):
+    """
+    接收參數並執行任務排程運算
+    - Ts_slots / Te_slots: 可排時間區間（從 date_str 當天 00:00 起算的 slot，跨日 / 多日時 Te_slots > 288）
+    - batch: 待排任務（TaskBatch）
+    - mode: "exact" 整段一次求解；"rolling" 每天的 Ts ~ Te 依序求解，排不下的任務帶到下一天；
+            "decompose" 依固定行程切成空檔，先分配任務再平行求解各空檔；
+            "preemptive" 任務可切成數段（每段至少 min_chunk 個 slot，最多切 max_splits 次）
+    - horizon_days: rolling 模式涵蓋的天數
+    - fatigue_accumulation: 是否考慮同智能任務連續進行的疲勞累積（求解後做局部搜尋，preemptive 不適用）
+    - k_best / request_id: exact 模式下一次算出前 k_best 個不同排程，存進 alternatives_cache[request_id]；
+      每個排程與其他排程至少有 k_best_min_moved 個任務移動 k_best_min_shift 個 slot 以上
+    回傳 Schedule；找不到可行解時回傳 None（rolling 模式下未排入的任務不會出現在 Schedule 中）
+    整個請求超過 SLOW_REQUEST_SECONDS 秒時，輸入會存成重現檔（見 replay.py / replay_cli.py）
+    """
+    capture = ReplayCapture({
+        "Ts_slots": int(Ts_slots), "Te_slots": int(Te_slots), "date": date_str, "uid": uid, "mode": mode,
+        "horizon_days": horizon_days, "min_chunk": min_chunk, "max_splits": max_splits,
+        "fatigue_accumulation": fatigue_accumulation, "k_best": k_best, "request_id": request_id,
+        "k_best_min_shift": k_best_min_shift, "k_best_min_moved": k_best_min_moved,
+        "minutes": batch.minutes.tolist(), "desc": list(batch.desc), "fixed": batch.fixed.tolist(),
+    })
+    started = time.perf_counter()
+    try:
+        return _schedule_tasks(capture, Ts_slots, Te_slots, batch, date_str, uid, mode, horizon_days,
+                               min_chunk, max_splits, fatigue_accumulation, k_best, request_id,
+                               k_best_min_shift, k_best_min_moved)
+    except Exception as e:
+        capture.error = repr(e)
+        raise
+    finally:
+        capture_if_slow(capture, time.perf_counter() - started)
+
+def _schedule_tasks(capture: ReplayCapture, Ts_slots, Te_slots, batch: TaskBatch, date_str, uid, mode, horizon_days,
+                    min_chunk, max_splits, fatigue_accumulation, k_best, request_id, k_best_min_shift, k_best_min_moved):
+    """schedule_tasks 的本體；每個階段的輸入順便記到 capture"""
+    slots_per_hour = SLOTS_PER_HOUR
+    n = len(batch)
+
+    with span("classification", tasks=n):
+        intelligent_analysis_results = intelligent_task_analysis(batch.desc)#分類8大智能(陣列形式)
+    codes = intelligence_codes(intelligent_analysis_results, n)
+    capture.labels, capture.codes = intelligent_analysis_results, codes
+
+    with span("fatigue_fetch") as info:
+        daily_rows, row_of = build_daily_cost(codes, uid)
+        info["rows"] = len(daily_rows)
+    capture.daily_rows, capture.row_of = daily_rows, row_of
+
+    if mode == "rolling":
+        windows = daily_windows(Ts_slots, Te_slots, horizon_days)
+        horizon_end = windows[-1][1]
     else:
-        C = extended_cost[:n, :]
-
-    num_vars = n * time_slots
-    bounds = Bounds([0] * num_vars, [1] * num_vars)
-    integrality = np.ones(num_vars, dtype=bool)
-    
-    #中間要抓firebase裡的固定行程的起始結束時間
-
-    A_eq, b_eq = [], []
-    for i in range(n):
-        row = [0] * num_vars
-        for j in range(time_slots):
-            if j + durations[i] <= time_slots:
-                row[i * time_slots + j] = 1
-        A_eq.append(row)
-        b_eq.append(1)
-
-    A_ub, b_ub = [], []
-    for p in range(n):
-        for q in range(p + 1, n):
-            for jp in range(time_slots):
-                if jp + durations[p] > time_slots:
-                    continue
-                Sp = Ts_slots + jp
-                for jq in range(time_slots):
-                    if jq + durations[q] > time_slots:
-                        continue
-                    Sq = Ts_slots + jq
-                    if Sp < Sq + durations[q] and Sq < Sp + durations[p]:
-                        row = [0] * num_vars
-                        row[p * time_slots + jp] = 1
-                        row[q * time_slots + jq] = 1
-                        A_ub.append(row)
-                        b_ub.append(1)
-
-    c = []
-    for i in range(n):
-        for j in range(time_slots):
-            if j + durations[i] > time_slots:
-                c.append(1e6)
+        horizon_end = Te_slots
+
+    # 跨日 / 多日視窗：把每天的疲勞曲線接成一條連續時間軸
+    dates = timeline_dates(date_str, horizon_end)
+    # 每種智能一列（不是每個任務一列），所有求解模式、疲勞累積與增量重排都以 row_of 引用
+    C_rows = build_cost_timeline(daily_rows, len(dates))
+
+    #[IC] 抓 firebase 裡每天的固定行程，合併成忙碌索引；與固定行程重疊的開始位置在建模前就排除
+    # 每次送出排程都重新讀取，不依賴 change feed 是否正常運作
+    with span("fixed_fetch", days=len(dates)):
+        for day_str in dates:
+            invalidate_day_busy_index(uid, day_str)
+        busy = build_busy_timeline(uid, dates, get_tasks_from_firebase)
+    capture.num_days, capture.busy = len(dates), busy
+
+    # exact 模式（含 k_best）在這裡建模，其他模式在各自的求解器內建模
+    model = None
+    if mode not in ("rolling", "decompose", "preemptive"):
+        with span("model_build") as info:
+            try:
+                model = build_model(C_rows, batch.durations, Ts_slots, Te_slots, busy, row_of=row_of)
+                info.update(vars=model.num_vars, nnz=model.nnz)
+                capture.model = model
+                record_model(model)
+            except ValueError as e:
+                print(e)
+                info["error"] = str(e)
+
+    with span("solve", mode=mode) as info:
+        if mode == "rolling":
+            result = solve_rolling(C_rows, batch.durations, windows, busy, row_of=row_of)
+        elif mode == "decompose":
+            result = solve_decomposed(C_rows, batch.durations, Ts_slots, Te_slots, busy, row_of=row_of)
+        elif mode == "preemptive":
+            result = solve_preemptive(C_rows, batch.durations, Ts_slots, Te_slots, busy, min_chunk, max_splits,
+                                      row_of=row_of)
+        elif model is None:
+            result = None
+        elif k_best > 1:
+            # 同一個模型加 no-good cut 依序求出前 k 個排程，第一個即為最佳解
+            ranked = solve_k_best(model, k_best, k_best_min_shift, k_best_min_moved)
+            result = ranked[0] if ranked else None
+            if ranked and request_id:
+                alternatives_cache.put(request_id, date_str, uid, [
+                    {"rank": rank, "cost": r.cost, "schedule": Schedule.from_starts(r.starts, batch, codes)}
+                    for rank, r in enumerate(ranked)
+                ])
+        else:
+            result = solve_model(model)
+        record_solve(result)
+        if result is not None:
+            info.update(status=result.status, gap=result.mip_gap, nodes=result.node_count)
+
+    if result is not None and fatigue_accumulation and result.chunks is None:
+        # 疲勞累積：以原本的解為起點，依序列相關的成本做局部搜尋
+        allowed, lo, hi = busy, Ts_slots, Te_slots
+        if mode == "rolling":
+            # 只能在每天的 Ts ~ Te 內移動：把區間之間的時段也當成忙碌
+            allowed, lo, hi = busy.copy(), windows[0][0], windows[-1][1]
+            for (_, prev_hi), (next_lo, _) in zip(windows[:-1], windows[1:]):
+                allowed.add(prev_hi, next_lo)
+        # 注意：這是啟發式的後處理，累積疲勞不在 MILP 的目標函數內，結果不保證是累積成本下的最佳解
+        starts, total = improve_sequence(result.starts, batch.durations, codes, window_cost_prefix(C_rows), allowed,
+                                         lo, hi, FatigueAccumulation(), row_of=row_of)
+        print(f"😮‍💨 考慮疲勞累積後總成本: {total}")
+        result.starts, result.cost = starts, total
+
+    if result is not None:
+        print(f"\n✅ 最佳解找到！（Ts={Ts_slots / slots_per_hour:.2f}, Te={Te_slots / slots_per_hour:.2f}）")
+        with span("decode"):
+            if result.chunks is not None:
+                schedule = Schedule.from_chunks(result.chunks, batch, codes)
             else:
-                total_cost = sum(C[i][Ts_slots + j + t] for t in range(durations[i]))
-                c.append(total_cost)
-    c = np.array(c)
-
-    constraints = [LinearConstraint(A_eq, b_eq, b_eq)]
-    if A_ub:
-        constraints.append(LinearConstraint(A_ub, [-np.inf] * len(b_ub), b_ub))
-
-    res = milp(c=c, constraints=constraints, bounds=bounds, integrality=integrality)
-
-    if res.success:
-        print(f"\n✅ 最佳解找到！（Ts={Ts:.2f}, Te={Te:.2f}）")
-        X = res.x.reshape((n, time_slots))
-        scheduled_tasks = []
-
-        for i in range(n):
-            for j in range(time_slots):
-                if X[i][j] > 0.5:
-                    start = Ts_slots + j
-                    end = start + durations[i]
-                    sh, sm = divmod(start * 5, 60)
-                    eh, em = divmod(end * 5, 60)
-                    start_str = f"{sh:02}:{sm:02}"
-                    end_str = f"{eh:02}:{em:02}"
-                    print(f"任務{i + 1}: {start_str} - {end_str}")
-                    # 取得對應的 intelligence（若缺則空字串）
-                    intelligence = ""
-                    if i < len(intelligent_analysis_results) and isinstance(intelligent_analysis_results[i], dict):
-                        intelligence = intelligent_analysis_results[i].get("intelligence", "") or ""
-                    #是否有抓到(待確認)
-                    scheduled_tasks.append({
-                        "index": i,
-                        "startTime": start_str,
-                        "endTime": end_str,
-                        "desc": desc_list[i] if i < len(desc_list) else "",
-                        "intelligence": intelligence
-                    })
-                    break
-
-        print("\n💰 最小總成本:", np.dot(c, res.x))
-        write_results_to_firebase(date_str, scheduled_tasks)#最後寫入應多加智能種類需要測試
-        return scheduled_tasks
+                schedule = Schedule.from_starts(result.starts, batch, codes)
+        for task in schedule.to_dated_dicts(dates):
+            print(f"任務{task['index'] + 1}: {task['date']} {task['startTime']} - {task['endTime']}")
+        missing = n - len(np.unique(schedule.index))
+        if missing:
+            print(f"⚠️ 有 {missing} 個任務在整個範圍內都排不下")
+
+        print("\n💰 最小總成本:", result.cost)
+        if mode in ("exact", "decompose"):
+            # 保留這次的分類、成本與解，之後小幅修改時做增量重排
+            remember_state(ProblemState(uid, date_str, Ts_slots, Te_slots, batch, codes, C_rows, dates, result.starts,
+                                        row_of=row_of))
+        # 每個任務寫到它開始的那一天
+        with span("write", tasks=len(schedule)):
+            for day_str, day_schedule in schedule.split_by_day(dates, keep_empty=True):
+                write_results_to_firebase(day_str, day_schedule, uid, owner=date_str)#最後寫入應多加智能種類需要測試
+        return schedule
     else:
         print("\n❌ 找不到可行解。")
         return None
+
+def results_write_ops(date_str, schedule: Schedule, uid="testUser", version=None, owner=None):
+    """
+    某天排程要寫入的 (document_ref, data)，交給 commit_in_batches：
+    每個任務一份文件、刪除同一個 owner 編號超過新任務數的舊文件（data 為 None），最後一筆為週文件。
+    owner：排程請求的開始日（預設為 date_str）；只取代這個 owner 在當天的任務，其他請求跨夜延伸過來的任務保留。
+    version：背景重排的版本號，寫進週文件讓前端判斷是否為最新結果。
+    """
+    owner = owner or date_str
+    tasks = schedule.to_dicts()
+    ops = [(task_doc_ref(uid, date_str, task_doc_id(date_str, owner, idx)), task) for idx, task in enumerate(tasks)]
+    ops.extend((ref, None) for ref in stale_task_doc_refs(uid, date_str, owner, len(tasks)))
+    existing = read_day_packed(uid, date_str, get_weekly_schedule)
+    packed = merge_packed_day(existing, schedule.to_packed(), date_str, owner)
+    if version is not None:
+        packed["version"] = version
+    ops.append((weekly_schedule_ref(uid, date_str), weekly_schedule_update(date_str, packed)))
+    return ops
+
+def schedule_batch(problems: list, io_workers=8):
+    """
+    一次排很多使用者 / 很多天（例如每晚替所有使用者排明天）：
+    1. 整批任務描述只分類一次（相同文字去重，並共用分類快取）
+    2. 用到的疲勞曲線一次批次抓回；各問題的固定行程以 thread 並行抓取
+    3. 每個問題以 exact 模式丟到 process pool 平行求解
+    4. 結果以 WriteBatch 批次寫入 Firestore（每批 500 筆）；任務文件在各自的 users/{uid}/tasks 底下，
+       同一天的不同使用者互不覆蓋，跨夜延伸到隔天的任務併入隔天而不是取代
+    problems：list of problem_from_dict / plan_to_problems 的結果（已帶 "codes" 的問題不再分類）；
+    回傳 list of {"uid","date","success","cost","tasks"}（順序相同）
+    """
+    all_desc = [d for p in problems if p.get("codes") is None for d in p["batch"].desc]
+    labels = {m: r["intelligence"] for m, r in zip(all_desc, intelligent_task_analysis(all_desc))} if all_desc else {}
+    wanted = {}
+    for p in problems:
+        codes = p.get("codes")
+        used = {labels[d] for d in p["batch"].desc} if codes is None else {INTELLIGENCE_LABELS[c] for c in codes if c >= 0}
+        wanted.setdefault(p["uid"], set()).update(used)
+    for uid, used in wanted.items():
+        prefetch_fatigue_curves(used, uid)
+    print(f"📦 批次排程 {len(problems)} 個問題（{len(labels)} 種需要分類的任務描述）")
+
+    def prepare(p):
+        n = len(p["batch"])
+        codes = p.get("codes")
+        if codes is None:
+            codes = intelligence_codes([{"intelligence": labels[d]} for d in p["batch"].desc], n)
+        try:
+            daily_rows, row_of = build_daily_cost(codes, p["uid"])
+        except ValueError as e:
+            print(f"❌ {p['uid']} {p['date']}: {e}")
+            return None
+        dates = timeline_dates(p["date"], p["Te_slots"])
+        busy = build_busy_timeline(p["uid"], dates, get_tasks_from_firebase)
+        return codes, dates, build_cost_timeline(daily_rows, len(dates)), busy, row_of
+
+    with ThreadPoolExecutor(max_workers=io_workers) as io:
+        prepared = list(io.map(prepare, problems))
+
+    ready = [k for k, prep in enumerate(prepared) if prep is not None]
+    jobs = [(prepared[k][2], problems[k]["batch"].durations, problems[k]["Ts_slots"], problems[k]["Te_slots"],
+             prepared[k][3], None, False, prepared[k][4]) for k in ready]
+    solved = [None] * len(problems)
+    for k, result in zip(ready, get_process_pool().map(solve_schedule_job, jobs)):
+        solved[k] = result
+
+    out, ops = [], []
+    for p, prep, result in zip(problems, prepared, solved):
+        if result is None:
+            out.append({"uid": p["uid"], "date": p["date"], "success": False, "cost": None, "tasks": []})
+            continue
+        codes, dates = prep[0], prep[1]
+        schedule = Schedule.from_starts(result.starts, p["batch"], codes)
+        for day_str, day_schedule in schedule.split_by_day(dates, keep_empty=True):
+            day_ops = results_write_ops(day_str, day_schedule, p["uid"], owner=p["date"])
+            ops.extend(day_ops)
+            online_scheduler.drop(p["uid"], day_str)
+            # 先更新快取，同一批中之後寫到這天的問題才會併入這次的結果
+            weekly_cache.put_day(p["uid"], day_str, day_ops[-1][1]["days"][day_str])
+        out.append({"uid": p["uid"], "date": p["date"], "success": True, "cost": result.cost,
+                    "tasks": schedule.to_dated_dicts(dates)})
+
+    written = commit_in_batches(ops)
+    print(f"✅ 批次寫入 {written}/{len(ops)} 筆文件")
+    return out
+
+def compare_scenarios(batch: TaskBatch, date_str, scenarios: list, uid="testUser"):
+    """
+    what-if 比較：同一組任務在多個情境下（不同 Ts/Te、刪除任務、修改時長）各自求解，不寫入 Firebase。
+    分類、疲勞曲線、成本時間軸與固定行程只算一次，各情境丟到 process pool 平行求解。
+    scenarios：list of Scenario；回傳 list of {"name","success","cost","tasks"}，順序與輸入相同。
+    """
+    n = len(batch)
+    intelligent_analysis_results = intelligent_task_analysis(batch.desc)
+    codes = intelligence_codes(intelligent_analysis_results, n)
+    daily_rows, row_of = build_daily_cost(codes, uid)
+
+    dates = timeline_dates(date_str, max(s.Te_slots for s in scenarios))
+    C_rows = build_cost_timeline(daily_rows, len(dates))
+    busy = build_busy_timeline(uid, dates, get_tasks_from_firebase)
+
+    compared = []
+    for s, solved in zip(scenarios, solve_scenarios(C_rows, scenarios, busy, row_of=row_of)):
+        if solved is None:
+            compared.append({"name": s.name, "success": False, "cost": None, "tasks": []})
+            continue
+        starts, cost = solved
+        scenario_batch = TaskBatch.from_slots(s.durations, batch.desc, batch.fixed)
+        compared.append({"name": s.name, "success": True, "cost": cost,
+                         "tasks": Schedule.from_starts(starts, scenario_batch, codes).to_dated_dicts(dates)})
+    return compared
+
+def reoptimize_tasks(uid, date_str, add_minutes=(), add_desc=(), remove=(), changed_events=(), fixed_changed=False):
+    """
+    以上一次 schedule_tasks 的結果為基礎做增量重排：
+    - add_minutes / add_desc：新增任務（分鐘、描述），分類與疲勞曲線會走快取
+    - remove：要刪除的任務索引（以上一次的任務順序為準）
+    - changed_events：固定行程變動的時段 list of {"startTime","endTime"}（新舊位置都要給）
+    - fixed_changed：固定行程是否有變動（會重新抓當天的固定行程）
+    回傳 Schedule；沒有上一次的狀態或無解時回傳 None。
+    """
+    state = get_state(uid, date_str)
+    if state is None:
+        print("❌ 找不到上一次的排程狀態，請重新送出 /api/submit")
+        return None
+
+    if fixed_changed or changed_events:
+        for day_str in state.dates:
+            invalidate_day_busy_index(uid, day_str)
+    busy = build_busy_timeline(uid, state.dates, get_tasks_from_firebase)
+
+    add_batch, add_codes, add_C, add_row_of = None, None, None, None
+    if len(add_minutes):
+        add_batch = TaskBatch(add_minutes, add_desc)
+        results = intelligent_task_analysis(add_batch.desc)
+        add_codes = intelligence_codes(results, len(add_batch))
+        add_rows, add_row_of = build_daily_cost(add_codes, uid)
+        add_C = build_cost_timeline(add_rows, len(state.dates))
+
+    changed = list(zip(*event_intervals(list(changed_events)))) if changed_events else []
+
+    new_state, result = reoptimize(state, busy, add_batch, add_codes, add_C, remove, changed, add_row_of=add_row_of)
+    if new_state is None:
+        print("\n❌ 找不到可行解。")
+        return None
+    remember_state(new_state)
+
+    schedule = Schedule.from_starts(result.starts, new_state.batch, new_state.codes)
+    print(f"\n💰 增量重排後總成本: {result.cost}（版本 {new_state.version}）")
+    for day_str, day_schedule in schedule.split_by_day(new_state.dates, keep_empty=True):
+        write_results_to_firebase(day_str, day_schedule, uid, version=new_state.version, owner=new_state.date_str)
+    return schedule
@@ -0,0 +1,157 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# 目前請求的 ID（由 HTTP middleware 設定，log 與 span 都會帶上）
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+
+def current_request_id() -> str:
+    return request_id_var.get()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class RequestIdFilter(logging.Filter):
+    """把目前請求的 ID 放進每筆 log record（format 中用 %(request_id)s）"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+def route_label(scope) -> str:
+    """
+    HTTP 指標的 path label：用路由樣板（例如 /api/schedule/{date}）而不是實際網址，
+    避免每個日期 / uid 各自產生一組 series；沒有對應路由（404）時為 "unmatched"
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """Prometheus 格式的 histogram（依 label 組合分開累計），不依賴 prometheus_client"""
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}   # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = [0] * len(self.buckets) + [0.0, 0]
+                self._series[key] = series
+            for k, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[k] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            base = [f'{n}="{v}"' for n, v in zip(self.label_names, key)]
+            for bound, count in zip(list(self.buckets) + ["+Inf"], series[:len(self.buckets)] + [series[-1]]):
+                labels = ",".join(base + ['le="%s"' % bound])
+                lines.append(f"{self.name}_bucket{{{labels}}} {count}")
+            suffix = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus 格式的 counter"""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            suffix = "{" + ",".join(f'{n}="{v}"' for n, v in zip(self.label_names, key)) + "}" if key else ""
+            lines.append(f"{self.name}{suffix} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("scheduler_stage_seconds", "Latency of each scheduling stage", ("stage",))
+HTTP_SECONDS = Histogram("http_request_seconds", "HTTP request latency", ("path", "status"))
+MODEL_VARS = Histogram("scheduler_model_variables", "Number of MILP variables", buckets=SIZE_BUCKETS)
+MODEL_NNZ = Histogram("scheduler_model_nonzeros", "Number of MILP constraint non-zeros", buckets=SIZE_BUCKETS)
+SOLVE_NODES = Histogram("scheduler_solve_nodes", "Branch-and-bound nodes per solve", buckets=SIZE_BUCKETS)
+SOLVE_STATUS = Counter("scheduler_solve_total", "Solves by solver status", ("status",))
+PLAN_CACHE_REQUESTS = Counter("plan_cache_requests_total", "Plan cache lookups by result (hit / miss)", ("result",))
+PLAN_CACHE_SAVED_SECONDS = Counter("plan_cache_saved_seconds_total", "Model latency saved by plan cache hits")
+
+REGISTRY = [STAGE_SECONDS, HTTP_SECONDS, MODEL_VARS, MODEL_NNZ, SOLVE_NODES, SOLVE_STATUS,
+            PLAN_CACHE_REQUESTS, PLAN_CACHE_SAVED_SECONDS]
+
+logger = logging.getLogger("scheduler.timing")
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """
+    計時一個階段：結束時記到 scheduler_stage_seconds{stage}，並輸出一行帶請求 ID 的 log。
+    區塊內可以往 yield 出來的 dict 補充屬性（例如變數數量、求解狀態）。
+    """
+    fields = dict(attrs)
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        extra = " ".join(f"{k}={v}" for k, v in fields.items())
+        logger.info(f"⏱️ stage={stage} seconds={elapsed:.4f} {extra}".rstrip())
+
+
+def record_model(model):
+    """模型大小（變數數量、非零元素）"""
+    MODEL_VARS.observe(model.num_vars)
+    MODEL_NNZ.observe(model.nnz)
+
+
+def record_solve(result):
+    """求解結果（狀態、node 數）；result 為 None 代表無解"""
+    if result is None:
+        SOLVE_STATUS.inc(status="infeasible")
+        return
+    SOLVE_STATUS.inc(status=result.status)
+    if result.node_count is not None:
+        SOLVE_NODES.observe(result.node_count)
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
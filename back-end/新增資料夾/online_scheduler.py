@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import threading
+import numpy as np
+from solver import build_model, solve_model
+from task_model import Schedule, SLOTS_PER_DAY
+
+
+class DayPlan:
+    """
+    某使用者某一天在記憶體中的排程，供白天臨時加入任務時做局部修補：
+    1. 直接放進剩餘時段中成本最低的空位（一次向量運算）
+    2. 放不下時，依優先順序暫時移出較不重要的任務再放入，被移出的任務依優先順序放回
+    3. 仍放不下才對剩餘時段做有時間上限的重新最佳化
+    永遠放不下的任務留在 pending（優先佇列），之後有空位時依優先順序補上。
+    """
+
+    def __init__(self, date_str, Ts_slots, Te_slots, fixed_busy, cost_lookup, reopt_time_limit=1.0):
+        self.date_str = date_str
+        self.Ts_slots = Ts_slots
+        self.Te_slots = Te_slots
+        self.fixed_busy = fixed_busy            # 只有固定行程
+        self.occupied = fixed_busy.copy()       # 固定行程 + 已排入的任務
+        self.cost_lookup = cost_lookup          # 智能代碼 -> 288 格的疲勞成本
+        self.reopt_time_limit = reopt_time_limit
+        self.tasks = {}                         # task_id -> dict
+        self._rows = {}                         # 智能代碼 -> 展開到整條時間軸的成本
+        self.pending = []                       # heap of (priority key, task_id)
+        self._seq = itertools.count()
+        self.lock = threading.Lock()
+
+    # ---------- 基本操作 ----------
+    def _key(self, task):
+        # 越緊急、越重要越優先；同分時先加入者優先
+        return (-task["urgency"], -task["importance"], task["seq"])
+
+    @staticmethod
+    def _weight(task):
+        """重新最佳化時的排入獎勵倍數：與 _key 相同方向，越緊急、越重要越大"""
+        return 1.0 + max(task["urgency"], 0) + max(task["importance"], 0)
+
+    def _cost_row(self, code):
+        row = self._rows.get(code)
+        if row is None:
+            length = len(self.fixed_busy.busy)
+            row = np.tile(self.cost_lookup(code), -(-length // SLOTS_PER_DAY))[:length]
+            self._rows[code] = row
+        return row
+
+    def _window_costs(self, task, lo):
+        """task 在 [lo, Te) 內每個可行開始位置的成本，不可行為 inf"""
+        d = task["duration"]
+        ok = self.occupied.feasible_starts(d, lo, self.Te_slots)
+        if not ok.any():
+            return None
+        prefix = np.concatenate(([0.0], np.cumsum(self._cost_row(task["code"]))))
+        s = np.arange(lo, self.Te_slots - d + 1) - self.occupied.origin
+        costs = np.full(len(ok), np.inf)
+        costs[:len(s)] = np.where(ok[:len(s)], prefix[s + d] - prefix[s], np.inf)
+        return costs
+
+    def _place(self, task, lo):
+        costs = self._window_costs(task, lo)
+        if costs is None:
+            return False
+        start = lo + int(np.argmin(costs))
+        task["start"] = start
+        self.occupied.add(start, start + task["duration"])
+        return True
+
+    def _rebuild_occupied(self):
+        self.occupied = self.fixed_busy.copy()
+        placed = [t for t in self.tasks.values() if t.get("start") is not None]
+        if placed:
+            starts = np.array([t["start"] for t in placed])
+            self.occupied.add_many(starts, starts + np.array([t["duration"] for t in placed]))
+
+    def load(self, schedule: Schedule):
+        """載入已存在的排程（例如早上 /api/submit 的結果），視為一般優先度"""
+        for k in range(len(schedule)):
+            task_id = f"{self.date_str}-{int(schedule.index[k])}"
+            self.tasks[task_id] = {
+                "id": task_id, "desc": schedule.desc[k], "code": int(schedule.intelligence[k]),
+                "duration": int(schedule.end[k] - schedule.start[k]), "urgency": 0, "importance": 0,
+                "seq": next(self._seq), "start": int(schedule.start[k])
+            }
+        self._rebuild_occupied()
+
+    # ---------- 對外介面 ----------
+    def insert(self, task_id, desc, duration, code, urgency=0, importance=0, now_slot=None):
+        """
+        加入一個任務並局部修補排程，回傳 {"placed": bool, "start": slot 或 None, "strategy": ...}
+        任務排入或進入 pending 之後才加入 tasks；now 已過了 Te 時直接進 pending。
+        """
+        lo = max(self.Ts_slots, now_slot if now_slot is not None else self.Ts_slots)
+        task = {"id": task_id, "desc": desc, "code": code, "duration": int(duration),
+                "urgency": urgency, "importance": importance, "seq": next(self._seq), "start": None}
+        with self.lock:
+            strategy = None
+            if lo < self.Te_slots:
+                if self._place(task, lo):
+                    strategy = "insert"
+                elif self._shift_lower_priority(task, lo):
+                    strategy = "shift"
+                elif self._reoptimize(lo, task) and task["start"] is not None:
+                    strategy = "reoptimize"
+
+            self.tasks[task_id] = task
+            if strategy is not None:
+                return {"placed": True, "start": task["start"], "strategy": strategy}
+            if not any(entry[1] == task_id for entry in self.pending):
+                heapq.heappush(self.pending, (self._key(task), task_id))
+            return {"placed": False, "start": None, "strategy": "pending"}
+
+    def remove(self, task_id, now_slot=None):
+        """
+        移除任務（完成或取消），空出的時段依優先順序補上 pending 的任務。
+        回傳是否有這個任務（不存在時不做任何事）。
+        """
+        with self.lock:
+            task = self.tasks.pop(task_id, None)
+            if task is None:
+                return False
+            if task.get("start") is not None:
+                self._rebuild_occupied()
+            self._dispatch_pending(max(self.Ts_slots, now_slot or self.Ts_slots))
+            return True
+
+    def _dispatch_pending(self, lo):
+        still_pending = []
+        while self.pending:
+            key, task_id = heapq.heappop(self.pending)
+            task = self.tasks.get(task_id)
+            if task is None or task.get("start") is not None:
+                continue
+            if not self._place(task, lo):
+                still_pending.append((key, task_id))
+        for item in still_pending:
+            heapq.heappush(self.pending, item)
+
+    def _shift_lower_priority(self, task, lo):
+        """
+        依優先順序從最不重要的開始暫時移出（只動尚未開始的任務），
+        直到新任務放得下；被移出的任務再依優先順序放回，放不回的進 pending。
+        """
+        key = self._key(task)
+        movable = sorted((t for t in self.tasks.values()
+                          if t is not task and t.get("start") is not None and t["start"] >= lo
+                          and self._key(t) > key), key=self._key, reverse=True)
+        evicted = []
+        for victim in movable:
+            self.occupied.remove(victim["start"], victim["start"] + victim["duration"])
+            evicted.append((victim, victim["start"]))
+            victim["start"] = None
+            if self._place(task, lo):
+                break
+        else:
+            # 移出所有較不重要的任務仍放不下：還原
+            for victim, start in evicted:
+                victim["start"] = start
+            self._rebuild_occupied()
+            return False
+
+        for victim, _ in sorted(evicted, key=lambda e: self._key(e[0])):
+            if not self._place(victim, lo):
+                heapq.heappush(self.pending, (self._key(victim), victim["id"]))
+        return True
+
+    def _reoptimize(self, lo, new_task=None):
+        """
+        對 lo 之後尚未開始的任務（加上還沒加入 tasks 的 new_task）做一次有時間上限的重新最佳化：
+        任務可不排，空間不夠時依優先度（_weight）決定誰先排入
+        """
+        if lo >= self.Te_slots:
+            return False
+        floating = [t for t in self.tasks.values() if t.get("start") is None or t["start"] >= lo]
+        if new_task is not None:
+            floating.append(new_task)
+        if not floating:
+            return False
+        anchored = self.fixed_busy.copy()
+        for t in self.tasks.values():
+            if t.get("start") is not None and t["start"] < lo:
+                anchored.add(t["start"], t["start"] + t["duration"])
+
+        floating.sort(key=self._key)
+        C = np.stack([self._cost_row(t["code"]) for t in floating])
+        durations = np.array([t["duration"] for t in floating])
+        model = build_model(C, durations, lo, self.Te_slots, anchored, optional=True,
+                            weights=[self._weight(t) for t in floating])
+        result = solve_model(model, self.reopt_time_limit)
+        if result is None:
+            return False
+
+        for t, start in zip(floating, result.starts):
+            t["start"] = int(start) if start >= 0 else None
+            if t["start"] is None:
+                heapq.heappush(self.pending, (self._key(t), t["id"]))
+        self._rebuild_occupied()
+        if new_task is not None and new_task["start"] is not None:
+            # new_task 還不在 tasks 裡，_rebuild_occupied 不會算到它
+            self.occupied.add(new_task["start"], new_task["start"] + new_task["duration"])
+        return True
+
+    def to_schedule(self) -> Schedule:
+        placed = sorted((t for t in self.tasks.values() if t.get("start") is not None), key=lambda t: t["start"])
+        return Schedule(np.arange(len(placed)), [t["start"] for t in placed],
+                        [t["start"] + t["duration"] for t in placed],
+                        [t["code"] for t in placed], [t["desc"] for t in placed])
+
+
+class OnlineScheduler:
+    """(uid, date_str) -> DayPlan，整個程式共用"""
+
+    def __init__(self):
+        self.plans = {}
+        self.lock = threading.Lock()
+
+    def get(self, uid, date_str):
+        return self.plans.get((uid, date_str))
+
+    def get_or_create(self, uid, date_str, factory):
+        with self.lock:
+            plan = self.plans.get((uid, date_str))
+            if plan is None:
+                plan = factory()
+                self.plans[(uid, date_str)] = plan
+            return plan
+
+    def drop(self, uid, date_str):
+        with self.lock:
+            self.plans.pop((uid, date_str), None)
+
+
+online_scheduler = OnlineScheduler()
+
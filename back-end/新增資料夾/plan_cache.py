@@ -0,0 +1,83 @@
+import re
+import datetime
+import threading
+import unicodedata
+from metrics import PLAN_CACHE_REQUESTS, PLAN_CACHE_SAVED_SECONDS
+
+REQUIRED_ITEM_KEYS = ("事件", "年分", "月份", "日期", "持續時間")
+
+
+def normalize_question(question: str) -> str:
+    """全形半形統一（NFKC）、轉小寫，去掉空白與標點，讓只差標點或空格的問題共用快取"""
+    text = unicodedata.normalize("NFKC", question).lower()
+    return re.sub(r"[\s\W_]+", "", text)
+
+
+def validate_plan(plan) -> bool:
+    """計劃需有「行程」list，且每筆都有事件 / 年月日 / 持續時間"""
+    if not isinstance(plan, dict) or not isinstance(plan.get("行程"), list) or not plan["行程"]:
+        return False
+    return all(isinstance(item, dict) and all(k in item for k in REQUIRED_ITEM_KEYS) for item in plan["行程"])
+
+
+class PlanCache:
+    """
+    /dick/ask 的回應快取：key = (正規化後的問題, 今天日期)。
+    prompt 內含今天日期（行程從明天開始），所以快取在午夜換日時過期。
+    存的是已解析、驗證過的計劃 {"recommendation","result"}，命中時連模型呼叫與 JSON 解析都省掉。
+    另外記錄命中率與省下的時間（每筆快取記著當初產生它花了多久），同時輸出到 /metrics 的 counter。
+    """
+
+    def __init__(self, max_entries=1024, clock=None):
+        self.max_entries = max_entries
+        self._now = clock or datetime.datetime.now
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _key(self, question):
+        return normalize_question(question), self._now().date().isoformat()
+
+    def get(self, question):
+        key = self._key(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry["expires"] <= self._now():
+                self._entries.pop(key, None)
+                self.misses += 1
+                PLAN_CACHE_REQUESTS.inc(result="miss")
+                return None
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            PLAN_CACHE_REQUESTS.inc(result="hit")
+            PLAN_CACHE_SAVED_SECONDS.inc(entry["latency"])
+            return entry["value"]
+
+    def put(self, question, recommendation: str, plan: dict, latency: float):
+        """只快取通過驗證的計劃；回傳是否有存入"""
+        if not validate_plan(plan):
+            return False
+        now = self._now()
+        expires = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time.min)
+        with self._lock:
+            # 先清掉過期的；仍超過上限時移除最早過期的
+            self._entries = {k: v for k, v in self._entries.items() if v["expires"] > now}
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]["expires"])
+                self._entries.pop(oldest)
+            self._entries[self._key(question)] = {
+                "value": {"recommendation": recommendation, "result": plan},
+                "expires": expires, "latency": latency,
+            }
+        return True
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0, "saved_seconds": round(self.saved_seconds, 3)}
+
+
+plan_cache = PlanCache()
+
@@ -0,0 +1,105 @@
+import json
+
+
+class PlanStreamParser:
+    """
+    逐段解析 /dick/ask 模型的串流輸出（推薦理由文字 + 計劃 JSON），每次 feed 回傳可以立即送出的事件：
+    - {"type": "recommendation", "text": ...}：第一個 '{' 之前的文字，收到就轉送
+    - {"type": "item", "index": k, "item": {...}}：「行程」陣列中的一筆，該物件的 '}' 一到就解析送出
+    - {"type": "plan", "result": {...}}：整份 JSON 結束後的完整計劃（與非串流模式的 result 相同）
+    - {"type": "error", "detail": ...}：解析失敗
+    只掃描新進來的字元（追蹤字串 / 跳脫字元與括號堆疊），不會重複解析前面的內容。
+    """
+
+    PLAN_KEY = "行程"
+
+    def __init__(self):
+        self.json_text = []      # 從第一個 '{' 開始的所有字元
+        self.started = False
+        self.finished = False
+        self.stack = []          # 目前所在的容器：'{' 或 '['
+        self.in_string = False
+        self.escape = False
+        self.string_buf = []
+        self.last_root_string = None   # 根物件層級最後一個完整字串（用來辨識 key）
+        self.plan_array_depth = None   # 「行程」陣列在 stack 中的深度
+        self.item_start = None
+        self.items = 0
+
+    def feed(self, text: str) -> list:
+        events = []
+        if not text:
+            return events
+        if not self.started:
+            idx = text.find("{")
+            if idx == -1:
+                events.append({"type": "recommendation", "text": text})
+                return events
+            if idx > 0:
+                events.append({"type": "recommendation", "text": text[:idx]})
+            self.started = True
+            text = text[idx:]
+        if self.finished:
+            return events
+
+        for ch in text:
+            self.json_text.append(ch)
+            pos = len(self.json_text) - 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if len(self.stack) == 1:
+                        self.last_root_string = "".join(self.string_buf)
+                else:
+                    self.string_buf.append(ch)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                self.string_buf = []
+            elif ch in "{[":
+                self.stack.append(ch)
+                if ch == "[" and len(self.stack) == 2 and self.last_root_string == self.PLAN_KEY:
+                    self.plan_array_depth = 2
+                elif ch == "{" and self.plan_array_depth is not None and len(self.stack) == 3:
+                    self.item_start = pos
+            elif ch in "}]":
+                if not self.stack:
+                    continue
+                self.stack.pop()
+                if ch == "}" and self.item_start is not None and len(self.stack) == 2:
+                    events.append(self._item("".join(self.json_text[self.item_start:pos + 1])))
+                    self.item_start = None
+                elif ch == "]" and len(self.stack) == 1 and self.plan_array_depth is not None:
+                    self.plan_array_depth = None
+                if not self.stack:
+                    self.finished = True
+                    events.append(self._plan())
+                    break
+        return events
+
+    def close(self) -> list:
+        """串流結束：JSON 沒有完整結束時回報錯誤（或模型回覆不是行程規劃）"""
+        if self.finished:
+            return []
+        if not self.started:
+            return [{"type": "error", "detail": "找不到 JSON 部分"}]
+        return [{"type": "error", "detail": "計劃 JSON 不完整"}]
+
+    def _item(self, text):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            return {"type": "error", "detail": f"第 {self.items + 1} 筆行程無法解析: {e}"}
+        self.items += 1
+        return {"type": "item", "index": self.items - 1, "item": item}
+
+    def _plan(self):
+        try:
+            return {"type": "plan", "result": json.loads("".join(self.json_text))}
+        except json.JSONDecodeError as e:
+            return {"type": "error", "detail": f"計劃 JSON 無法解析: {e}"}
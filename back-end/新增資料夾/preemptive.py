@@ -0,0 +1,118 @@
+import numpy as np
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import coo_matrix, vstack
+from solver import SolveResult
+
+
+def solve_preemptive(C, durations, Ts_slots, Te_slots, busy=None, min_chunk=3, max_splits=2, time_limit=None,
+                     row_of=None):
+    """
+    搶佔式（可切割）排程：任務可以拆成數段，每段至少 min_chunk 個 slot，最多切 max_splits 次。
+    以「每個 slot 的佔用變數」建模，變數數量為 2 * n * H，與可能的切割位置數量無關：
+    - y[i, t] = 1：任務 i 佔用 slot t
+    - z[i, t] = 1：任務 i 的某一段從 slot t 開始
+    限制式：
+    - sum_t y[i, t] = d_i                         （總長度）
+    - sum_i y[i, t] <= 1，忙碌 slot 的 y 上限為 0     （不重疊、避開固定行程）
+    - z[i, t] >= y[i, t] - y[i, t-1]              （偵測每段的開頭）
+    - sum_t z[i, t] <= max_splits + 1             （切割次數上限）
+    - y[i, t+k] >= z[i, t]，k = 1..min_chunk-1     （每段最短長度）
+    回傳 SolveResult，chunks 為 (task, start, end) 三個陣列。
+    row_of：可選，C 只放不同智能的成本列時，row_of[i] 為任務 i 使用的列（同 build_model）
+    """
+    C = np.asarray(C, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    row_of = np.arange(n) if row_of is None else np.asarray(row_of)
+    H = Te_slots - Ts_slots
+    if H <= 0:
+        raise ValueError("❌ 可排時間區間長度必須大於 0")
+
+    free = np.ones(H, dtype=bool) if busy is None else ~busy.busy[Ts_slots - busy.origin:Te_slots - busy.origin]
+    if len(free) < H:
+        free = np.concatenate([free, np.zeros(H - len(free), dtype=bool)])
+    if durations.sum() > free.sum():
+        return None
+
+    # 變數編號：y[i, t] = i * H + t；z[i, t] = n * H + i * H + t
+    num_vars = 2 * n * H
+    task_of = np.repeat(np.arange(n), H)
+    t_of = np.tile(np.arange(H), n)
+    y_idx = np.arange(n * H)
+    z_idx = n * H + y_idx
+
+    ub = np.ones(num_vars)
+    ub[y_idx[~free[t_of]]] = 0
+    # 每段最短長度：開頭之後 m_i - 1 個 slot 都必須是空閒且在區間內，否則不能當開頭
+    m_of = np.minimum(min_chunk, durations)[task_of]
+    free_prefix = np.concatenate(([0], np.cumsum(free)))
+    end = np.minimum(t_of + m_of, H)
+    chunk_fits = (t_of + m_of <= H) & (free_prefix[end] - free_prefix[t_of] == m_of)
+    ub[z_idx[~chunk_fits]] = 0
+
+    c = np.zeros(num_vars)
+    c[y_idx] = C[row_of[task_of], Ts_slots + t_of]
+
+    blocks, lbs, ubs = [], [], []
+
+    # 總長度
+    blocks.append(coo_matrix((np.ones(n * H), (task_of, y_idx)), shape=(n, num_vars)))
+    lbs.append(durations.astype(np.float64))
+    ubs.append(durations.astype(np.float64))
+
+    # 每個 slot 最多一個任務
+    blocks.append(coo_matrix((np.ones(n * H), (t_of, y_idx)), shape=(H, num_vars)))
+    lbs.append(np.full(H, -np.inf))
+    ubs.append(np.ones(H))
+
+    # 段落開頭：y[i, t] - y[i, t-1] - z[i, t] <= 0
+    rows = np.arange(n * H)
+    prev = t_of > 0
+    r = np.concatenate([rows, rows[prev], rows])
+    col = np.concatenate([y_idx, y_idx[prev] - 1, z_idx])
+    val = np.concatenate([np.ones(n * H), -np.ones(prev.sum()), -np.ones(n * H)])
+    blocks.append(coo_matrix((val, (r, col)), shape=(n * H, num_vars)))
+    lbs.append(np.full(n * H, -np.inf))
+    ubs.append(np.zeros(n * H))
+
+    # 切割次數上限
+    blocks.append(coo_matrix((np.ones(n * H), (task_of, z_idx)), shape=(n, num_vars)))
+    lbs.append(np.full(n, -np.inf))
+    ubs.append(np.full(n, max_splits + 1.0))
+
+    # 最短段落：z[i, t] - y[i, t+k] <= 0（只對可能成為開頭的 z 建立）
+    cand = np.flatnonzero(chunk_fits & (m_of > 1))
+    if len(cand):
+        ks = [np.arange(1, m) for m in m_of[cand]]
+        rep = np.repeat(cand, [len(k) for k in ks])
+        k_all = np.concatenate(ks)
+        rr = np.arange(len(rep))
+        r = np.concatenate([rr, rr])
+        col = np.concatenate([z_idx[rep], y_idx[rep] + k_all])
+        val = np.concatenate([np.ones(len(rep)), -np.ones(len(rep))])
+        blocks.append(coo_matrix((val, (r, col)), shape=(len(rep), num_vars)))
+        lbs.append(np.full(len(rep), -np.inf))
+        ubs.append(np.zeros(len(rep)))
+
+    A = vstack(blocks).tocsr()
+    options = {"time_limit": time_limit} if time_limit is not None else {}
+    res = milp(c=c, constraints=[LinearConstraint(A, np.concatenate(lbs), np.concatenate(ubs))],
+               bounds=Bounds(np.zeros(num_vars), ub), integrality=np.ones(num_vars, dtype=bool),
+               options=options)
+    if res.x is None:
+        return None
+
+    # 解碼：每個任務佔用的 slot 連續段即為一個 chunk
+    Y = (res.x[:n * H] > 0.5).reshape(n, H)
+    padded = np.pad(Y.astype(np.int8), ((0, 0), (1, 1)))
+    edges = np.diff(padded, axis=1)
+    task_s, start = np.nonzero(edges == 1)
+    _, stop = np.nonzero(edges == -1)
+    chunks = (task_s, start + Ts_slots, stop + Ts_slots)
+
+    starts = np.full(n, -1, dtype=np.int64)
+    first = np.unique(task_s, return_index=True)
+    starts[first[0]] = chunks[1][first[1]]
+    return SolveResult(starts, float(c @ (res.x > 0.5)), res.status, x=res.x,
+                       mip_gap=getattr(res, "mip_gap", None),
+                       node_count=getattr(res, "mip_node_count", None), chunks=chunks)
@@ -0,0 +1,22 @@
+import os
+import atexit
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 全程式共用一個 process pool（建立 process 很貴，只建一次）
+_pool = None
+
+
+def get_process_pool(max_workers: int = None) -> ProcessPoolExecutor:
+    """
+    取得共用的 ProcessPoolExecutor。
+    worker 數量預設為 CPU 核心數，可用環境變數 SCHEDULER_WORKERS 覆蓋。
+    以 spawn 建立 worker：建立 pool 時 uvicorn、change feed 的 timer 與分類用的 thread pool 都已有 thread 在跑，
+    fork 會把其他 thread 持有中的 lock 一起複製到子程序而可能卡死。
+    """
+    global _pool
+    if _pool is None:
+        workers = max_workers or int(os.environ.get("SCHEDULER_WORKERS", 0)) or os.cpu_count() or 1
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_pool.shutdown, wait=False)
+    return _pool
@@ -0,0 +1,141 @@
+import threading
+import numpy as np
+from solver import build_model, solve_model, window_cost_prefix, SolveResult
+from task_model import TaskBatch
+
+
+class ProblemState:
+    """
+    一次排程計算的完整狀態（保留在記憶體中），供後續小幅修改時重複使用：
+    分類結果（codes）、成本時間軸（C，每種智能一列，任務 i 使用第 row_of[i] 列；row_of 省略時每個任務一列）、
+    固定行程以外的輸入與上一次的解（starts）。
+    """
+
+    def __init__(self, uid, date_str, Ts_slots, Te_slots, batch: TaskBatch, codes, C, dates, starts, version=0,
+                 row_of=None):
+        self.uid = uid
+        self.date_str = date_str
+        self.Ts_slots = Ts_slots
+        self.Te_slots = Te_slots
+        self.batch = batch
+        self.codes = np.asarray(codes)
+        self.C = C
+        self.row_of = np.arange(len(batch)) if row_of is None else np.asarray(row_of, dtype=np.int64)
+        self.dates = dates
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.version = version
+
+
+# (uid, date_str) -> ProblemState
+_states = {}
+_states_lock = threading.Lock()
+
+
+def remember_state(state: ProblemState):
+    with _states_lock:
+        _states[(state.uid, state.date_str)] = state
+
+
+def get_state(uid: str, date_str: str):
+    return _states.get((uid, date_str))
+
+
+def _near(starts, durations, intervals, radius):
+    """哪些任務（依上一次的位置）與任一受影響區間的距離在 radius 之內"""
+    near = np.zeros(len(starts), dtype=bool)
+    ends = starts + durations
+    for lo, hi in intervals:
+        near |= (starts < hi + radius) & (ends > lo - radius)
+    return near
+
+
+def reoptimize(state: ProblemState, busy, add_batch: TaskBatch = None, add_codes=None, add_C=None,
+               remove=(), changed_intervals=(), radius=12, time_limit=None, add_row_of=None):
+    """
+    以上一次的解為基礎做增量重新最佳化：
+    - remove：要刪除的任務索引；add_batch / add_codes / add_C：新增的任務與其成本列
+      （add_row_of 省略時 add_C 每個新任務一列，否則新任務 j 使用 add_C 的第 add_row_of[j] 列）
+    - changed_intervals：固定行程變動的時段 [(lo, hi), ...]（新舊位置都要給）
+    只有「新任務」、「與固定行程衝突的任務」以及受影響時段附近 radius 個 slot 內的任務會重新求解，
+    其餘任務固定在原位置（當成忙碌時段），子問題因此遠小於整天。
+    若鄰域內無解則把 radius 加倍，最後退回整段重新求解。
+    回傳 (新的 ProblemState, SolveResult)；完全無解時回傳 (None, None)。
+    """
+    n_old = len(state.batch)
+    keep = np.setdiff1d(np.arange(n_old), np.asarray(remove, dtype=np.int64))
+    batch = state.batch.subset(keep)
+    codes = state.codes[keep]
+    C = state.C
+    row_of = state.row_of[keep]
+    prev = state.starts[keep]
+
+    affected = list(changed_intervals)
+    for i in np.asarray(remove, dtype=np.int64):
+        if state.starts[i] >= 0:
+            affected.append((int(state.starts[i]), int(state.starts[i] + state.batch.durations[i])))
+
+    if add_batch is not None and len(add_batch):
+        # 新任務以「忽略其他任務時的最佳位置」作為受影響時段
+        P_add = window_cost_prefix(add_C)
+        add_row_of = np.arange(len(add_batch)) if add_row_of is None else np.asarray(add_row_of, dtype=np.int64)
+        for j, d in enumerate(add_batch.durations):
+            ok = busy.feasible_starts(int(d), state.Ts_slots, state.Te_slots)
+            s = np.flatnonzero(ok) + state.Ts_slots
+            if len(s):
+                r = add_row_of[j]
+                best = int(s[np.argmin(P_add[r, s + d] - P_add[r, s])])
+                affected.append((best, best + int(d)))
+        batch = TaskBatch(np.concatenate([batch.minutes, add_batch.minutes]), batch.desc + add_batch.desc,
+                          np.concatenate([batch.fixed, add_batch.fixed]))
+        codes = np.concatenate([codes, np.asarray(add_codes)])
+        row_of = np.concatenate([row_of, add_row_of + len(C)])
+        C = np.vstack([C, add_C])
+        prev = np.concatenate([prev, np.full(len(add_batch), -1, dtype=np.int64)])
+
+    # 只留下還有任務使用的成本列，重排多次後列數也不會一直增加
+    used, row_of = np.unique(row_of, return_inverse=True)
+    C = C[used]
+
+    durations = batch.durations.astype(np.int64)
+    n = len(durations)
+    placed = prev >= 0
+    # 上一次的位置現在撞到固定行程的任務也必須重排
+    clash = np.array([placed[i] and not busy.is_free(int(prev[i]), int(durations[i])) for i in range(n)], dtype=bool)
+
+    H = state.Te_slots - state.Ts_slots
+    r = radius
+    while True:
+        free = ~placed | clash
+        if r is not None:
+            free |= _near(prev, durations, affected, r) & placed
+        else:
+            free[:] = True
+        anchored = busy.copy()
+        fixed_tasks = np.flatnonzero(~free)
+        anchored.add_many(prev[fixed_tasks], prev[fixed_tasks] + durations[fixed_tasks])
+
+        free_tasks = np.flatnonzero(free)
+        print(f"🔁 增量重排：{len(free_tasks)}/{n} 個任務重新求解（radius={r}）")
+        result = None
+        if len(free_tasks) == 0:
+            result = SolveResult(np.zeros(0, dtype=np.int64), 0.0, 0)
+        else:
+            try:
+                model = build_model(C, durations[free_tasks], state.Ts_slots, state.Te_slots, anchored,
+                                    row_of=row_of[free_tasks])
+                result = solve_model(model, time_limit)
+            except ValueError:
+                result = None
+        if result is not None:
+            break
+        if r is None:
+            return None, None
+        r = r * 2 if r * 2 < H else None
+
+    starts = prev.copy()
+    starts[free_tasks] = result.starts
+    P = window_cost_prefix(C)
+    cost = float((P[row_of, starts + durations] - P[row_of, starts]).sum())
+    new_state = ProblemState(state.uid, state.date_str, state.Ts_slots, state.Te_slots, batch, codes, C,
+                             state.dates, starts, state.version + 1, row_of)
+    return new_state, SolveResult(starts, cost, result.status)
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import uuid
+import numpy as np
+from scipy.sparse import coo_matrix
+from busy_index import BusyIndex
+from solver import TimeIndexedModel
+
+# 超過這個秒數的排程請求會自動存成重現檔（SLOW_REQUEST_SECONDS=0 代表全部都存，負數代表關閉）
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_SECONDS", "5"))
+REPLAY_DIR = os.environ.get("SLOW_REQUEST_DIR", "slow_requests")
+
+
+def _busy_intervals(busy: BusyIndex) -> list:
+    """忙碌點陣圖轉回固定行程區間 [[start, end), ...]（絕對 slot）"""
+    edges = np.diff(np.concatenate([[0], busy.busy.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1) + busy.origin
+    ends = np.flatnonzero(edges == -1) + busy.origin
+    return [[int(s), int(e)] for s, e in zip(starts, ends)]
+
+
+def _put_sparse(arrays: dict, name: str, matrix):
+    coo = coo_matrix(matrix)
+    arrays[f"{name}_row"] = coo.row.astype(np.int64)
+    arrays[f"{name}_col"] = coo.col.astype(np.int64)
+    arrays[f"{name}_data"] = coo.data
+    arrays[f"{name}_shape"] = np.asarray(coo.shape, dtype=np.int64)
+
+
+def _get_sparse(data, name: str):
+    shape = tuple(int(v) for v in data[f"{name}_shape"])
+    return coo_matrix((data[f"{name}_data"], (data[f"{name}_row"], data[f"{name}_col"])), shape=shape).tocsr()
+
+
+class ReplayCapture:
+    """
+    一次排程請求的完整輸入，存成單一 .npz 後可離線重現（不需要 Vertex AI 與 Firestore）：
+    - payload：正規化後的請求參數（slot、日期、模式、任務分鐘數與描述…）
+    - labels / codes：分類結果與智能代碼
+    - daily_rows / row_of：單日疲勞成本列（m x 288）與任務對應的列
+    - busy：固定行程的忙碌點陣圖（另在 meta 中列出區間，方便閱讀）
+    - model：exact 模式建好的 TimeIndexedModel（c、A_eq / A_ub 以 COO 存放，變數皆為 0/1 整數）
+    排程過程中逐步填入，任何欄位都可能是 None（例如分類階段就失敗）。
+    """
+
+    def __init__(self, payload: dict):
+        self.payload = payload
+        self.labels = None
+        self.codes = None
+        self.daily_rows = None
+        self.row_of = None
+        self.num_days = None
+        self.busy = None
+        self.model = None
+        self.elapsed = None
+        self.error = None
+
+    def save(self, path: str):
+        arrays = {}
+        meta = {"payload": self.payload, "labels": self.labels, "num_days": self.num_days,
+                "elapsed": self.elapsed, "error": self.error, "captured_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        if self.codes is not None:
+            arrays["codes"] = np.asarray(self.codes)
+        if self.daily_rows is not None:
+            arrays["daily_rows"] = np.asarray(self.daily_rows, dtype=np.float64)
+            arrays["row_of"] = np.asarray(self.row_of, dtype=np.int64)
+        if self.busy is not None:
+            arrays["busy"] = self.busy.busy
+            meta["busy_origin"] = self.busy.origin
+            meta["fixed_events"] = _busy_intervals(self.busy)
+        model = self.model
+        if model is not None:
+            arrays.update(c=model.c, cost=model.cost, var_task=model.var_task, var_start=model.var_start)
+            _put_sparse(arrays, "A_eq", model.A_eq)
+            _put_sparse(arrays, "A_ub", model.A_ub)
+            meta["model"] = {"n": model.n, "Ts_slots": model.Ts_slots, "Te_slots": model.Te_slots,
+                             "optional": model.optional, "num_vars": model.num_vars, "nnz": model.nnz,
+                             # 變數 0 <= x <= 1 且為整數；A_eq x 介於 [eq_lb, 1]；A_ub x <= 1
+                             "eq_lb": 0 if model.optional else 1}
+        arrays["meta"] = np.asarray(json.dumps(meta, ensure_ascii=False, default=str))
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "ReplayCapture":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            capture = cls(meta["payload"])
+            capture.labels = meta.get("labels")
+            capture.num_days = meta.get("num_days")
+            capture.elapsed = meta.get("elapsed")
+            capture.error = meta.get("error")
+            if "codes" in data:
+                capture.codes = data["codes"]
+            if "daily_rows" in data:
+                capture.daily_rows = data["daily_rows"]
+                capture.row_of = data["row_of"]
+            if "busy" in data:
+                capture.busy = BusyIndex(meta["busy_origin"], len(data["busy"]))
+                capture.busy.busy[:] = data["busy"]
+            info = meta.get("model")
+            if info is not None:
+                capture.model = TimeIndexedModel(info["n"], info["Ts_slots"], info["Te_slots"],
+                                                 data["var_task"], data["var_start"], data["c"],
+                                                 _get_sparse(data, "A_eq"), _get_sparse(data, "A_ub"),
+                                                 info["optional"], data["cost"])
+        return capture
+
+
+def capture_if_slow(capture: ReplayCapture, elapsed: float, threshold: float = None, directory: str = None):
+    """請求耗時超過門檻時寫出重現檔，回傳檔案路徑（未寫出回傳 None）；寫檔失敗不影響請求本身"""
+    threshold = SLOW_REQUEST_SECONDS if threshold is None else threshold
+    if threshold < 0 or elapsed < threshold:
+        return None
+    directory = directory or REPLAY_DIR
+    capture.elapsed = elapsed
+    request_id = capture.payload.get("request_id") or uuid.uuid4().hex
+    name = f"{capture.payload.get('date', 'unknown')}_{request_id}_{int(elapsed * 1000)}ms.npz"
+    path = os.path.join(directory, name)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        capture.save(path)
+    except Exception as e:
+        print(f"⚠️ 慢請求重現檔寫出失敗: {e}")
+        return None
+    print(f"⚠️ 排程耗時 {elapsed:.2f} 秒，已存成重現檔 {path}")
+    return path
@@ -0,0 +1,136 @@
+import sys
+import time
+import pstats
+import argparse
+import cProfile
+from task_model import TaskBatch, SLOTS_PER_DAY
+from replay import ReplayCapture
+from solver import build_model, solve_model, solve_k_best
+from timeline import build_cost_timeline
+from rolling_horizon import daily_windows, solve_rolling
+from decompose import solve_decomposed
+from preemptive import solve_preemptive
+
+BACKENDS = ("model", "exact", "k_best", "decompose", "preemptive", "rolling")
+
+
+def make_solver(capture: ReplayCapture, backend: str, time_limit=None):
+    """
+    依重現檔建立一個無參數的求解函式：
+    - model：直接解檔案裡存的模型（與當時送進 HiGHS 的完全相同）
+    - 其他：由成本列與忙碌點陣圖重新建模 / 求解（可比較不同求解器或新版建模程式）
+    """
+    p = capture.payload
+    if backend == "model":
+        if capture.model is None:
+            raise ValueError("❌ 這個重現檔沒有存模型（不是 exact 模式，或建模前就失敗）")
+        return lambda: solve_model(capture.model, time_limit)
+    if capture.daily_rows is None or capture.busy is None:
+        raise ValueError("❌ 這個重現檔缺少成本列或固定行程，無法重新建模")
+
+    durations = TaskBatch(p["minutes"], p["desc"]).durations
+    Ts_slots, Te_slots = p["Ts_slots"], p["Te_slots"]
+    busy = capture.busy
+    if backend == "rolling":
+        windows = daily_windows(Ts_slots, Te_slots, p.get("horizon_days", 1))
+        num_days = max(capture.num_days or 1, -(-windows[-1][1] // SLOTS_PER_DAY))
+    else:
+        num_days = capture.num_days or 1
+    C_rows = build_cost_timeline(capture.daily_rows, num_days)
+    row_of = capture.row_of
+
+    if backend == "exact":
+        return lambda: solve_model(build_model(C_rows, durations, Ts_slots, Te_slots, busy, row_of=row_of), time_limit)
+    if backend == "k_best":
+        k = max(int(p.get("k_best") or 1), 2)
+        return lambda: (solve_k_best(build_model(C_rows, durations, Ts_slots, Te_slots, busy, row_of=row_of), k,
+                                     p.get("k_best_min_shift", 12), p.get("k_best_min_moved", 1),
+                                     time_limit=time_limit) or [None])[0]
+    if backend == "decompose":
+        return lambda: solve_decomposed(C_rows, durations, Ts_slots, Te_slots, busy, time_limit, row_of=row_of)
+    if backend == "preemptive":
+        return lambda: solve_preemptive(C_rows, durations, Ts_slots, Te_slots, busy, p.get("min_chunk", 3),
+                                        p.get("max_splits", 2), time_limit, row_of=row_of)
+    if backend == "rolling":
+        return lambda: solve_rolling(C_rows, durations, windows, busy, time_limit, row_of=row_of)
+    raise ValueError(f"❌ 不支援的求解器: {backend}")
+
+
+def run_cprofile(solve, output=None, sort="cumulative", limit=30):
+    profiler = cProfile.Profile()
+    result = profiler.runcall(solve)
+    if output:
+        profiler.dump_stats(output)
+        print(f"✅ cProfile 結果已存到 {output}（可用 snakeviz / pstats 開啟）", file=sys.stderr)
+    pstats.Stats(profiler, stream=sys.stderr).sort_stats(sort).print_stats(limit)
+    return result
+
+
+def run_pyinstrument(solve, output=None):
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        raise ValueError("❌ 尚未安裝 pyinstrument（pip install pyinstrument），或改用 --profiler cprofile")
+    profiler = Profiler()
+    profiler.start()
+    try:
+        result = solve()
+    finally:
+        profiler.stop()
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+        print(f"✅ pyinstrument 結果已存到 {output}", file=sys.stderr)
+    print(profiler.output_text(unicode=True, color=False), file=sys.stderr)
+    return result
+
+
+def main():
+    """
+    離線重現慢請求（不需要 Vertex AI 與 Firestore）：
+    讀取 schedule_tasks 自動存下的 .npz 重現檔，用指定的求解器重跑並做效能分析。
+
+        python replay_cli.py slow_requests/2025-05-01_abc_8123ms.npz --backend model
+        python replay_cli.py capture.npz --backend decompose --profiler pyinstrument -o profile.html
+    """
+    parser = argparse.ArgumentParser(description="重現慢請求並做效能分析")
+    parser.add_argument("capture", help="重現檔（.npz）")
+    parser.add_argument("--backend", choices=BACKENDS, default="model", help="求解器（預設 model：解存下的模型）")
+    parser.add_argument("--profiler", choices=("cprofile", "pyinstrument", "none"), default="cprofile")
+    parser.add_argument("-o", "--output", help="分析結果輸出檔（cProfile 為 .prof，pyinstrument 為 .html）")
+    parser.add_argument("--sort", default="cumulative", help="cProfile 排序欄位（預設 cumulative）")
+    parser.add_argument("--limit", type=int, default=30, help="cProfile 顯示的函式數量")
+    parser.add_argument("--time-limit", type=float, help="求解時間上限（秒）")
+    args = parser.parse_args()
+
+    capture = ReplayCapture.load(args.capture)
+    p = capture.payload
+    print(f"📦 請求 {p.get('request_id')}：{p.get('date')} 模式 {p.get('mode')}，{len(p.get('minutes', []))} 個任務，"
+          f"當時耗時 {capture.elapsed or 0:.2f} 秒" + (f"，錯誤 {capture.error}" if capture.error else ""),
+          file=sys.stderr)
+    if capture.model is not None:
+        print(f"📐 模型：{capture.model.num_vars} 個變數，{capture.model.nnz} 個非零元素", file=sys.stderr)
+
+    try:
+        solve = make_solver(capture, args.backend, args.time_limit)
+        started = time.perf_counter()
+        if args.profiler == "cprofile":
+            result = run_cprofile(solve, args.output, args.sort, args.limit)
+        elif args.profiler == "pyinstrument":
+            result = run_pyinstrument(solve, args.output)
+        else:
+            result = solve()
+        elapsed = time.perf_counter() - started
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+
+    if result is None:
+        print(f"❌ {args.backend} 找不到可行解（{elapsed:.3f} 秒）")
+    else:
+        print(f"✅ {args.backend} 求解完成：{elapsed:.3f} 秒，成本 {result.cost}，狀態 {result.status}，"
+              f"gap {result.mip_gap}，nodes {result.node_count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import numpy as np
+from solver import build_model, solve_model, window_cost_prefix, SolveResult
+from busy_index import BusyIndex
+from task_model import SLOTS_PER_DAY
+
+
+def daily_windows(Ts_slots: int, Te_slots: int, num_days: int) -> list:
+    """
+    每天重複同一個 Ts ~ Te 區間，回傳時間軸上的 [(lo, hi), ...]（絕對 slot）。
+    Te_slots 可以大於 288（跨日視窗）。
+    """
+    return [(k * SLOTS_PER_DAY + Ts_slots, k * SLOTS_PER_DAY + Te_slots) for k in range(num_days)]
+
+
+def solve_rolling(C, durations, windows: list, busy=None, time_limit=None, row_of=None) -> SolveResult:
+    """
+    滾動視窗（rolling horizon）排程：依時間順序一個區間一個區間求解，
+    這個區間放不下的任務自動帶到下一個區間（例如下一個空檔或隔天）。
+    每個子問題只包含尚未排入的任務與單一區間，求解時間隨天數線性成長。
+    回傳 SolveResult，starts 為 -1 的任務代表整段範圍都排不下。
+    row_of：可選，C 只放不同智能的成本列時，row_of[i] 為任務 i 使用的列（同 build_model）
+    """
+    C = np.asarray(C, dtype=np.float64)
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    row_of = np.arange(n) if row_of is None else np.asarray(row_of)
+    starts = np.full(n, -1, dtype=np.int64)
+    pending = np.arange(n)
+    # 已排入的任務要佔住時段，避免下一個區間（例如跨日視窗重疊時）重複使用
+    occupied = busy.copy() if busy is not None else BusyIndex(0, C.shape[1])
+
+    for lo, hi in windows:
+        if len(pending) == 0:
+            break
+        model = build_model(C, durations[pending], lo, hi, occupied, optional=True, row_of=row_of[pending])
+        result = solve_model(model, time_limit)
+        if result is None:
+            continue
+
+        placed = result.starts >= 0
+        if not np.any(placed):
+            continue
+        placed_tasks = pending[placed]
+        starts[placed_tasks] = result.starts[placed]
+        occupied.add_many(starts[placed_tasks], starts[placed_tasks] + durations[placed_tasks])
+        print(f"📦 區間 {lo}~{hi} 排入 {len(placed_tasks)} 個任務，剩餘 {int((~placed).sum())} 個帶到下一個區間")
+        pending = pending[~placed]
+
+    done = np.flatnonzero(starts >= 0)
+    P = window_cost_prefix(C)
+    rows = row_of[done]
+    cost = float((P[rows, starts[done] + durations[done]] - P[rows, starts[done]]).sum())
+    return SolveResult(starts, cost, 0)
@@ -0,0 +1,52 @@
+import numpy as np
+from solver import solve_schedule_job
+from process_pool import get_process_pool
+
+
+class Scenario:
+    """
+    一個 what-if 情境：相對於基本問題的修改。
+    - name: 顯示名稱
+    - Ts_slots / Te_slots: 這個情境的可排區間
+    - keep: 保留的任務索引（其餘任務視為刪除）
+    - durations: 所有任務的 slot 數（可與基本問題不同）
+    """
+
+    def __init__(self, name, Ts_slots, Te_slots, keep, durations):
+        self.name = name
+        self.Ts_slots = Ts_slots
+        self.Te_slots = Te_slots
+        self.keep = np.asarray(keep, dtype=np.int64)
+        self.durations = np.asarray(durations, dtype=np.int64)
+
+
+def solve_scenarios(C, scenarios: list, busy, time_limit=None, parallel=True, row_of=None) -> list:
+    """
+    平行求解多個情境；分類、成本時間軸 C 與固定行程 busy 由呼叫端只算一次、所有情境共用。
+    row_of：可選，C 只放不同智能的成本列時，row_of[i] 為任務 i 使用的列；省略時 C 每個任務一列。
+    回傳與 scenarios 同順序的 list：每個元素為長度 n 的 starts（-1 代表刪除或排不下）與成本，無解為 None。
+    """
+    n = len(scenarios[0].durations) if scenarios else 0
+    row_of = np.arange(n) if row_of is None else np.asarray(row_of)
+    # 只傳入該情境用得到的成本列與欄位，減少 process 間傳輸的資料量
+    jobs = []
+    for s in scenarios:
+        rows, local_row_of = np.unique(row_of[s.keep], return_inverse=True)
+        jobs.append((C[rows][:, :s.Te_slots], s.durations[s.keep], s.Ts_slots, s.Te_slots, busy, time_limit,
+                     False, local_row_of))
+    print(f"🔀 平行求解 {len(jobs)} 個情境")
+
+    if parallel and len(jobs) > 1:
+        results = list(get_process_pool().map(solve_schedule_job, jobs))
+    else:
+        results = [solve_schedule_job(job) for job in jobs]
+
+    out = []
+    for s, result in zip(scenarios, results):
+        if result is None:
+            out.append(None)
+            continue
+        starts = np.full(n, -1, dtype=np.int64)
+        starts[s.keep] = result.starts
+        out.append((starts, result.cost))
+    return out
@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import zlib
+import threading
+from collections import deque
+import numpy as np
+
+
+def _ngrams(text: str, sizes=(1, 2)):
+    text = "".join(text.split()).lower()
+    return [text[i:i + n] for n in sizes for i in range(len(text) - n + 1)]
+
+
+class MissionSimilarityIndex:
+    """
+    已分類任務的近似重複索引：把任務文字切成字元 n-gram（單字與相鄰兩字），
+    以 hashing trick 映射成固定維度的向量並做 L2 正規化，查詢時一次矩陣乘法算出 cosine 相似度。
+    相似度達 threshold 以上時沿用最相近任務的分類（例如「讀英文單字」沿用「讀英文」），
+    每次命中都記在 audit（最近 audit_size 筆），設定 audit_path 時另外附加寫入 JSONL 檔。
+    """
+
+    def __init__(self, dim=4096, threshold=0.6, audit_size=1000, audit_path=None):
+        self.dim = dim
+        self.threshold = threshold
+        self.texts = []
+        self.labels = []
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._pending = []
+        self.audit = deque(maxlen=audit_size)
+        self.audit_path = audit_path
+        self.lookups = 0
+        self.hits = 0
+        self._lock = threading.Lock()
+
+    def vectorize(self, texts) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            grams = _ngrams(text)
+            if not grams:
+                continue
+            cols = np.fromiter((zlib.crc32(g.encode("utf-8")) % self.dim for g in grams), dtype=np.int64,
+                               count=len(grams))
+            np.add.at(out[row], cols, 1.0)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms > 0, norms, 1.0)
+
+    def add(self, texts, labels):
+        with self._lock:
+            for text, label in zip(texts, labels):
+                if label:
+                    self.texts.append(text)
+                    self.labels.append(label)
+                    self._pending.append(text)
+
+    def _matrix(self):
+        # 新加入的任務累積起來一次向量化
+        if self._pending:
+            self._vectors = np.vstack([self._vectors, self.vectorize(self._pending)])
+            self._pending = []
+        return self._vectors
+
+    def lookup(self, texts):
+        """回傳與 texts 同長度的 list：命中時為 (label, 相似任務, 相似度)，否則為 None"""
+        if not texts:
+            return []
+        with self._lock:
+            matrix = self._matrix()
+            labels, known = list(self.labels), list(self.texts)
+        self.lookups += len(texts)
+        if len(matrix) == 0:
+            return [None] * len(texts)
+
+        sims = self.vectorize(texts) @ matrix.T
+        best = sims.argmax(axis=1)
+        scores = sims[np.arange(len(texts)), best]
+        out = []
+        for text, j, score in zip(texts, best, scores):
+            if score < self.threshold:
+                out.append(None)
+                continue
+            out.append((labels[j], known[j], float(score)))
+            self._record(text, known[j], labels[j], float(score))
+        return out
+
+    def _record(self, text, matched, label, score):
+        self.hits += 1
+        entry = {"time": time.time(), "mission": text, "matched": matched, "intelligence": label,
+                 "score": round(score, 4)}
+        self.audit.append(entry)
+        if self.audit_path:
+            try:
+                with open(self.audit_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"⚠️ 無法寫入相似命中紀錄: {e}")
+
+    def stats(self) -> dict:
+        return {"entries": len(self.labels), "lookups": self.lookups, "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0}
+
+
+# 門檻與稽核檔可用環境變數 MISSION_SIMILARITY_THRESHOLD / MISSION_SIMILARITY_AUDIT 設定
+mission_index = MissionSimilarityIndex(
+    threshold=float(os.environ.get("MISSION_SIMILARITY_THRESHOLD", 0.6)),
+    audit_path=os.environ.get("MISSION_SIMILARITY_AUDIT") or None,
+)
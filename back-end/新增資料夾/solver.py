@@ -0,0 +1,210 @@
+import numpy as np
+from scipy.optimize import milp, LinearConstraint, Bounds
+from scipy.sparse import csr_matrix, vstack
+
+
+class TimeIndexedModel:
+    """
+    時間索引（time-indexed）排程模型：變數 x[k] = 1 代表任務 var_task[k] 從 var_start[k] 開始。
+    - 只為「放得下、且不碰到固定行程」的開始位置建立變數（由 BusyIndex presolve）
+    - A_eq：每個任務恰好選一個開始位置（optional 模式下為「最多一個」）
+    - A_ub：每個 slot 最多被一個任務佔用（只保留可能衝突的 slot）
+    """
+
+    def __init__(self, n, Ts_slots, Te_slots, var_task, var_start, c, A_eq, A_ub, optional=False, cost=None):
+        self.n = n
+        self.Ts_slots = Ts_slots
+        self.Te_slots = Te_slots
+        self.var_task = var_task
+        self.var_start = var_start
+        self.c = c
+        self.A_eq = A_eq
+        self.A_ub = A_ub
+        self.optional = optional
+        self.cost = c if cost is None else cost  # 每個變數真正的疲勞成本（不含排入獎勵）
+
+    @property
+    def num_vars(self) -> int:
+        return len(self.c)
+
+    @property
+    def nnz(self) -> int:
+        return int(self.A_eq.nnz + self.A_ub.nnz)
+
+
+class SolveResult:
+    """
+    求解結果：starts 為每個任務的開始 slot（未排入為 -1）
+    搶佔式排程另外提供 chunks = (task, start, end)，每段一筆
+    """
+
+    def __init__(self, starts, cost, status, x=None, mip_gap=None, node_count=None, chunks=None):
+        self.starts = starts
+        self.cost = cost
+        self.status = status
+        self.x = x
+        self.mip_gap = mip_gap
+        self.node_count = node_count
+        self.chunks = chunks
+
+
+def window_cost_prefix(C):
+    """每列成本的前綴和（多一欄 0），區間 [s, e) 的成本 = P[:, e] - P[:, s]"""
+    C = np.asarray(C, dtype=np.float64)
+    return np.concatenate([np.zeros((C.shape[0], 1)), np.cumsum(C, axis=1)], axis=1)
+
+
+def build_model(C, durations, Ts_slots, Te_slots, busy=None, optional=False, row_of=None,
+                weights=None) -> TimeIndexedModel:
+    """
+    建立排程模型。
+    - C: n x T 成本矩陣，第 t 欄為絕對 slot t 的成本（T 需 >= Te_slots）
+    - durations: 每個任務的 slot 數
+    - Ts_slots / Te_slots: 可排區間 [Ts_slots, Te_slots)
+    - busy: BusyIndex（固定行程），None 代表沒有固定行程
+    - optional: True 時任務可以不排（放不下的留給下一個區間），
+      目標函數會先最大化排入的總 slot 數，再最小化疲勞成本
+    - row_of: 可選，C 只放不同智能的成本列時，row_of[i] 為任務 i 使用的列
+    - weights: 可選，optional 模式下任務 i 每排入一個 slot 的獎勵倍數（>= 1，例如依優先度），
+      空間不夠時優先排入權重高的任務；預設皆為 1
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    n = len(durations)
+    H = Te_slots - Ts_slots
+    if H <= 0:
+        raise ValueError("❌ 可排時間區間長度必須大於 0")
+    if np.shape(C)[1] < Te_slots:
+        raise ValueError(f"❌ 成本時間軸長度 {np.shape(C)[1]} 不足以涵蓋 Te slot {Te_slots}")
+
+    # presolve：每個任務可行的開始位置（一次向量運算）
+    starts_per_task = []
+    for i in range(n):
+        d = int(durations[i])
+        if busy is not None:
+            ok = busy.feasible_starts(d, Ts_slots, Te_slots)
+        else:
+            ok = np.zeros(H, dtype=bool)
+            ok[:max(H - d + 1, 0)] = True
+        offs = np.flatnonzero(ok)
+        if len(offs) == 0 and not optional:
+            raise ValueError(f"❌ 任務 {i + 1} 在可排時段內找不到足夠長的空檔")
+        starts_per_task.append(offs + Ts_slots)
+
+    var_task = np.concatenate([np.full(len(s), i, dtype=np.int64) for i, s in enumerate(starts_per_task)])
+    var_start = np.concatenate(starts_per_task).astype(np.int64)
+    m = len(var_task)
+    d_var = durations[var_task]
+
+    # 成本：用前綴和一次算出所有變數的區間成本
+    P = window_cost_prefix(C)
+    var_row = var_task if row_of is None else np.asarray(row_of)[var_task]
+    cost = P[var_row, var_start + d_var] - P[var_row, var_start]
+    c = cost
+    if optional:
+        # 每排入一個 slot 的獎勵大於整個區間可能的總成本差，確保「能排就排」優先於成本
+        reward = (np.abs(np.asarray(C)[:, Ts_slots:Te_slots]).max(initial=0.0) * H) + 1.0
+        w = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+        c = cost - reward * d_var * w[var_task]
+
+    # 每個任務恰好一個開始位置
+    A_eq = csr_matrix((np.ones(m), (var_task, np.arange(m))), shape=(n, m))
+
+    # slot 容量：變數 k 佔用 var_start[k] ~ var_start[k] + d - 1
+    cols = np.repeat(np.arange(m), d_var)
+    within = np.arange(len(cols)) - np.repeat(np.cumsum(d_var) - d_var, d_var)
+    rows = np.repeat(var_start - Ts_slots, d_var) + within
+    A_ub = csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(H, m))
+    # 只有一個變數會用到的 slot 不可能衝突，直接移除
+    A_ub = A_ub[np.diff(A_ub.indptr) > 1]
+
+    return TimeIndexedModel(n, Ts_slots, Te_slots, var_task, var_start, c, A_eq, A_ub, optional, cost)
+
+
+def solve_model(model: TimeIndexedModel, time_limit=None):
+    """以 HiGHS（scipy.optimize.milp）求解，找不到可行解回傳 None"""
+    if model.num_vars == 0:
+        # optional 模式下沒有任何任務放得進這個區間
+        return SolveResult(np.full(model.n, -1, dtype=np.int64), 0.0, 0)
+    constraints = [LinearConstraint(model.A_eq, 0 if model.optional else 1, 1)]
+    if model.A_ub.shape[0]:
+        constraints.append(LinearConstraint(model.A_ub, -np.inf, 1))
+    options = {}
+    if time_limit is not None:
+        options["time_limit"] = time_limit
+
+    res = milp(c=model.c, constraints=constraints, bounds=Bounds(0, 1),
+               integrality=np.ones(model.num_vars, dtype=bool), options=options)
+    if res.x is None:
+        return None
+
+    chosen = res.x > 0.5
+    starts = np.full(model.n, -1, dtype=np.int64)
+    starts[model.var_task[chosen]] = model.var_start[chosen]
+    return SolveResult(starts, float(model.cost[chosen].sum()), res.status, x=res.x,
+                       mip_gap=getattr(res, "mip_gap", None),
+                       node_count=getattr(res, "mip_node_count", None))
+
+
+def moved_tasks(a, b, min_shift: int) -> int:
+    """兩個排程之間「有明顯差異」的任務數：開始時間相差至少 min_shift 個 slot，或只有其中一個有排入"""
+    a, b = np.asarray(a), np.asarray(b)
+    placed_a, placed_b = a >= 0, b >= 0
+    moved = (placed_a != placed_b) | (placed_a & placed_b & (np.abs(a - b) >= min_shift))
+    return int(moved.sum())
+
+
+def solve_k_best(model: TimeIndexedModel, k: int, min_shift: int = 12, min_moved: int = 1, time_limit=None) -> list:
+    """
+    在同一個模型上依序求出前 k 個有明顯差異的排程（no-good cut）：
+    每找到一個解，就加入一條限制「至少 min_moved 個任務的開始時間與該解相差 min_shift 個 slot 以上」
+    （預設至少一個任務移動 1 小時以上），避免只差 5 ~ 15 分鐘的幾乎相同的解。
+    與已找到的任何解差異不足的結果會被丟掉（例如 optional 模式下未排入的任務讓 cut 失效時）。
+    HiGHS 不支援在 milp 之間沿用搜尋狀態，每個解仍是重新求解；限制式只建一次，cut 以稀疏列累加。
+    回傳依成本排序的 list of SolveResult（可能少於 k 個）。
+    """
+    base = [LinearConstraint(model.A_eq, 0 if model.optional else 1, 1)]
+    if model.A_ub.shape[0]:
+        base.append(LinearConstraint(model.A_ub, -np.inf, 1))
+    integrality = np.ones(model.num_vars, dtype=bool)
+    options = {"time_limit": time_limit} if time_limit is not None else {}
+
+    results = []
+    cuts = []
+    for _ in range(k):
+        constraints = list(base)
+        if cuts:
+            constraints.append(LinearConstraint(vstack(cuts), -np.inf, np.full(len(cuts), model.n - min_moved)))
+        res = milp(c=model.c, constraints=constraints, bounds=Bounds(0, 1), integrality=integrality, options=options)
+        if res.x is None:
+            break
+
+        chosen = res.x > 0.5
+        starts = np.full(model.n, -1, dtype=np.int64)
+        starts[model.var_task[chosen]] = model.var_start[chosen]
+        if any(moved_tasks(starts, r.starts, min_shift) < min_moved for r in results):
+            break  # cut 已無法再產生不同的解
+        results.append(SolveResult(starts, float(model.cost[chosen].sum()), res.status, x=res.x,
+                                   mip_gap=getattr(res, "mip_gap", None),
+                                   node_count=getattr(res, "mip_node_count", None)))
+
+        # 與這個解「幾乎相同」的變數（同任務、開始時間差 < min_shift）最多只能選 n - min_moved 個
+        prev = starts[model.var_task]
+        near = np.flatnonzero((prev >= 0) & (np.abs(model.var_start - prev) < min_shift))
+        cuts.append(csr_matrix((np.ones(len(near)), (np.zeros(len(near), dtype=np.int64), near)),
+                               shape=(1, model.num_vars)))
+    return results
+
+
+def solve_schedule(C, durations, Ts_slots, Te_slots, busy=None, time_limit=None, optional=False, row_of=None):
+    """build_model + solve_model 的簡便介面"""
+    try:
+        model = build_model(C, durations, Ts_slots, Te_slots, busy, optional, row_of)
+    except ValueError as e:
+        print(e)
+        return None
+    return solve_model(model, time_limit)
+
+
+def solve_schedule_job(args):
+    """給 process pool 使用的單一參數版本：args = (C, durations, Ts_slots, Te_slots, busy, time_limit[, optional, row_of])"""
+    return solve_schedule(*args)
@@ -0,0 +1,89 @@
+import threading
+import numpy as np
+from busy_index import BusyIndex
+from task_model import INTELLIGENCE_LABELS, SLOTS_PER_DAY, SLOTS_PER_HOUR
+
+
+class BestWindowIndex:
+    """
+    某使用者的「最佳開始時間」索引：對每種智能 × 每個持續時間（slot），
+    預先把一天內所有開始位置依 window cost（滑動視窗總和）由低到高排序。
+    查詢時只要依序掃過排好的候選並用忙碌索引過濾，不需要建 MILP。
+    超過 max_duration 的持續時間在查詢時才計算。
+    """
+
+    def __init__(self, curves, max_duration=4 * SLOTS_PER_HOUR):
+        # curves：num_intelligences x 288 的單日疲勞成本
+        self.curves = np.asarray(curves, dtype=np.float64)
+        self.prefix = np.concatenate([np.zeros((len(self.curves), 1)), np.cumsum(self.curves, axis=1)], axis=1)
+        self.max_duration = max_duration
+        # order[d - 1]：num_intelligences x (289 - d)，依成本排序的開始 slot
+        self.order = [self._rank(d) for d in range(1, max_duration + 1)]
+
+    @classmethod
+    def from_lookup(cls, cost_lookup, max_duration=4 * SLOTS_PER_HOUR):
+        """cost_lookup：智能代碼 -> 288 格疲勞成本"""
+        return cls(np.stack([cost_lookup(code) for code in range(len(INTELLIGENCE_LABELS))]), max_duration)
+
+    def _window_costs(self, d):
+        return self.prefix[:, d:] - self.prefix[:, :-d]
+
+    def _rank(self, d):
+        return np.argsort(self._window_costs(d), axis=1, kind="stable").astype(np.int16)
+
+    def candidates(self, code, duration):
+        """依成本排序的所有開始 slot（當天 00:00 起算）；duration 需大於 0"""
+        if duration <= 0:
+            raise ValueError("❌ 持續時間必須大於 0")
+        if duration <= self.max_duration:
+            return self.order[duration - 1][code]
+        if duration > SLOTS_PER_DAY:
+            return np.zeros(0, dtype=np.int16)
+        return self._rank(duration)[code]
+
+    def suggest(self, code, duration, busy: BusyIndex = None, lo=0, hi=SLOTS_PER_DAY, k=3, spacing=None):
+        """
+        回傳 [lo, hi) 內、避開忙碌時段、成本最低的 k 個開始位置：list of (start slot, cost)。
+        busy 為當天的忙碌索引（origin 需為當天 00:00 或更早）。
+        建議之間至少相隔 spacing 個 slot（預設為 duration，避免只差 5 分鐘的重複建議）。
+        """
+        duration = int(duration)
+        hi = min(hi, SLOTS_PER_DAY)
+        order = self.candidates(code, duration).astype(np.int64)
+        mask = (order >= lo) & (order + duration <= hi)
+        if busy is not None and hi - duration >= lo:
+            ok = busy.feasible_starts(duration, lo, hi)
+            mask[mask] = ok[order[mask] - lo]
+        spacing = duration if spacing is None else spacing
+        best = []
+        for start in order[mask]:
+            if all(abs(start - b) >= spacing for b in best):
+                best.append(start)
+                if len(best) == k:
+                    break
+        best = np.asarray(best, dtype=np.int64)
+        costs = self.prefix[code, best + duration] - self.prefix[code, best]
+        return list(zip(best.tolist(), costs.tolist()))
+
+
+# uid -> (version, BestWindowIndex)；疲勞曲線更新時呼叫 invalidate_window_index，或傳入新的 version
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_window_index(uid: str, cost_lookup, version=None) -> BestWindowIndex:
+    """version 與上次不同時（例如本機 fatigue_store 已同步新的曲線）重新建立索引"""
+    entry = _indexes.get(uid)
+    if entry is None or entry[0] != version:
+        entry = (version, BestWindowIndex.from_lookup(cost_lookup))
+        with _indexes_lock:
+            _indexes[uid] = entry
+    return entry[1]
+
+
+def invalidate_window_index(uid: str = None):
+    with _indexes_lock:
+        if uid is None:
+            _indexes.clear()
+        else:
+            _indexes.pop(uid, None)
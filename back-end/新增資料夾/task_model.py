@@ -0,0 +1,199 @@
+import numpy as np
+
+SLOT_MINUTES = 5                          # 一個 slot = 5 分鐘
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES       # 12
+SLOTS_PER_DAY = 24 * SLOTS_PER_HOUR       # 288
+
+# 八大智能的固定順序，排程與週文件中以索引（整數代碼）儲存，-1 代表未知
+INTELLIGENCE_LABELS = [
+    "語言智能",
+    "邏輯數理智能",
+    "空間智能",
+    "肢體動覺智能",
+    "音樂智能",
+    "人際關係智能",
+    "自省智能",
+    "自然辨識智能",
+]
+INTELLIGENCE_CODE = {label: code for code, label in enumerate(INTELLIGENCE_LABELS)}
+
+# /dick/ask 產生的計劃使用「多元智慧領域」簡稱，對應到上面的智能名稱
+PLAN_DOMAIN_TO_INTELLIGENCE = {
+    "語文": "語言智能",
+    "邏輯數學": "邏輯數理智能",
+    "空間": "空間智能",
+    "音樂": "音樂智能",
+    "身體動覺": "肢體動覺智能",
+    "人際": "人際關係智能",
+    "內省": "自省智能",
+    "自然": "自然辨識智能",
+}
+
+
+# ====== 時間格式轉換（只在 API 邊界使用） ======
+def hhmm_to_minutes(value: str) -> int:
+    """'HH:MM' -> 從當天 00:00 起算的分鐘數"""
+    h, m = map(int, value.split(":"))
+    return h * 60 + m
+
+
+def minutes_to_hhmm(minutes) -> str:
+    """分鐘數 -> 'HH:MM'（超過 24 小時不取餘數，與原本排程輸出一致）"""
+    h, m = divmod(int(minutes), 60)
+    return f"{h:02}:{m:02}"
+
+
+def parse_window(Ts: str, Te: str):
+    """
+    把 Ts / Te（'HH:MM'）轉成 slot 區間 (Ts_slot, Te_slot)。
+    若 Te <= Ts 則視為跨日（Te 加 24 小時）。
+    """
+    ts = hhmm_to_minutes(Ts)
+    te = hhmm_to_minutes(Te)
+    if te <= ts:
+        te += 24 * 60
+    return ts // SLOT_MINUTES, te // SLOT_MINUTES
+
+
+def intelligence_codes(analysis_results: list, n: int) -> np.ndarray:
+    """把 intelligent_task_analysis 的結果轉成長度 n 的智能代碼陣列（缺少則為 -1）"""
+    codes = np.full(n, -1, dtype=np.int8)
+    for i, result in enumerate(analysis_results[:n]):
+        if isinstance(result, dict):
+            label = result.get("intelligence") or ""
+            if isinstance(label, (list, tuple)):
+                label = label[0] if label else ""
+            codes[i] = INTELLIGENCE_CODE.get(label.strip(), -1)
+    return codes
+
+
+class TaskBatch:
+    """
+    一次請求中的待排任務（struct-of-arrays）：
+    - durations: 每個任務佔用的 slot 數（int32）
+    - minutes:   原始持續分鐘數（int32）
+    - fixed:     是否為固定任務（bool）
+    - desc:      任務描述（list of str，只用於分類與輸出）
+    """
+
+    def __init__(self, minutes, desc, fixed=None):
+        self.minutes = np.asarray(minutes, dtype=np.int32)
+        self.durations = -(-self.minutes // SLOT_MINUTES)  # 向上取整 = math.ceil(d / 5)
+        self.desc = list(desc)
+        n = len(self.minutes)
+        self.fixed = np.zeros(n, dtype=bool) if fixed is None else np.asarray(fixed, dtype=bool)
+        if len(self.desc) < n:
+            self.desc += [""] * (n - len(self.desc))
+
+    @classmethod
+    def from_slots(cls, durations, desc, fixed=None):
+        """由 slot 數建立（舊介面 durations 已是 slot 數時使用）"""
+        return cls(np.asarray(durations, dtype=np.int32) * SLOT_MINUTES, desc, fixed)
+
+    def __len__(self):
+        return len(self.durations)
+
+    def subset(self, idx):
+        """取出部分任務（idx 為索引陣列），回傳新的 TaskBatch"""
+        idx = np.asarray(idx, dtype=np.int64)
+        return TaskBatch(self.minutes[idx], [self.desc[i] for i in idx], self.fixed[idx])
+
+
+class Schedule:
+    """
+    排程結果（struct-of-arrays），時間皆為從當天 00:00 起算的 slot：
+    - index:        原任務索引
+    - start / end:  開始 / 結束 slot（end 為不含）
+    - intelligence: 智能代碼（-1 代表未知）
+    - desc:         任務描述
+    """
+
+    def __init__(self, index, start, end, intelligence, desc):
+        self.index = np.asarray(index, dtype=np.int32)
+        self.start = np.asarray(start, dtype=np.int32)
+        self.end = np.asarray(end, dtype=np.int32)
+        self.intelligence = np.asarray(intelligence, dtype=np.int8)
+        self.desc = list(desc)
+
+    @classmethod
+    def from_starts(cls, starts, batch: TaskBatch, codes):
+        """
+        由求解器回傳的開始 slot 陣列建立（-1 代表該任務未排入，會被略過）。
+        """
+        starts = np.asarray(starts)
+        idx = np.flatnonzero(starts >= 0)
+        return cls(idx, starts[idx], starts[idx] + batch.durations[idx],
+                   np.asarray(codes)[idx], [batch.desc[i] for i in idx])
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_packed(cls, packed: dict):
+        """由週文件中某一天的平行陣列（分鐘）還原"""
+        start = np.asarray(packed.get("start", []), dtype=np.int32) // SLOT_MINUTES
+        end = -(-np.asarray(packed.get("end", []), dtype=np.int32) // SLOT_MINUTES)
+        return cls(np.arange(len(start)), start, end, packed.get("intelligence", []), packed.get("desc", []))
+
+    @classmethod
+    def from_chunks(cls, chunks, batch: TaskBatch, codes):
+        """搶佔式排程：每一段（task, start, end）是一筆，同一個任務的多段共用 index"""
+        task, start, end = (np.asarray(a) for a in chunks)
+        order = np.lexsort((start, task))
+        task, start, end = task[order], start[order], end[order]
+        return cls(task, start, end, np.asarray(codes)[task], [batch.desc[i] for i in task])
+
+    def split_by_day(self, dates: list, keep_empty: bool = False) -> list:
+        """
+        多日時間軸的結果依開始 slot 拆成每天一份（slot 改為相對各自當天 00:00），
+        回傳 list of (date_str, Schedule)。沒有任務的日期預設略過；
+        keep_empty=True 時回傳空的 Schedule（寫入 Firestore 時用來清掉當天的舊任務）。
+        """
+        day_idx = self.start // SLOTS_PER_DAY
+        parts = []
+        for k, date_str in enumerate(dates):
+            sel = np.flatnonzero(day_idx == k)
+            if len(sel) == 0 and not keep_empty:
+                continue
+            offset = k * SLOTS_PER_DAY
+            parts.append((date_str, Schedule(self.index[sel], self.start[sel] - offset, self.end[sel] - offset,
+                                             self.intelligence[sel], [self.desc[i] for i in sel])))
+        return parts
+
+    def to_dicts(self) -> list:
+        """API / Firestore 邊界：轉成原本的 {"index","startTime","endTime","desc","intelligence"}"""
+        start_min = self.start * SLOT_MINUTES
+        end_min = self.end * SLOT_MINUTES
+        results = []
+        for k in range(len(self.index)):
+            code = int(self.intelligence[k])
+            results.append({
+                "index": int(self.index[k]),
+                "startTime": minutes_to_hhmm(start_min[k]),
+                "endTime": minutes_to_hhmm(end_min[k]),
+                "desc": self.desc[k],
+                "intelligence": INTELLIGENCE_LABELS[code] if code >= 0 else ""
+            })
+        return results
+
+    def to_dated_dicts(self, dates: list) -> list:
+        """
+        多日時間軸的 API 輸出：依開始日期拆開（split_by_day），每筆多一個 "date"，
+        startTime / endTime 相對當天 00:00（隔天的任務不會顯示成 38:00）。
+        """
+        results = []
+        for date_str, day_schedule in self.split_by_day(dates):
+            for task in day_schedule.to_dicts():
+                task["date"] = date_str
+                results.append(task)
+        return results
+
+    def to_packed(self) -> dict:
+        """週文件用的平行陣列（依開始時間排序，時間單位為分鐘）"""
+        order = np.argsort(self.start, kind="stable")
+        return {
+            "start": (self.start[order] * SLOT_MINUTES).tolist(),
+            "end": (self.end[order] * SLOT_MINUTES).tolist(),
+            "intelligence": self.intelligence[order].astype(int).tolist(),
+            "desc": [self.desc[k] for k in order],
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 模組都放在上一層資料夾（沒有套件結構），測試時直接加進 import 路徑
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
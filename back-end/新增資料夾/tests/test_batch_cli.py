@@ -0,0 +1,21 @@
+import os
+import sys
+import subprocess
+
+SCRIPT = """
+import subprocess, sys
+import batch_cli
+real_stdout = batch_cli._stdout_to_stderr()
+print("✅ 進度")
+subprocess.run([sys.executable, "-c", "print('子行程')"])
+real_stdout.write('{"success": true}\\n')
+real_stdout.close()
+"""
+
+
+def test_progress_output_goes_to_stderr():
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    done = subprocess.run([sys.executable, "-c", SCRIPT], cwd=here, capture_output=True, text=True,
+                          encoding="utf-8", check=True)
+    assert done.stdout == '{"success": true}\n'
+    assert "進度" in done.stderr and "子行程" in done.stderr
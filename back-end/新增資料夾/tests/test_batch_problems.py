@@ -0,0 +1,41 @@
+from batch_problems import problem_from_dict, plan_to_problems
+from task_model import SLOTS_PER_DAY, INTELLIGENCE_LABELS, INTELLIGENCE_CODE
+
+
+def test_problem_from_dict_converts_submit_payload():
+    problem = problem_from_dict({"taskDate": "2025-08-20", "Ts": "08:00", "Te": "22:00", "k": [30, 45],
+                                 "desc": ["讀書", "運動"], "fixed": [False, False], "uid": "u1"})
+    assert (problem["uid"], problem["date"], problem["Ts_slots"], problem["Te_slots"]) == ("u1", "2025-08-20", 96, 264)
+    assert problem["batch"].durations.tolist() == [6, 9]
+    assert problem["batch"].desc == ["讀書", "運動"]
+    assert "codes" not in problem
+
+
+def test_problem_from_dict_handles_overnight_and_multi_day_windows():
+    overnight = problem_from_dict({"taskDate": "2025-08-20", "Ts": "22:00", "Te": "02:00", "k": [60], "desc": ["a"]})
+    assert (overnight["Ts_slots"], overnight["Te_slots"]) == (264, SLOTS_PER_DAY + 24)
+    assert overnight["uid"] == "testUser"
+    multi = problem_from_dict({"taskDate": "2025-08-20", "endDate": "2025-08-22", "Ts": "08:00", "Te": "12:00",
+                               "k": [60], "desc": ["a"]})
+    assert multi["Te_slots"] == 2 * SLOTS_PER_DAY + 144
+
+
+def _item(event, day, minutes, domain):
+    return {"事件": event, "年分": "2025", "月份": "8", "日期": str(day), "持續時間": minutes, "多元智慧領域": domain}
+
+
+def test_plan_to_problems_groups_items_by_date_and_maps_domains():
+    plan = {"行程": [_item("散步", 21, 30, "自然"), _item("背單字", 20, 45, "語文"),
+                     _item("冥想", 20, 15, " 內省 "), _item("發呆", 21, 10, "不存在")]}
+    problems = plan_to_problems(plan, "09:00", "21:00", uid="u2")
+    assert [p["date"] for p in problems] == ["2025-08-20", "2025-08-21"]
+    first, second = problems
+    assert (first["uid"], first["Ts_slots"], first["Te_slots"]) == ("u2", 108, 252)
+    assert first["batch"].desc == ["背單字", "冥想"] and first["batch"].durations.tolist() == [9, 3]
+    assert [INTELLIGENCE_LABELS[c] for c in first["codes"]] == ["語言智能", "自省智能"]
+    assert second["codes"][0] == INTELLIGENCE_CODE["自然辨識智能"]
+    assert second["codes"][1] == -1     # 無法對應的領域標成 -1，schedule_batch 會把這天回報為失敗，而不是再呼叫分類模型
+
+
+def test_plan_without_items_gives_no_problems():
+    assert plan_to_problems({}, "08:00", "22:00") == []
@@ -0,0 +1,60 @@
+import numpy as np
+import busy_index
+from busy_index import BusyIndex, event_intervals, get_day_busy_index, invalidate_day_busy_index
+
+
+def test_event_intervals_round_outwards_and_wrap_midnight():
+    starts, ends = event_intervals([{"startTime": "08:03", "endTime": "09:01"},
+                                    {"startTime": "23:00", "endTime": "01:00"}])
+    assert starts.tolist() == [96, 276]
+    assert ends.tolist() == [109, 300]
+
+
+def test_feasible_starts_matches_brute_force():
+    rng = np.random.default_rng(0)
+    index = BusyIndex(0, 288)
+    index.add_many(rng.integers(0, 280, 10), rng.integers(0, 280, 10) + 5)
+    for duration in (1, 6, 12):
+        ok = index.feasible_starts(duration, 50, 250)
+        expected = [index.is_free(50 + j, duration) and 50 + j + duration <= 250 for j in range(200)]
+        assert ok.tolist() == expected
+        assert all(not index.busy[s:s + duration].any() for s in np.flatnonzero(ok) + 50)
+
+
+def test_free_gaps_and_find_free_slot():
+    index = BusyIndex.from_events([{"startTime": "09:00", "endTime": "10:00"}])
+    starts, ends = index.free_gaps(96, 144)
+    assert list(zip(starts.tolist(), ends.tolist())) == [(96, 108), (120, 144)]
+    assert index.find_free_slot(24, 96, 144) == 120
+    assert index.find_free_slot(30, 96, 144) is None
+
+
+def test_merge_with_offset_and_clip():
+    day = BusyIndex.from_events([{"startTime": "23:00", "endTime": "01:00"}], length=2 * 288)
+    timeline = BusyIndex(0, 2 * 288)
+    timeline.merge(day, offset=288)
+    assert timeline.busy[288 + 276:288 + 288].all()
+    assert timeline.busy[576 - 1]
+    assert not timeline.busy[:288].any()
+
+
+def test_day_index_cache_expires_after_ttl(monkeypatch):
+    calls = []
+
+    def fetch(date_str, uid):
+        calls.append(date_str)
+        return [{"startTime": "09:00", "endTime": "10:00"}]
+
+    now = [1000.0]
+    monkeypatch.setattr(busy_index, "BUSY_INDEX_TTL_SECONDS", 60.0)
+    invalidate_day_busy_index("ttl-user")
+    get_day_busy_index("ttl-user", "2025-08-20", fetch, clock=lambda: now[0])
+    now[0] += 30
+    get_day_busy_index("ttl-user", "2025-08-20", fetch, clock=lambda: now[0])
+    assert len(calls) == 1
+    now[0] += 31
+    get_day_busy_index("ttl-user", "2025-08-20", fetch, clock=lambda: now[0])
+    assert len(calls) == 2
+    invalidate_day_busy_index("ttl-user", "2025-08-20")
+    get_day_busy_index("ttl-user", "2025-08-20", fetch, clock=lambda: now[0])
+    assert len(calls) == 3
@@ -0,0 +1,67 @@
+import datetime
+import threading
+from types import SimpleNamespace
+from change_feed import FirestoreChangeFeed, FixedEventChange, LocalEventStream, ChangeFeedSubscriber, ScheduleVersions
+
+
+def _change(kind, uid, date_str, doc_id, start="09:00", end="10:00"):
+    document = SimpleNamespace(reference=SimpleNamespace(path=f"Tasks/{uid}/task_list/{date_str}/tasks/{doc_id}"),
+                               to_dict=lambda: {"startTime": start, "endTime": end})
+    return SimpleNamespace(document=document, type=SimpleNamespace(name=kind))
+
+
+def _feed(today):
+    return FirestoreChangeFeed(db=None, keep_days=1, today=lambda: today[0])
+
+
+def test_initial_snapshot_only_records_and_modify_reports_old_and_new():
+    today = [datetime.date(2025, 8, 20)]
+    feed, seen = _feed(today), []
+    feed.handle([_change("ADDED", "u", "2025-08-20", "a")], seen.append)
+    assert seen == []
+    feed.handle([_change("MODIFIED", "u", "2025-08-20", "a", "11:00", "12:00")], seen.append)
+    assert seen[0].kind == "MODIFIED"
+    assert seen[0].events == [{"startTime": "09:00", "endTime": "10:00"}, {"startTime": "11:00", "endTime": "12:00"}]
+
+
+def test_past_dates_are_not_tracked_and_get_pruned():
+    today = [datetime.date(2025, 8, 20)]
+    feed = _feed(today)
+    feed.handle([_change("ADDED", "u", "2025-08-01", "old"), _change("ADDED", "u", "2025-08-21", "new")],
+                lambda c: None)
+    assert list(feed._last_seen) == [("u", "2025-08-21")]
+
+    today[0] = datetime.date(2025, 8, 25)
+    feed.handle([], lambda c: None)
+    assert feed._last_seen == {}
+
+
+def test_removing_last_event_drops_the_day():
+    today = [datetime.date(2025, 8, 20)]
+    feed, seen = _feed(today), []
+    feed.handle([_change("ADDED", "u", "2025-08-20", "a")], seen.append)
+    feed.handle([_change("REMOVED", "u", "2025-08-20", "a")], seen.append)
+    assert seen[0].events == [{"startTime": "09:00", "endTime": "10:00"}]
+    assert feed._last_seen == {}
+
+
+def test_subscriber_debounces_changes_per_day():
+    stream, calls, done = LocalEventStream(), [], threading.Event()
+
+    def handler(uid, date_str, events):
+        calls.append((uid, date_str, len(events)))
+        done.set()
+
+    subscriber = ChangeFeedSubscriber(stream, handler, debounce_seconds=0.05).start()
+    for _ in range(3):
+        stream.publish(FixedEventChange("u", "2025-08-20", "MODIFIED", [{"startTime": "09:00", "endTime": "10:00"}]))
+    assert done.wait(2)
+    subscriber.stop()
+    assert calls == [("u", "2025-08-20", 3)]
+
+
+def test_schedule_versions_discard_older_results():
+    versions = ScheduleVersions()
+    assert versions.publish("u", "d", 2, ["new"])
+    assert not versions.publish("u", "d", 1, ["old"])
+    assert versions.get("u", "d")["tasks"] == ["new"]
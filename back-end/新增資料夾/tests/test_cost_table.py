@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+from busy_index import BusyIndex
+from cost_table import CostTable, get_cost_table, invalidate_cost_tables
+from decompose import solve_decomposed
+from fatigue_cost import FatigueAccumulation, improve_sequence
+from preemptive import solve_preemptive
+from reoptimize import ProblemState, reoptimize
+from rolling_horizon import solve_rolling, daily_windows
+from scenarios import Scenario, solve_scenarios
+from solver import solve_schedule, window_cost_prefix
+from task_model import TaskBatch, SLOTS_PER_DAY
+
+
+def _fetch(calls):
+    def fetch(codes):
+        calls.append(list(codes))
+        return np.array([np.full(24, code + 1.0) for code in codes])
+    return fetch
+
+
+def test_rows_are_fetched_once_and_expanded_to_slots():
+    calls = []
+    table = CostTable(_fetch(calls))
+    rows, row_of = table.distinct([3, 1, 3])
+    assert calls == [[1, 3]]
+    assert rows.shape == (2, SLOTS_PER_DAY)
+    assert row_of.tolist() == [1, 0, 1]
+    table.distinct([1, 3])
+    assert calls == [[1, 3]]
+    assert not table.row(3).flags.writeable
+
+
+def test_unclassified_tasks_are_rejected_not_free():
+    table = CostTable(_fetch([]))
+    with pytest.raises(ValueError, match="任務 2、4"):
+        table.distinct([3, -1, 1, -1])
+    with pytest.raises(ValueError):
+        table.row(-1)
+
+
+def test_cost_table_rebuilt_when_version_changes():
+    invalidate_cost_tables()
+    first = get_cost_table("u", _fetch([]), version=1)
+    assert get_cost_table("u", _fetch([]), version=1) is first
+    assert get_cost_table("u", _fetch([]), version=2) is not first
+
+
+def _problem():
+    rng = np.random.default_rng(7)
+    rows = rng.random((3, 2 * SLOTS_PER_DAY))
+    row_of = np.array([0, 1, 2, 0, 1, 0])
+    durations = rng.integers(3, 9, len(row_of))
+    busy = BusyIndex.from_events([{"startTime": "12:00", "endTime": "13:00"}], length=2 * SLOTS_PER_DAY)
+    return rows, row_of, durations, busy
+
+
+def test_all_solvers_accept_shared_rows():
+    rows, row_of, durations, busy = _problem()
+    C = rows[row_of]
+    windows = daily_windows(96, 144, 2)
+    pairs = [
+        (solve_rolling(rows, durations, windows, busy, row_of=row_of), solve_rolling(C, durations, windows, busy)),
+        (solve_decomposed(rows, durations, 96, 264, busy, parallel=False, row_of=row_of),
+         solve_decomposed(C, durations, 96, 264, busy, parallel=False)),
+        (solve_preemptive(rows, durations[:3], 96, 132, busy, row_of=row_of[:3]),
+         solve_preemptive(C[:3], durations[:3], 96, 132, busy)),
+    ]
+    for shared, copied in pairs:
+        assert np.isclose(shared.cost, copied.cost)
+
+
+def test_fatigue_and_scenarios_accept_shared_rows():
+    rows, row_of, durations, busy = _problem()
+    C = rows[row_of]
+    codes = np.zeros(len(durations), dtype=np.int8)
+    start = solve_schedule(C, durations, 96, 264, busy).starts
+    model = FatigueAccumulation()
+    shared = improve_sequence(start, durations, codes, window_cost_prefix(rows), busy, 96, 264, model, row_of=row_of)
+    copied = improve_sequence(start, durations, codes, window_cost_prefix(C), busy, 96, 264, model)
+    assert np.isclose(shared[1], copied[1])
+
+    scenario = [Scenario("a", 96, 264, [0, 2, 4], durations)]
+    shared = solve_scenarios(rows, scenario, busy, parallel=False, row_of=row_of)[0]
+    copied = solve_scenarios(C, scenario, busy, parallel=False)[0]
+    assert np.isclose(shared[1], copied[1])
+
+
+def test_reoptimize_keeps_rows_compact():
+    rows, row_of, durations, busy = _problem()
+    batch = TaskBatch.from_slots(durations, [f"t{i}" for i in range(len(durations))])
+    starts = solve_schedule(rows, durations, 96, 264, busy, row_of=row_of).starts
+    state = ProblemState("u", "2025-08-20", 96, 264, batch, np.zeros(len(durations), dtype=np.int8), rows,
+                         ["2025-08-20", "2025-08-21"], starts, row_of=row_of)
+    # 刪掉唯一使用第 2 列的任務，再加入一個使用新列的任務
+    add_rows = np.random.default_rng(1).random((1, 2 * SLOTS_PER_DAY))
+    new_state, result = reoptimize(state, busy, remove=[2], add_batch=TaskBatch([30], ["new"]), add_codes=[5],
+                                   add_C=add_rows, add_row_of=[0])
+    assert new_state.C.shape[0] == 3
+    assert np.array_equal(new_state.C[new_state.row_of[-1]], add_rows[0])
+    P = window_cost_prefix(new_state.C)
+    d = new_state.batch.durations
+    expected = (P[new_state.row_of, result.starts + d] - P[new_state.row_of, result.starts]).sum()
+    assert np.isclose(result.cost, expected)
@@ -0,0 +1,49 @@
+import numpy as np
+from busy_index import BusyIndex
+from decompose import solve_decomposed
+from solver import solve_schedule
+
+
+def _no_overlap(starts, durations, busy):
+    occupied = busy.copy()
+    for s, d in zip(starts, durations):
+        assert occupied.is_free(int(s), int(d))
+        occupied.add(int(s), int(s + d))
+
+
+def test_decompose_matches_exact_when_gaps_do_not_interact():
+    # 三個空檔，每個任務的低成本時段各在不同空檔內
+    C = np.ones((3, 288))
+    C[0, 100:106] = 0.1
+    C[1, 150:162] = 0.2
+    C[2, 200:203] = 0.3
+    durations = np.array([6, 12, 3])
+    busy = BusyIndex.from_events([{"startTime": "10:00", "endTime": "12:00"},
+                                  {"startTime": "14:00", "endTime": "16:00"}])
+    exact = solve_schedule(C, durations, 96, 264, busy)
+    decomposed = solve_decomposed(C, durations, 96, 264, busy, parallel=False)
+    assert decomposed.starts.tolist() == exact.starts.tolist() == [100, 150, 200]
+    assert np.isclose(decomposed.cost, exact.cost)
+
+
+def test_decompose_is_feasible_and_never_beats_exact():
+    rng = np.random.default_rng(3)
+    for _ in range(5):
+        C = rng.random((6, 288))
+        durations = rng.integers(3, 13, 6)
+        busy = BusyIndex(0, 288)
+        fixed = rng.integers(100, 250, 3)
+        busy.add_many(fixed, fixed + 12)
+        exact = solve_schedule(C, durations, 96, 264, busy)
+        decomposed = solve_decomposed(C, durations, 96, 264, busy, parallel=False)
+        _no_overlap(decomposed.starts, durations, busy)
+        assert decomposed.cost >= exact.cost - 1e-9
+
+
+def test_parallel_gaps_use_the_process_pool():
+    C = np.random.default_rng(1).random((4, 288))
+    durations = np.array([6, 6, 6, 6])
+    busy = BusyIndex.from_events([{"startTime": "12:00", "endTime": "13:00"}])
+    serial = solve_decomposed(C, durations, 96, 264, busy, parallel=False)
+    parallel = solve_decomposed(C, durations, 96, 264, busy, parallel=True)
+    assert parallel.starts.tolist() == serial.starts.tolist()
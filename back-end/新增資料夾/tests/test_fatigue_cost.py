@@ -0,0 +1,42 @@
+import numpy as np
+from busy_index import BusyIndex
+from fatigue_cost import FatigueAccumulation, improve_sequence
+from solver import window_cost_prefix
+from task_model import TaskBatch, Schedule, SLOTS_PER_DAY
+
+
+def test_back_to_back_same_intelligence_costs_more():
+    model = FatigueAccumulation(alpha=0.5, rest_gap=3)
+    base = np.ones(3)
+    costs = model.task_costs([0, 12, 40], [12, 12, 12], [1, 1, 1], base)
+    # 第二個任務緊接第一個（連續 1 小時），第三個前面休息超過 rest_gap
+    assert np.allclose(costs, [1.0, 1.5, 1.0])
+    # 不同智能或未知智能不累積
+    assert np.allclose(model.task_costs([0, 12], [12, 12], [1, 2], np.ones(2)), [1, 1])
+    assert np.allclose(model.task_costs([0, 12], [12, 12], [-1, -1], np.ones(2)), [1, 1])
+
+
+def test_improve_sequence_never_increases_cost_and_stays_feasible():
+    rng = np.random.default_rng(5)
+    C = np.tile(rng.random(288) * 0.1 + 1.0, (4, 1))
+    P = window_cost_prefix(C)
+    durations = np.array([12, 12, 12, 12])
+    codes = np.array([0, 0, 0, 0])
+    starts = np.array([96, 108, 120, 132])
+    busy = BusyIndex.from_events([{"startTime": "14:00", "endTime": "15:00"}])
+    model = FatigueAccumulation()
+    before = model.total(starts, durations, codes, P)
+    improved, after = improve_sequence(starts, durations, codes, P, busy, 96, 264, model)
+    assert after < before
+    assert np.isclose(after, model.total(improved, durations, codes, P))
+    occupied = busy.copy()
+    for s, d in zip(improved, durations):
+        assert 96 <= s and s + d <= 264 and occupied.is_free(int(s), int(d))
+        occupied.add(int(s), int(s + d))
+
+
+def test_dated_dicts_use_day_relative_times():
+    batch = TaskBatch([60, 60], ["今天", "明天"])
+    schedule = Schedule.from_starts([100, SLOTS_PER_DAY + 168], batch, [0, 0])
+    tasks = schedule.to_dated_dicts(["2025-08-20", "2025-08-21"])
+    assert [(t["date"], t["startTime"]) for t in tasks] == [("2025-08-20", "08:20"), ("2025-08-21", "14:00")]
@@ -0,0 +1,90 @@
+import datetime
+import numpy as np
+from fatigue_store import FatigueStoreWriter, sync_from_firestore
+from task_model import SLOTS_PER_DAY
+
+
+def _curve(value):
+    return np.full(SLOTS_PER_DAY, value, dtype=np.float32)
+
+
+def test_unrated_intelligences_fall_back_per_code(tmp_path):
+    writer = FatigueStoreWriter(str(tmp_path))
+    writer.write({"u1": {2: _curve(5)}})
+    store = writer.store
+    assert store.loaded_mask("u1").tolist() == [False, False, True, False, False, False, False, False]
+
+    asked = []
+
+    def fetch(missing):
+        asked.append(missing)
+        return np.array([np.full(24, 10.0 + c) for c in missing])
+
+    out = store.curves_with_fallback("u1", [2, 4, 2], fetch)
+    assert asked == [[4]]
+    assert out.shape == (3, SLOTS_PER_DAY)
+    assert np.all(out[0] == 5) and np.all(out[2] == 5)
+    assert np.all(out[1] == 14)
+
+
+def test_loaded_mask_grows_and_survives_new_users(tmp_path):
+    writer = FatigueStoreWriter(str(tmp_path))
+    writer.write({"u1": {0: _curve(1)}})
+    writer.write({"u1": {3: _curve(2)}, "u2": {1: _curve(3)}})
+    store = writer.store
+    assert np.flatnonzero(store.loaded_mask("u1")).tolist() == [0, 3]
+    assert np.flatnonzero(store.loaded_mask("u2")).tolist() == [1]
+    assert np.all(store.curves("u1")[0] == 1)
+    out = store.curves_with_fallback("u3", [1], lambda missing: np.ones((len(missing), SLOTS_PER_DAY)))
+    assert np.all(out == 1)
+
+
+class _Doc:
+    def __init__(self, uid, suffix, values, updated_at):
+        self.id = f"fatigue_{suffix}"
+        self.reference = type("Ref", (), {"path": f"users/{uid}/fatigue_logs/{self.id}"})()
+        self._data = {"values": values, "updatedAt": updated_at}
+
+    def to_dict(self):
+        return self._data
+
+
+class _Query:
+    def __init__(self, docs, wheres):
+        self.docs, self.wheres = docs, wheres
+
+    def where(self, field, op, value):
+        assert (field, op) == ("updatedAt", ">")
+        self.wheres.append(value)
+        return _Query([d for d in self.docs if d.to_dict()["updatedAt"] > value], self.wheres)
+
+    def select(self, fields):
+        return self
+
+    def stream(self):
+        return iter(self.docs)
+
+
+class _Db:
+    def __init__(self, docs):
+        self.docs, self.wheres = docs, []
+
+    def collection_group(self, name):
+        assert name == "fatigue_logs"
+        return _Query(self.docs, self.wheres)
+
+
+def test_sync_queries_only_documents_after_last_sync(tmp_path):
+    t0 = datetime.datetime(2025, 5, 1, 8, tzinfo=datetime.timezone.utc)
+    db = _Db([_Doc("u1", "logical", [1.0] * 24, t0)])
+    writer = FatigueStoreWriter(str(tmp_path))
+    assert sync_from_firestore(db, writer, {"logical": 1, "spatial": 2}) == 1
+    assert db.wheres == []
+
+    assert sync_from_firestore(db, writer, {"logical": 1, "spatial": 2}) == 0
+    assert db.wheres == [t0]
+
+    db.docs.append(_Doc("u1", "spatial", [2.0] * 24, t0 + datetime.timedelta(minutes=5)))
+    assert sync_from_firestore(db, writer, {"logical": 1, "spatial": 2}) == 1
+    assert np.flatnonzero(writer.store.loaded_mask("u1")).tolist() == [1, 2]
+    assert writer.store.last_sync == (t0 + datetime.timedelta(minutes=5)).isoformat()
@@ -0,0 +1,58 @@
+import numpy as np
+from fatigue_stream import FatigueAggregator
+
+
+def test_priors_and_updates_are_kept_per_user():
+    asked = []
+
+    def prior(uid):
+        asked.append(uid)
+        return np.full((8, 24), 2.0 if uid == "a" else 6.0)
+
+    agg = FatigueAggregator(prior, prior_weight=1.0)
+    agg.ingest([{"uid": "a", "intelligence": "空間智能", "timestamp": "2025-05-01T09:10:00", "rating": 4},
+                {"uid": "b", "intelligence": 2, "timestamp": "2025-05-01T09:20:00", "rating": 4}])
+    assert asked == ["a", "b"]
+    assert np.isclose(agg.curve("a", 2)[9], 3.0, atol=0.01)
+    assert np.isclose(agg.curve("b", 2)[9], 5.0, atol=0.01)
+    assert agg.curve("a", 2)[10] == 2.0
+
+    written = []
+    assert agg.flush([written.append]) == 2
+    assert set(written[0]) == {"a", "b"}
+    assert list(written[0]["a"]) == [2]
+    assert agg.flush([written.append]) == 0
+
+
+def test_unknown_events_are_skipped():
+    agg = FatigueAggregator(lambda uid: None)
+    assert agg.ingest([{"uid": "a", "intelligence": "不存在", "timestamp": 0, "rating": 1},
+                       {"uid": "a", "intelligence": 1, "timestamp": 0, "rating": None}]) == 0
+    assert agg.curve("a", 1) is None
+
+
+def test_unrated_hours_without_prior_are_not_written_as_zero():
+    agg = FatigueAggregator(lambda uid: None)
+    morning = [{"uid": "new", "intelligence": 1, "timestamp": f"2025-05-01T{h:02d}:00:00", "rating": 3}
+               for h in range(12)]
+    agg.ingest(morning)
+    written = []
+    assert agg.flush([written.append]) == 0
+    assert written == []
+
+    agg.ingest([{"uid": "new", "intelligence": 1, "timestamp": f"2025-05-01T{h:02d}:00:00", "rating": 5}
+                for h in range(12, 24)])
+    assert agg.flush([written.append]) == 1
+    curve = written[0]["new"][1]
+    assert np.allclose(curve[:12], 3) and np.allclose(curve[12:], 5)
+
+
+def test_missing_prior_rows_only_cover_their_own_intelligence():
+    prior = np.full((8, 24), 2.0)
+    prior[5] = np.nan
+    agg = FatigueAggregator(lambda uid: prior, prior_weight=1.0)
+    agg.ingest([{"uid": "u", "intelligence": 5, "timestamp": "2025-05-01T09:00:00", "rating": 4},
+                {"uid": "u", "intelligence": 0, "timestamp": "2025-05-01T09:00:00", "rating": 4}])
+    written = []
+    assert agg.flush([written.append]) == 1
+    assert list(written[0]["u"]) == [0]
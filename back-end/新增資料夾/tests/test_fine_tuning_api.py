@@ -0,0 +1,38 @@
+import threading
+import pytest
+
+pytest.importorskip("vertexai")
+import fine_tuningAPI
+
+
+def test_chunks_are_balanced():
+    sizes = [len(c) for c in fine_tuningAPI._chunks(list(range(31)), 15)]
+    assert sizes == [11, 10, 10]
+    assert fine_tuningAPI._chunks([], 15) == []
+
+
+def test_parse_chunk_marks_invalid_labels():
+    raw = '<<JSON_START>>[{"mission": "a", "intelligence": "空間智能"}, {"mission": "b", "intelligence": "?"}]<<JSON_END>>'
+    assert fine_tuningAPI._parse_chunk(raw, ["a", "b"]) == ["空間智能", None]
+
+
+def test_endpoint_is_initialized_once_across_threads(monkeypatch):
+    inits = []
+
+    class FakeModel:
+        def __init__(self, path):
+            self.path = path
+
+        def generate_content(self, prompt):
+            return type("Response", (), {"text": prompt})()
+
+    monkeypatch.setattr(fine_tuningAPI.vertexai, "init", lambda **kwargs: inits.append(kwargs))
+    monkeypatch.setattr(fine_tuningAPI, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(fine_tuningAPI, "_endpoint_models", {})
+    threads = [threading.Thread(target=fine_tuningAPI.predict_with_endpoint, args=("p", "l", "e", None, "x"))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(inits) == 1
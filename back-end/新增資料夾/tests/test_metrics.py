@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+from metrics import Counter, Histogram, route_label
+
+
+def test_route_label_uses_the_path_template():
+    scope = {"path": "/api/schedule/2025-05-01", "route": SimpleNamespace(path="/api/schedule/{date}")}
+    assert route_label(scope) == "/api/schedule/{date}"
+    assert route_label({"path": "/no/such/page"}) == "unmatched"
+
+
+def test_histogram_render_is_cumulative():
+    hist = Histogram("h", "help", ("path",), buckets=(0.1, 1.0))
+    hist.observe(0.05, path="/a")
+    hist.observe(0.5, path="/a")
+    lines = hist.render()
+    assert 'h_bucket{path="/a",le="0.1"} 1' in lines
+    assert 'h_bucket{path="/a",le="1.0"} 2' in lines
+    assert 'h_bucket{path="/a",le="+Inf"} 2' in lines
+    assert 'h_count{path="/a"} 2' in lines
+
+
+def test_counter_render_with_and_without_labels():
+    labelled = Counter("c", "help", ("status",))
+    labelled.inc(status="optimal")
+    labelled.inc(2, status="optimal")
+    plain = Counter("p", "help")
+    plain.inc(1.5)
+    assert 'c{status="optimal"} 3' in labelled.render()
+    assert "p 1.5" in plain.render()
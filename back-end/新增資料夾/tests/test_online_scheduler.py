@@ -0,0 +1,70 @@
+import numpy as np
+from busy_index import BusyIndex
+from online_scheduler import DayPlan, OnlineScheduler
+
+
+def _plan(Ts=96, Te=120):
+    cost = np.ones(288)
+    cost[108:] = 0.5
+    busy = BusyIndex(0, 2 * 288)
+    return DayPlan("2025-08-20", Ts, Te, busy, lambda code: cost)
+
+
+def test_insert_takes_cheapest_free_window():
+    plan = _plan()
+    outcome = plan.insert("a", "a", 6, 0)
+    assert outcome == {"placed": True, "start": 108, "strategy": "insert"}
+
+
+def test_higher_priority_task_shifts_lower_priority_one():
+    plan = _plan(Te=108)
+    plan.insert("low", "low", 12, 0)
+    outcome = plan.insert("high", "high", 6, 0, urgency=2)
+    assert outcome["placed"]
+    assert plan.tasks["low"]["start"] is None
+    assert [key[1] for key in plan.pending] == ["low"]
+
+
+def test_remove_unknown_task_reports_false():
+    plan = _plan()
+    assert plan.remove("missing") is False
+
+
+def test_remove_dispatches_pending_task():
+    plan = _plan(Te=108)
+    plan.insert("first", "first", 12, 0)
+    assert plan.insert("second", "second", 6, 0)["strategy"] == "pending"
+    assert plan.remove("first") is True
+    assert plan.tasks["second"]["start"] == 96
+    assert len(plan.to_schedule()) == 1
+
+
+def test_online_scheduler_drop_forces_reload():
+    scheduler = OnlineScheduler()
+    first = scheduler.get_or_create("u", "2025-08-20", _plan)
+    assert scheduler.get_or_create("u", "2025-08-20", _plan) is first
+    scheduler.drop("u", "2025-08-20")
+    assert scheduler.get("u", "2025-08-20") is None
+    assert scheduler.get_or_create("u", "2025-08-20", _plan) is not first
+
+
+def test_insert_after_window_end_is_queued_not_an_error():
+    plan = _plan()
+    outcome = plan.insert("late", "late", 6, 0, now_slot=130)
+    assert outcome == {"placed": False, "start": None, "strategy": "pending"}
+    assert plan.tasks["late"]["start"] is None
+    assert [key[1] for key in plan.pending] == ["late"]
+
+
+def test_reoptimize_prefers_higher_priority_tasks():
+    plan = _plan(Te=108)
+    plan.insert("low", "low", 6, 0)
+    plan.insert("mid", "mid", 6, 0, importance=1)
+    # 直接重新最佳化一個放不下全部的情況：只剩 12 格，三個任務共 18 格
+    urgent = {"id": "urgent", "desc": "urgent", "code": 0, "duration": 6, "urgency": 3, "importance": 0,
+              "seq": 99, "start": None}
+    assert plan._reoptimize(96, urgent)
+    assert urgent["start"] is not None
+    assert plan.tasks["mid"]["start"] is not None
+    assert plan.tasks["low"]["start"] is None
+    assert plan.occupied.busy[urgent["start"]]
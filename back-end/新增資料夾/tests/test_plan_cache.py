@@ -0,0 +1,45 @@
+import datetime
+from metrics import render_metrics
+from plan_cache import PlanCache, normalize_question
+
+PLAN = {"行程": [{"事件": "讀書", "年分": 2025, "月份": 5, "日期": 2, "持續時間": 60}]}
+
+
+class _Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_question_ignores_width_case_and_punctuation():
+    assert normalize_question("幫我排　ＡＢ 讀書計畫！") == normalize_question("幫我排ab讀書計畫")
+    assert normalize_question("讀書, 運動") != normalize_question("讀書運動游泳")
+
+
+def test_entries_expire_at_midnight():
+    clock = _Clock(datetime.datetime(2025, 5, 1, 23, 50))
+    cache = PlanCache(clock=clock)
+    assert cache.put("排讀書", "理由", PLAN, latency=2.0)
+    assert cache.get("排讀書！")["result"] == PLAN
+    clock.now = datetime.datetime(2025, 5, 2, 0, 1)
+    assert cache.get("排讀書") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_invalid_plans_are_not_cached():
+    cache = PlanCache()
+    assert not cache.put("q", "", {"行程": [{"事件": "讀書"}]}, latency=1.0)
+    assert cache.get("q") is None
+
+
+def test_hits_and_misses_are_exported():
+    cache = PlanCache()
+    cache.put("q", "", PLAN, latency=1.5)
+    cache.get("q")
+    cache.get("other")
+    text = render_metrics()
+    assert 'plan_cache_requests_total{result="hit"}' in text
+    assert 'plan_cache_requests_total{result="miss"}' in text
+    assert "plan_cache_saved_seconds_total " in text
@@ -0,0 +1,33 @@
+from plan_stream import PlanStreamParser
+
+PLAN = '{"行程": [{"事件": "讀書", "備註": "a}b\\"c"}, {"事件": "運動"}], "總結": "ok"}'
+
+
+def _events(chunks):
+    parser = PlanStreamParser()
+    events = [e for chunk in chunks for e in parser.feed(chunk)]
+    return events + parser.close()
+
+
+def test_items_are_emitted_as_soon_as_they_close():
+    parser = PlanStreamParser()
+    head = parser.feed("建議先讀書。" + PLAN[:40])
+    assert head[0] == {"type": "recommendation", "text": "建議先讀書。"}
+    assert [e["item"]["事件"] for e in head if e["type"] == "item"] == ["讀書"]
+    tail = parser.feed(PLAN[40:])
+    assert [e["type"] for e in tail] == ["item", "plan"]
+    assert tail[-1]["result"]["總結"] == "ok"
+    assert parser.close() == []
+
+
+def test_chunk_boundaries_do_not_matter():
+    whole = _events(["理由", PLAN])
+    by_char = _events(["理由"] + list(PLAN))
+    items = lambda events: [e["item"] for e in events if e["type"] == "item"]
+    assert items(by_char) == items(whole)
+    assert by_char[-1] == whole[-1]
+
+
+def test_incomplete_or_missing_json_is_an_error():
+    assert _events(["只有文字"])[-1] == {"type": "error", "detail": "找不到 JSON 部分"}
+    assert _events([PLAN[:20]])[-1] == {"type": "error", "detail": "計劃 JSON 不完整"}
@@ -0,0 +1,39 @@
+import numpy as np
+from busy_index import BusyIndex
+from preemptive import solve_preemptive
+from task_model import SLOTS_PER_DAY
+
+
+def _busy():
+    busy = BusyIndex(0, SLOTS_PER_DAY)
+    busy.add(100, 102)
+    return busy
+
+
+def test_task_is_split_around_a_fixed_event():
+    C = np.ones((1, SLOTS_PER_DAY))
+    result = solve_preemptive(C, [12], 96, 110, _busy(), min_chunk=3, max_splits=1)
+    task, start, end = (a.tolist() for a in result.chunks)
+    assert list(zip(task, start, end)) == [(0, 96, 100), (0, 102, 110)]
+    assert result.starts.tolist() == [96]
+
+
+def test_min_chunk_and_max_splits_are_enforced():
+    C = np.ones((1, SLOTS_PER_DAY))
+    # 固定行程前只剩 4 格：每段至少 5 格時放不下
+    assert solve_preemptive(C, [12], 96, 110, _busy(), min_chunk=5, max_splits=1) is None
+    # 不能切割時也放不下
+    assert solve_preemptive(C, [12], 96, 110, _busy(), min_chunk=3, max_splits=0) is None
+
+
+def test_chunks_respect_limits_with_several_tasks():
+    C = np.tile(np.linspace(1.0, 2.0, SLOTS_PER_DAY), (2, 1))
+    result = solve_preemptive(C, [6, 8], 96, 114, _busy(), min_chunk=3, max_splits=1, row_of=[0, 1])
+    task, start, end = result.chunks
+    assert np.all(end - start >= 3)
+    assert np.bincount(task).max() <= 2
+    assert [int((end - start)[task == i].sum()) for i in range(2)] == [6, 8]
+    occupied = np.zeros(SLOTS_PER_DAY, dtype=int)
+    for s, e in zip(start, end):
+        occupied[s:e] += 1
+    assert occupied.max() == 1 and occupied[100:102].sum() == 0
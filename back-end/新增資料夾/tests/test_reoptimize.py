@@ -0,0 +1,56 @@
+import numpy as np
+from busy_index import BusyIndex
+from reoptimize import ProblemState, reoptimize
+from solver import solve_schedule
+from task_model import TaskBatch, Schedule
+
+
+def _state(n=5, seed=0):
+    rng = np.random.default_rng(seed)
+    C = rng.random((n, 288))
+    batch = TaskBatch(rng.integers(2, 8, n) * 5, [f"t{i}" for i in range(n)])
+    busy = BusyIndex(0, 288)
+    result = solve_schedule(C, batch.durations, 96, 264, busy)
+    state = ProblemState("u", "2025-08-20", 96, 264, batch, np.zeros(n, dtype=np.int8), C, ["2025-08-20"],
+                         result.starts)
+    return state, busy, result
+
+
+def test_remove_keeps_other_tasks_in_place_and_bumps_version():
+    state, busy, _ = _state()
+    new_state, result = reoptimize(state, busy, remove=[2], radius=0)
+    assert len(new_state.batch) == 4
+    assert new_state.version == 1
+    assert np.array_equal(result.starts, np.delete(state.starts, 2))
+
+
+def test_add_task_produces_feasible_schedule():
+    state, busy, _ = _state()
+    add = TaskBatch([30], ["new"])
+    add_C = np.random.default_rng(9).random((1, 288))
+    new_state, result = reoptimize(state, busy, add, [1], add_C)
+    durations = new_state.batch.durations
+    occupied = BusyIndex(0, 288)
+    for s, d in zip(result.starts, durations):
+        assert 96 <= s and s + d <= 264
+        assert occupied.is_free(int(s), int(d))
+        occupied.add(int(s), int(s + d))
+    assert new_state.codes.tolist()[-1] == 1
+
+
+def test_fixed_event_clash_moves_task():
+    state, busy, _ = _state()
+    s, d = int(state.starts[0]), int(state.batch.durations[0])
+    moved_busy = busy.copy()
+    moved_busy.add(s, s + d)
+    new_state, result = reoptimize(state, moved_busy, changed_intervals=[(s, s + d)])
+    assert result.starts[0] != s
+    assert moved_busy.is_free(int(result.starts[0]), d)
+
+
+def test_shorter_schedule_still_covers_every_day():
+    # 重排後任務變少或某天沒有任務時，寫入端仍要拿到每一天（空的那天用來刪除舊文件）
+    batch = TaskBatch([30], ["a"])
+    parts = Schedule.from_starts([100], batch, [0]).split_by_day(["2025-08-20", "2025-08-21"], keep_empty=True)
+    assert [d for d, _ in parts] == ["2025-08-20", "2025-08-21"]
+    assert len(parts[1][1]) == 0 and parts[1][1].to_dicts() == []
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from busy_index import BusyIndex
+from replay import ReplayCapture, capture_if_slow
+from replay_cli import make_solver
+from solver import build_model, solve_model
+from task_model import TaskBatch, SLOTS_PER_DAY
+
+
+def _capture():
+    payload = {"request_id": "r1", "date": "2025-05-01", "mode": "exact", "Ts_slots": 96, "Te_slots": 132,
+               "minutes": [30, 60], "desc": ["讀書", "跑步"]}
+    capture = ReplayCapture(payload)
+    capture.labels = ["語言智能", "肢體動覺智能"]
+    capture.codes = np.array([0, 4], dtype=np.int8)
+    capture.daily_rows = np.vstack([np.linspace(1.0, 2.0, SLOTS_PER_DAY), np.linspace(2.0, 1.0, SLOTS_PER_DAY)])
+    capture.row_of = np.array([0, 1])
+    capture.num_days = 1
+    capture.busy = BusyIndex(0, SLOTS_PER_DAY)
+    capture.busy.add(100, 102)
+    durations = TaskBatch(payload["minutes"], payload["desc"]).durations
+    capture.model = build_model(capture.daily_rows, durations, 96, 132, capture.busy, row_of=capture.row_of)
+    return capture
+
+
+def test_capture_round_trips_through_npz(tmp_path):
+    original = _capture()
+    path = str(tmp_path / "capture.npz")
+    original.save(path)
+    loaded = ReplayCapture.load(path)
+    assert loaded.payload == original.payload and loaded.labels == original.labels
+    assert loaded.codes.tolist() == [0, 4] and loaded.num_days == 1
+    assert np.array_equal(loaded.daily_rows, original.daily_rows) and loaded.row_of.tolist() == [0, 1]
+    assert loaded.busy.origin == 0 and np.array_equal(loaded.busy.busy, original.busy.busy)
+    model, saved = loaded.model, original.model
+    assert (model.n, model.Ts_slots, model.Te_slots, model.optional) == (2, 96, 132, False)
+    assert np.array_equal(model.var_start, saved.var_start) and np.array_equal(model.c, saved.c)
+    assert (model.A_eq != saved.A_eq).nnz == 0 and (model.A_ub != saved.A_ub).nnz == 0
+    assert solve_model(model).starts.tolist() == solve_model(saved).starts.tolist()
+
+
+def test_partial_capture_keeps_missing_fields_empty(tmp_path):
+    capture = ReplayCapture({"date": "2025-05-01"})
+    capture.error = "分類失敗"
+    path = str(tmp_path / "partial.npz")
+    capture.save(path)
+    loaded = ReplayCapture.load(path)
+    assert loaded.error == "分類失敗"
+    assert loaded.codes is None and loaded.busy is None and loaded.model is None
+    with pytest.raises(ValueError):
+        make_solver(loaded, "model")
+    with pytest.raises(ValueError):
+        make_solver(loaded, "exact")
+
+
+def test_capture_if_slow_only_writes_slow_requests(tmp_path):
+    capture = _capture()
+    assert capture_if_slow(capture, 1.0, threshold=5, directory=str(tmp_path)) is None
+    assert capture_if_slow(capture, 9.0, threshold=-1, directory=str(tmp_path)) is None
+    assert list(tmp_path.iterdir()) == []
+    path = capture_if_slow(capture, 6.5, threshold=5, directory=str(tmp_path / "slow"))
+    assert path.endswith("2025-05-01_r1_6500ms.npz")
+    assert ReplayCapture.load(path).elapsed == 6.5
+
+
+def test_replayed_backends_agree_with_the_stored_model(tmp_path):
+    path = str(tmp_path / "capture.npz")
+    _capture().save(path)
+    capture = ReplayCapture.load(path)
+    stored = make_solver(capture, "model")()
+    rebuilt = make_solver(capture, "exact")()
+    assert stored.starts.tolist() == rebuilt.starts.tolist()
+    assert np.isclose(stored.cost, rebuilt.cost)
+    with pytest.raises(ValueError):
+        make_solver(capture, "不存在")
@@ -0,0 +1,28 @@
+import numpy as np
+from busy_index import BusyIndex
+from rolling_horizon import daily_windows, solve_rolling
+from task_model import SLOTS_PER_DAY
+
+
+def test_daily_windows_repeat_each_day():
+    assert daily_windows(96, 120, 2) == [(96, 120), (SLOTS_PER_DAY + 96, SLOTS_PER_DAY + 120)]
+
+
+def test_tasks_that_do_not_fit_carry_over_to_the_next_day():
+    C = np.ones((1, 2 * SLOTS_PER_DAY))
+    durations = [12, 12, 12]
+    windows = daily_windows(96, 120, 2)      # 每天 08:00 ~ 10:00，一天只放得下兩個
+    result = solve_rolling(C, durations, windows, row_of=[0, 0, 0])
+    starts = np.sort(result.starts)
+    assert (starts < SLOTS_PER_DAY).sum() == 2
+    assert SLOTS_PER_DAY + 96 <= starts[-1] < SLOTS_PER_DAY + 120
+    assert result.cost == 36.0
+
+
+def test_tasks_that_never_fit_stay_unscheduled():
+    C = np.ones((1, 2 * SLOTS_PER_DAY))
+    busy = BusyIndex(0, 2 * SLOTS_PER_DAY)
+    busy.add(SLOTS_PER_DAY + 96, SLOTS_PER_DAY + 120)
+    result = solve_rolling(C, [24, 24], daily_windows(96, 120, 2), busy, row_of=[0, 0])
+    assert sorted(result.starts.tolist()) == [-1, 96]
+    assert not busy.busy[96]     # 傳入的忙碌索引不會被改動
@@ -0,0 +1,36 @@
+import numpy as np
+from busy_index import BusyIndex
+from scenarios import Scenario, solve_scenarios
+from task_model import SLOTS_PER_DAY
+
+
+def _problem():
+    C = np.tile(np.linspace(2.0, 1.0, SLOTS_PER_DAY), (2, 1))    # 越晚越便宜
+    busy = BusyIndex.from_events([{"startTime": "09:00", "endTime": "10:00"}])
+    return C, busy
+
+
+def test_scenarios_keep_input_order_and_task_positions():
+    C, busy = _problem()
+    durations = np.array([6, 6, 12])
+    scenarios = [Scenario("原本", 96, 132, [0, 1, 2], durations),
+                 Scenario("刪除任務 2", 96, 132, [0, 2], durations),
+                 Scenario("時間太短", 96, 100, [0, 1, 2], durations)]
+    out = solve_scenarios(C, scenarios, busy, parallel=False, row_of=[0, 1, 0])
+    base, removed, too_short = out
+    assert too_short is None
+    assert (base[0] >= 0).all() and removed[0][1] == -1
+    assert removed[1] < base[1]
+    for starts, _ in (base, removed):
+        placed = starts[starts >= 0]
+        assert not any(busy.busy[s:s + d].any() for s, d in zip(placed, durations[starts >= 0]))
+
+
+def test_scenario_durations_override_the_base_problem():
+    C, busy = _problem()
+    longer = Scenario("加長", 96, 132, [0], np.array([12]))
+    shorter = Scenario("縮短", 96, 132, [0], np.array([6]))
+    (long_starts, long_cost), (short_starts, short_cost) = solve_scenarios(C, [longer, shorter], busy,
+                                                                           parallel=False)
+    assert long_starts[0] == 120 and short_starts[0] == 126
+    assert long_cost > short_cost
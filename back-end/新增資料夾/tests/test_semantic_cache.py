@@ -0,0 +1,36 @@
+import json
+from semantic_cache import MissionSimilarityIndex
+
+
+def _index(**kwargs):
+    index = MissionSimilarityIndex(**kwargs)
+    index.add(["讀英文", "跑步半小時", "沒有分類"], ["語言智能", "肢體動覺智能", None])
+    return index
+
+
+def test_similar_missions_reuse_the_closest_label():
+    index = _index(threshold=0.6)
+    hit, miss, unlabelled = index.lookup(["讀英文單字", "彈鋼琴", "沒有分類"])
+    assert hit[:2] == ("語言智能", "讀英文") and hit[2] >= 0.6
+    assert miss is None
+    assert unlabelled is None                # 沒有分類結果的任務不會進索引
+    assert index.lookup(["讀 英文"])[0][2] > 0.99     # 空白與大小寫不影響比對
+    assert index.stats() == {"entries": 2, "lookups": 4, "hits": 2, "hit_rate": 0.5}
+
+
+def test_threshold_decides_what_counts_as_a_hit():
+    # 「去跑步」與「跑步半小時」的相似度約 0.45
+    assert _index(threshold=0.4).lookup(["去跑步"])[0][0] == "肢體動覺智能"
+    assert _index(threshold=0.6).lookup(["去跑步"]) == [None]
+    empty = MissionSimilarityIndex()
+    assert empty.lookup(["讀英文"]) == [None] and empty.lookup([]) == []
+
+
+def test_hits_are_audited(tmp_path):
+    path = tmp_path / "audit.jsonl"
+    index = _index(audit_size=1, audit_path=str(path))
+    index.lookup(["讀英文單字", "讀英文", "彈鋼琴"])
+    assert len(index.audit) == 1 and index.audit[0]["mission"] == "讀英文"
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(e["mission"], e["matched"], e["intelligence"]) for e in lines] == [
+        ("讀英文單字", "讀英文", "語言智能"), ("讀英文", "讀英文", "語言智能")]
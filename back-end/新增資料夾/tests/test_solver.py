@@ -0,0 +1,58 @@
+import itertools
+import numpy as np
+from busy_index import BusyIndex
+from solver import build_model, solve_model, solve_k_best, moved_tasks, window_cost_prefix
+
+
+def _model(seed=0, n=4):
+    rng = np.random.default_rng(seed)
+    C = rng.random((n, 288))
+    durations = rng.integers(3, 10, n)
+    busy = BusyIndex.from_events([{"startTime": "12:00", "endTime": "13:00"}])
+    return build_model(C, durations, 96, 216, busy), C, durations, busy
+
+
+def test_build_model_skips_starts_that_hit_fixed_events():
+    model, _, durations, busy = _model()
+    for task, start in zip(model.var_task, model.var_start):
+        assert busy.is_free(int(start), int(durations[task]))
+        assert 96 <= start and start + durations[task] <= 216
+
+
+def test_solve_model_cost_matches_prefix_sums():
+    model, C, durations, _ = _model(1)
+    result = solve_model(model)
+    P = window_cost_prefix(C)
+    idx = np.arange(len(durations))
+    assert np.isclose(result.cost, (P[idx, result.starts + durations] - P[idx, result.starts]).sum())
+
+
+def test_row_of_shares_rows_between_tasks():
+    C = np.random.default_rng(2).random((2, 288))
+    durations = np.array([6, 6, 6])
+    row_of = np.array([0, 1, 0])
+    shared = solve_model(build_model(C, durations, 96, 216, row_of=row_of))
+    copied = solve_model(build_model(C[row_of], durations, 96, 216))
+    assert np.isclose(shared.cost, copied.cost)
+
+
+def test_k_best_alternatives_differ_by_at_least_min_shift():
+    model, _, _, _ = _model(3)
+    best = solve_model(model)
+    ranked = solve_k_best(model, 4, min_shift=12, min_moved=1)
+    assert len(ranked) == 4
+    assert np.isclose(ranked[0].cost, best.cost)
+    assert all(a.cost <= b.cost + 1e-9 for a, b in zip(ranked, ranked[1:]))
+    for a, b in itertools.combinations(ranked, 2):
+        assert moved_tasks(a.starts, b.starts, 12) >= 1
+
+
+def test_k_best_min_moved_requires_several_tasks_to_move():
+    model, _, _, _ = _model(4)
+    ranked = solve_k_best(model, 3, min_shift=6, min_moved=2)
+    for a, b in itertools.combinations(ranked, 2):
+        assert moved_tasks(a.starts, b.starts, 6) >= 2
+
+
+def test_moved_tasks_counts_placement_changes():
+    assert moved_tasks([0, 20, -1], [5, 40, 10], 12) == 2
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from busy_index import BusyIndex
+from suggest_index import BestWindowIndex, get_window_index, invalidate_window_index
+from task_model import SLOTS_PER_DAY
+
+
+def _curves():
+    # 每種智能都是 slot 越晚越便宜，最便宜的位置在一天的最後
+    return np.tile(np.linspace(2.0, 1.0, SLOTS_PER_DAY), (8, 1))
+
+
+def test_suggestions_skip_busy_slots_and_keep_spacing():
+    index = BestWindowIndex(_curves())
+    busy = BusyIndex.from_events([{"startTime": "21:00", "endTime": "22:00"}])
+    lo, hi = 96, 264          # 08:00 ~ 22:00
+    suggestions = index.suggest(1, 6, busy, lo, hi, k=3)
+    starts = [s for s, _ in suggestions]
+    assert starts == [246, 240, 234]
+    assert all(not busy.busy[s:s + 6].any() for s in starts)
+    costs = [c for _, c in suggestions]
+    assert costs == sorted(costs)
+
+
+def test_long_durations_are_ranked_on_demand_and_zero_is_rejected():
+    index = BestWindowIndex(_curves(), max_duration=12)
+    assert index.suggest(0, 24, None, 0, SLOTS_PER_DAY, k=1)[0][0] == SLOTS_PER_DAY - 24
+    with pytest.raises(ValueError):
+        index.suggest(0, 0)
+
+
+def test_index_rebuilt_when_version_changes():
+    invalidate_window_index()
+    calls = []
+
+    def lookup(code):
+        calls.append(code)
+        return _curves()[code]
+
+    first = get_window_index("u", lookup, version=1)
+    assert get_window_index("u", lookup, version=1) is first
+    assert get_window_index("u", lookup, version=2) is not first
+    assert len(calls) == 16
+    invalidate_window_index()
@@ -0,0 +1,54 @@
+import numpy as np
+from task_model import TaskBatch, Schedule, parse_window, intelligence_codes, SLOTS_PER_DAY
+
+
+def test_task_batch_rounds_minutes_up_to_slots():
+    batch = TaskBatch([5, 6, 60], ["a", "b"])
+    assert batch.durations.tolist() == [1, 2, 12]
+    assert batch.desc == ["a", "b", ""]
+    assert batch.subset([2, 0]).minutes.tolist() == [60, 5]
+
+
+def test_parse_window_wraps_past_midnight():
+    assert parse_window("08:00", "22:00") == (96, 264)
+    assert parse_window("22:00", "02:00") == (264, 312)
+
+
+def test_intelligence_codes_unknown_is_minus_one():
+    codes = intelligence_codes([{"intelligence": "語言智能"}, {"intelligence": ["空間智能"]}, {"intelligence": "?"}], 4)
+    assert codes.tolist() == [0, 2, -1, -1]
+
+
+def test_schedule_skips_unplaced_tasks():
+    batch = TaskBatch([30, 60, 15], ["a", "b", "c"])
+    schedule = Schedule.from_starts([96, -1, 120], batch, [0, 1, 2])
+    assert schedule.index.tolist() == [0, 2]
+    assert schedule.end.tolist() == [102, 123]
+    assert [t["startTime"] for t in schedule.to_dicts()] == ["08:00", "10:00"]
+
+
+def test_packed_round_trip_sorts_by_start():
+    batch = TaskBatch([30, 60], ["晚", "早"])
+    packed = Schedule.from_starts([200, 100], batch, [3, -1]).to_packed()
+    assert packed == {"start": [500, 1000], "end": [560, 1030], "intelligence": [-1, 3], "desc": ["早", "晚"]}
+    restored = Schedule.from_packed(packed)
+    assert restored.start.tolist() == [100, 200]
+    assert restored.to_packed() == packed
+
+
+def test_split_by_day_rebases_slots():
+    batch = TaskBatch([60, 60], ["今天", "明天"])
+    schedule = Schedule.from_starts([100, SLOTS_PER_DAY + 10], batch, [0, 0])
+    parts = schedule.split_by_day(["2025-08-20", "2025-08-21"])
+    assert [d for d, _ in parts] == ["2025-08-20", "2025-08-21"]
+    assert parts[1][1].start.tolist() == [10]
+    assert parts[1][1].to_dicts()[0]["startTime"] == "00:50"
+
+
+def test_from_chunks_groups_segments_by_task():
+    batch = TaskBatch([60, 30], ["a", "b"])
+    schedule = Schedule.from_chunks((np.array([1, 0, 0]), np.array([50, 30, 10]), np.array([56, 36, 16])),
+                                    batch, [4, 5])
+    assert schedule.index.tolist() == [0, 0, 1]
+    assert schedule.start.tolist() == [10, 30, 50]
+    assert schedule.intelligence.tolist() == [4, 4, 5]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from busy_index import invalidate_day_busy_index
+from task_model import Schedule, TaskBatch, SLOTS_PER_DAY, parse_window
+from timeline import timeline_dates, window_end_slot, build_cost_timeline, build_busy_timeline
+
+
+def test_overnight_window_spans_two_dates():
+    Ts_slots, Te_slots = parse_window("22:00", "02:00")
+    assert timeline_dates("2025-08-31", Te_slots) == ["2025-08-31", "2025-09-01"]
+    assert timeline_dates("2025-08-31", 264) == ["2025-08-31"]
+    assert window_end_slot("2025-08-30", "2025-09-01", "10:00") == 2 * SLOTS_PER_DAY + 120
+    with pytest.raises(ValueError):
+        window_end_slot("2025-08-30", "2025-08-29", "10:00")
+
+
+def test_cost_timeline_repeats_days_and_accepts_overrides():
+    daily = np.arange(SLOTS_PER_DAY, dtype=float)[None, :]
+    C = build_cost_timeline(daily, 2, {"2025-09-01": np.zeros((1, SLOTS_PER_DAY))}, ["2025-08-31", "2025-09-01"])
+    assert C.shape == (1, 2 * SLOTS_PER_DAY)
+    assert C[0, 287] == 287 and np.all(C[0, SLOTS_PER_DAY:] == 0)
+
+
+def test_busy_timeline_keeps_events_that_cross_midnight():
+    invalidate_day_busy_index("timeline-u")
+    events = {"2025-08-31": [{"startTime": "23:00", "endTime": "01:00"}],
+              "2025-09-01": [{"startTime": "08:00", "endTime": "09:00"}]}
+    busy = build_busy_timeline("timeline-u", ["2025-08-31", "2025-09-01"], lambda d, uid: events[d])
+    assert busy.busy[276:300].all() and not busy.busy[300]
+    assert busy.busy[SLOTS_PER_DAY + 96:SLOTS_PER_DAY + 108].all()
+    invalidate_day_busy_index("timeline-u")
+
+
+def test_tasks_after_midnight_are_written_to_the_next_day():
+    batch = TaskBatch([60, 60], ["晚上", "凌晨"])
+    schedule = Schedule.from_starts([276, SLOTS_PER_DAY + 6], batch, [0, 1])
+    days = dict(schedule.split_by_day(["2025-08-31", "2025-09-01"]))
+    assert days["2025-08-31"].desc == ["晚上"]
+    assert days["2025-09-01"].start.tolist() == [6]
+    dated = schedule.to_dated_dicts(["2025-08-31", "2025-09-01"])
+    assert [(t["date"], t["startTime"]) for t in dated] == [("2025-08-31", "23:00"), ("2025-09-01", "00:30")]
@@ -0,0 +1,91 @@
+import pytest
+from weekly_schedule import week_key, week_keys_in_range, unpack_day, WeeklyScheduleCache
+from weekly_schedule import weekly_cache, read_day_packed, task_list_path, task_doc_id, stale_task_doc_ids, merge_packed_day, split_packed_by_owner
+
+
+def test_week_key_uses_iso_week():
+    assert week_key("2025-08-18") == "2025-W34"
+    # 2024-12-30 屬於 ISO 2025 年第 1 週
+    assert week_key("2024-12-30") == "2025-W01"
+
+
+def test_week_keys_in_range_spans_weeks_once():
+    assert week_keys_in_range("2025-08-20", "2025-09-02") == ["2025-W34", "2025-W35", "2025-W36"]
+    assert week_keys_in_range("2025-08-20", "2025-08-20") == ["2025-W34"]
+    with pytest.raises(ValueError):
+        week_keys_in_range("2025-08-20", "2025-08-19")
+
+
+def test_unpack_day_formats_minutes_and_labels():
+    packed = {"start": [480, 1410], "end": [540, 1470], "intelligence": [1, -1], "desc": ["數學", "跨日"]}
+    tasks = unpack_day(packed)
+    assert tasks[0] == {"index": 0, "startTime": "08:00", "endTime": "09:00", "desc": "數學",
+                        "intelligence": "邏輯數理智能"}
+    assert tasks[1]["startTime"] == "23:30" and tasks[1]["endTime"] == "00:30"
+    assert tasks[1]["intelligence"] == ""
+
+
+def test_cache_put_day_updates_cached_week_only():
+    cache = WeeklyScheduleCache(ttl=60)
+    cache.put_day("u", "2025-08-20", {"start": [1]})
+    assert cache.get("u", "2025-W34") is None
+
+    cache.put("u", "2025-W34", {"days": {}})
+    cache.put_day("u", "2025-08-20", {"start": [1]})
+    assert cache.get("u", "2025-W34")["days"]["2025-08-20"] == {"start": [1]}
+
+    cache.invalidate("u")
+    assert cache.get("u", "2025-W34") is None
+
+
+def _packed(*tasks):
+    return {"start": [t[0] for t in tasks], "end": [t[1] for t in tasks],
+            "intelligence": [1] * len(tasks), "desc": [t[2] for t in tasks]}
+
+
+def test_task_docs_are_per_user_and_spill_over_ids_are_prefixed():
+    assert task_list_path("a", "2025-08-21") != task_list_path("b", "2025-08-21")
+    assert task_list_path("a", "2025-08-21") == "users/a/tasks/2025/08/21/task_list"
+    assert task_doc_id("2025-08-21", "2025-08-21", 0) == "0"
+    assert task_doc_id("2025-08-21", "2025-08-20", 0) == "2025-08-20_0"
+
+
+def test_stale_docs_only_belong_to_the_same_owner():
+    ids = ["0", "1", "2", "2025-08-20_0", "2025-08-20_1"]
+    # 08-20 的跨夜請求這次只延伸一個任務到 08-21：08-21 自己的任務不受影響
+    assert stale_task_doc_ids(ids, "2025-08-21", "2025-08-20", 1) == ["2025-08-20_1"]
+    assert stale_task_doc_ids(ids, "2025-08-21", "2025-08-20", 0) == ["2025-08-20_0", "2025-08-20_1"]
+    assert stale_task_doc_ids(ids, "2025-08-21", "2025-08-21", 1) == ["1", "2"]
+
+
+def test_overnight_request_merges_into_the_next_day():
+    own_day = _packed((480, 540, "早上"), (600, 660, "中午"))
+    # 前一天 22:00–02:00 的請求沒有任務排到 08-21：原本的任務保留
+    merged = merge_packed_day(own_day, _packed(), "2025-08-21", "2025-08-20")
+    assert merged["desc"] == ["早上", "中午"] and merged["owner"] == ["2025-08-21"] * 2
+    # 有任務排到隔天凌晨時併入，並依開始時間排序
+    merged = merge_packed_day(merged, _packed((30, 90, "凌晨")), "2025-08-21", "2025-08-20")
+    assert merged["desc"] == ["凌晨", "早上", "中午"]
+    # 重新排 08-21 本身只取代自己的任務
+    merged = merge_packed_day(merged, _packed((720, 780, "下午")), "2025-08-21", "2025-08-21")
+    assert merged["desc"] == ["凌晨", "下午"]
+    assert merged["owner"] == ["2025-08-20", "2025-08-21"]
+    own, foreign = split_packed_by_owner(merged, "2025-08-21", "2025-08-21")
+    assert own["desc"] == ["下午"] and foreign["desc"] == ["凌晨"]
+
+
+def test_batch_writes_for_same_date_do_not_clobber_each_other():
+    """schedule_batch 的寫入順序：每個 (uid, 日期) 先讀快取、併入、再寫回快取"""
+    weekly_cache.invalidate()
+    stored = {("a", "2025-W34"): {"days": {"2025-08-21": _packed((480, 540, "a 原本"))}},
+              ("b", "2025-W34"): {"days": {"2025-08-21": _packed((600, 660, "b 原本"))}}}
+    fetch_week = lambda uid, week: stored.get((uid, week))
+    batch = [("a", "2025-08-20", "2025-08-21", _packed((30, 90, "a 跨夜"))),
+             ("a", "2025-08-21", "2025-08-21", _packed((700, 760, "a 新"))),
+             ("b", "2025-08-21", "2025-08-21", _packed())]
+    for uid, owner, day, packed in batch:
+        merged = merge_packed_day(read_day_packed(uid, day, fetch_week), packed, day, owner)
+        weekly_cache.put_day(uid, day, merged)
+    assert read_day_packed("a", "2025-08-21", fetch_week)["desc"] == ["a 跨夜", "a 新"]
+    assert read_day_packed("b", "2025-08-21", fetch_week)["desc"] == []
+    weekly_cache.invalidate()
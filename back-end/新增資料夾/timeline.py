@@ -0,0 +1,49 @@
+import datetime
+import numpy as np
+from busy_index import BusyIndex, get_day_busy_index
+from task_model import SLOT_MINUTES, SLOTS_PER_DAY, hhmm_to_minutes
+
+
+def timeline_dates(date_str: str, Te_slots: int) -> list:
+    """
+    回傳時間軸涵蓋的日期（從 date_str 當天 00:00 到 Te_slots 為止），
+    例如 Te_slots = 300（隔天 01:00）會回傳兩天。
+    """
+    num_days = max(1, -(-int(Te_slots) // SLOTS_PER_DAY))
+    first = datetime.date.fromisoformat(date_str)
+    return [(first + datetime.timedelta(days=k)).isoformat() for k in range(num_days)]
+
+
+def window_end_slot(date_str: str, end_date: str, Te: str) -> int:
+    """多日視窗：把結束日期 end_date 的 Te（'HH:MM'）換算成相對 date_str 00:00 的 slot"""
+    days = (datetime.date.fromisoformat(end_date) - datetime.date.fromisoformat(date_str)).days
+    if days < 0:
+        raise ValueError("❌ endDate 不可早於 taskDate")
+    return days * SLOTS_PER_DAY + hhmm_to_minutes(Te) // SLOT_MINUTES
+
+
+def build_cost_timeline(daily_cost, num_days: int, per_day_cost: dict = None, dates: list = None):
+    """
+    建立連續多日的成本時間軸（m x num_days*288，列數與 daily_cost 相同）。
+    - daily_cost：m x 288 的單日疲勞成本（每天重複使用；可以每種智能一列，由呼叫端以列索引對應任務）
+    - per_day_cost：可選 {date_str: n x 288}，某些日期有自己的曲線時覆蓋
+    時間軸是連續的，任務可以橫跨午夜（例如 23:30 ~ 00:30 會同時用到兩天的成本）。
+    """
+    daily_cost = np.asarray(daily_cost, dtype=np.float64)
+    C = np.tile(daily_cost, (1, num_days))
+    if per_day_cost and dates:
+        for k, date_str in enumerate(dates[:num_days]):
+            if date_str in per_day_cost:
+                C[:, k * SLOTS_PER_DAY:(k + 1) * SLOTS_PER_DAY] = per_day_cost[date_str]
+    return C
+
+
+def build_busy_timeline(uid: str, dates: list, fetch_events) -> BusyIndex:
+    """
+    把多天的固定行程合併成一條連續的忙碌索引（origin = 第一天 00:00）。
+    每天的索引仍由 get_day_busy_index 快取，跨過午夜的行程會延伸到隔天。
+    """
+    timeline = BusyIndex(0, len(dates) * SLOTS_PER_DAY)
+    for k, date_str in enumerate(dates):
+        timeline.merge(get_day_busy_index(uid, date_str, fetch_events), offset=k * SLOTS_PER_DAY)
+    return timeline
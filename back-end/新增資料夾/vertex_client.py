@@ -43,7 +43,7 @@ def connect_to_model():
 
 
 # ====== 發問邏輯 ======
-def ask_vertex_ai(model: GenerativeModel, question: str):
+def build_plan_prompt(question: str) -> str:
     today = datetime.date.today()
     year, month, day = today.year, today.month, today.day
 
@@ -75,5 +75,20 @@ def ask_vertex_ai(model: GenerativeModel, question: str):
 5. 如果使用者的問題不是關於行程規劃，請回答：「這個問題超出我的行程規劃範圍。」
 """
 
-    response = model.generate_content(f"{format_instructions}\n使用者需求: {question}")
+    return f"{format_instructions}\n使用者需求: {question}"
+
+
+def ask_vertex_ai(model: GenerativeModel, question: str):
+    response = model.generate_content(build_plan_prompt(question))
     return response.text
+
+
+def ask_vertex_ai_stream(model: GenerativeModel, question: str):
+    """串流版本：模型每產生一段文字就 yield 出來（第一個 token 就能開始轉送）"""
+    for chunk in model.generate_content(build_plan_prompt(question), stream=True):
+        try:
+            text = chunk.text
+        except (ValueError, AttributeError):
+            continue  # 沒有文字的 chunk（例如只有 safety / usage 資訊）
+        if text:
+            yield text
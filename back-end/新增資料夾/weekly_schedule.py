@@ -0,0 +1,170 @@
+import time
+import datetime
+
+from task_model import INTELLIGENCE_LABELS, minutes_to_hhmm
+
+
+def week_key(date_str: str) -> str:
+    """把 'YYYY-MM-DD' 轉成 ISO 週文件 ID，例如 '2025-W34'"""
+    iso_year, iso_week, _ = datetime.date.fromisoformat(date_str).isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+
+def unpack_day(packed: dict) -> list:
+    """Schedule.to_packed 的反向操作，只在 API 輸出時轉回 'HH:MM' 字串"""
+    tasks = []
+    for idx, (s, e, code, d) in enumerate(zip(packed.get("start", []), packed.get("end", []),
+                                              packed.get("intelligence", []), packed.get("desc", []))):
+        tasks.append({
+            "index": idx,
+            "startTime": minutes_to_hhmm(s % (24 * 60)),
+            "endTime": minutes_to_hhmm(e % (24 * 60)),
+            "desc": d,
+            "intelligence": INTELLIGENCE_LABELS[code] if 0 <= code < len(INTELLIGENCE_LABELS) else ""
+        })
+    return tasks
+
+
+def task_list_path(uid: str, date_str: str) -> str:
+    """使用者某天的任務文件 collection：users/{uid}/tasks/{year}/{month}/{day}/task_list"""
+    year, month, day = date_str.split("-")
+    return f"users/{uid}/tasks/{year}/{month}/{day}/task_list"
+
+
+def task_doc_id(date_str: str, owner: str, idx: int) -> str:
+    """
+    任務文件 ID：排在自己開始日（owner == date_str）的任務沿用編號 "0", "1"…；
+    跨過午夜延伸到其他天的任務加上開始日前綴（例如 "2025-08-20_0"），不會覆蓋那天自己的任務
+    """
+    return str(idx) if owner == date_str else f"{owner}_{idx}"
+
+
+def stale_task_doc_ids(doc_ids, date_str: str, owner: str, count: int) -> list:
+    """owner 這次寫入 date_str 後多出來的舊文件（同一個 owner、編號 >= count），其他 owner 的文件不動"""
+    prefix = "" if owner == date_str else f"{owner}_"
+    stale = []
+    for doc_id in doc_ids:
+        rest = doc_id[len(prefix):] if doc_id.startswith(prefix) else ""
+        if rest.isdigit() and int(rest) >= count:
+            stale.append(doc_id)
+    return stale
+
+
+PACKED_KEYS = ("start", "end", "intelligence", "desc")
+
+
+def merge_packed_day(existing, packed: dict, date_str: str, owner: str) -> dict:
+    """
+    把 owner（排程請求的開始日）在 date_str 這天的任務併入週文件中這天原本的內容：
+    只取代同一個 owner 先前寫入的項目，其他 owner（例如前一天跨夜延伸過來的任務）保留。
+    平行陣列 "owner" 記錄每筆的來源；舊資料沒有這個欄位時視為當天自己的任務。
+    """
+    existing = existing or {}
+    count = len(existing.get("start", []))
+    owners = list(existing.get("owner") or [date_str] * count)
+    keep = [k for k in range(count) if owners[k] != owner]
+    rows = [tuple(existing[key][k] for key in PACKED_KEYS) + (owners[k],) for k in keep]
+    rows += [tuple(packed[key][k] for key in PACKED_KEYS) + (owner,) for k in range(len(packed["start"]))]
+    rows.sort(key=lambda row: row[0])
+    merged = {key: value for key, value in packed.items() if key not in PACKED_KEYS}
+    for k, key in enumerate(PACKED_KEYS + ("owner",)):
+        merged[key] = [row[k] for row in rows]
+    return merged
+
+
+def split_packed_by_owner(packed: dict, date_str: str, owner: str):
+    """把某天的壓縮排程拆成 (owner 自己的, 其他 owner 的) 兩份"""
+    count = len(packed.get("start", []))
+    owners = list(packed.get("owner") or [date_str] * count)
+    parts = ([k for k in range(count) if owners[k] == owner], [k for k in range(count) if owners[k] != owner])
+    return tuple({key: [packed[key][k] for k in sel] for key in PACKED_KEYS} for sel in parts)
+
+
+def week_keys_in_range(from_date: str, to_date: str) -> list:
+    """回傳 from_date ~ to_date（含）涵蓋的所有週文件 ID（依時間排序、不重複）"""
+    start = datetime.date.fromisoformat(from_date)
+    end = datetime.date.fromisoformat(to_date)
+    if end < start:
+        raise ValueError("❌ to 不可早於 from")
+    keys = []
+    day = start
+    while day <= end:
+        key = week_key(day.isoformat())
+        if key not in keys:
+            keys.append(key)
+        # 直接跳到下週一
+        day += datetime.timedelta(days=7 - day.weekday())
+    return keys
+
+
+class WeeklyScheduleCache:
+    """
+    週文件的本機快取（uid, week_key）-> 文件內容。
+    - 讀取時若過期（ttl 秒）才重新向 Firestore 取
+    - 寫入時由 put_day 直接更新快取（write-through），不需要再讀一次
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._docs = {}  # (uid, week) -> (fetched_at, doc)
+
+    def get(self, uid: str, week: str):
+        entry = self._docs.get((uid, week))
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, uid: str, week: str, doc: dict):
+        self._docs[(uid, week)] = (time.monotonic(), doc)
+
+    def put_day(self, uid: str, date_str: str, packed: dict):
+        week = week_key(date_str)
+        entry = self._docs.get((uid, week))
+        if entry is None:
+            return  # 尚未快取的週不需要處理，下次讀取時會從 Firestore 取得
+        entry[1].setdefault("days", {})[date_str] = packed
+
+    def invalidate(self, uid: str = None):
+        if uid is None:
+            self._docs.clear()
+        else:
+            for key in [k for k in self._docs if k[0] == uid]:
+                del self._docs[key]
+
+
+weekly_cache = WeeklyScheduleCache()
+
+
+def read_day_packed(uid: str, date_str: str, fetch_week):
+    """讀取某一天的壓縮排程（經過快取），沒有資料時回傳 None"""
+    week = week_key(date_str)
+    doc = weekly_cache.get(uid, week)
+    if doc is None:
+        doc = fetch_week(uid, week) or {"days": {}}
+        weekly_cache.put(uid, week, doc)
+    return doc.get("days", {}).get(date_str)
+
+
+def read_schedule_range(uid: str, from_date: str, to_date: str, fetch_week) -> list:
+    """
+    讀取 from_date ~ to_date 的排程，每週只讀一份文件（先查快取）。
+    fetch_week(uid, week_key) 負責從 Firestore 讀取，文件不存在時回傳 None。
+    回傳 list of {"date": "YYYY-MM-DD", "tasks": [...]}
+    """
+    docs = {}
+    for week in week_keys_in_range(from_date, to_date):
+        doc = weekly_cache.get(uid, week)
+        if doc is None:
+            doc = fetch_week(uid, week) or {"days": {}}
+            weekly_cache.put(uid, week, doc)
+        docs[week] = doc
+
+    days = []
+    day = datetime.date.fromisoformat(from_date)
+    end = datetime.date.fromisoformat(to_date)
+    while day <= end:
+        date_str = day.isoformat()
+        packed = docs[week_key(date_str)].get("days", {}).get(date_str)
+        days.append({"date": date_str, "tasks": unpack_day(packed) if packed else []})
+        day += datetime.timedelta(days=1)
+    return days